@@ -1,58 +1,56 @@
-import requests
 import json
 import re
-from typing import Dict, List
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List
+from utils.batching import QueueFullError
+from utils.inference_profile import inference_context
+from utils.lazy import lazy_import
+from utils.model_registry import model_registry
+from utils.model_server import model_server_client
+from utils.nltk_data import sent_tokenize, word_tokenize
+from utils.result_cache import simplification_cache
+from utils.text_chunks import estimate_tokens, sentence_pieces, split_chunks
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+requests = lazy_import('requests')
+
+_chunk_executor = None
+_chunk_executor_lock = threading.Lock()
+
+def chunk_executor(config):
+    """Thread pool shared by every request that simplifies several chunks"""
+    global _chunk_executor
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            _chunk_executor = ThreadPoolExecutor(
+                max_workers=config.get('AI_CHUNK_WORKERS', 8),
+                thread_name_prefix='simplify-chunk'
+            )
+        return _chunk_executor
 
 class AIHelpers:
     def __init__(self, config=None):
         self.config = config or {}
         self.pipeline = None
+        self.model_server = None
         self._initialize_pipeline()
         
         
     def _initialize_pipeline(self):
-        """Initialize local transformers pipeline"""
+        """Attach the shared local transformers pipeline, or the model server client"""
         try:
-            if self.config.get('USE_LOCAL_MODELS', True):
-                # Disable TensorFlow to avoid conflicts
-                import os
-                os.environ['USE_TF'] = 'false'
-                os.environ['USE_TORCH'] = 'true'
-                
-                from transformers import pipeline
-                
-                model_name = self.config.get('AI_MODEL_NAME', 'google/flan-t5-small')
-                cache_dir = self.config.get('MODEL_CACHE_DIR', './data/ai_models')
-                
-                # Ensure cache directory exists
-                os.makedirs(cache_dir, exist_ok=True)
-                
-                print(f"Initializing local AI model: {model_name}")
-                
-                # Set environment variable for cache directory
-                os.environ['TRANSFORMERS_CACHE'] = cache_dir
-                
-                self.pipeline = pipeline(
-                    "text2text-generation",
-                    model=model_name,
-                    framework="pt"  # Force PyTorch
-                )
-                print("Local AI model initialized successfully!")
+            if self.config.get('USE_LOCAL_MODELS', True) and self.config.get('AI_MODEL_SERVER_SOCKET'):
+                # The model lives in the shared model server, not in this worker
+                self.model_server = model_server_client
+            elif self.config.get('USE_LOCAL_MODELS', True):
+                # Loaded once per worker and shared by every AIHelpers instance
+                self.pipeline = model_registry.get_pipeline(self.config)
             else:
                 self.pipeline = None
-                print("Local models disabled, using rule-based fallback")
         except Exception as e:
             print(f"Error initializing local pipeline: {e}")
             self.pipeline = None
-            self.pipeline = None
             
     def simplify_text(self, text: str) -> str:
         """
@@ -72,22 +70,224 @@ class AIHelpers:
     def _simplify_with_local_model(self, text: str) -> str:
         """Use local T5 model for text simplification"""
         try:
-            if self.pipeline:
-                prompt = f"simplify: {text}"
-                result = self.pipeline(
-                    prompt,
-                    max_length=min(len(text.split()) * 2, 512),
-                    do_sample=True,
-                    temperature=0.7,
-                    num_return_sequences=1
-                )
-                if result and len(result) > 0:
-                    return result[0]['generated_text']
+            if self.pipeline or self.model_server:
+                return self.simplify_document(text)['simplified']
             return self._simplify_rule_based(text)
         except Exception as e:
             print(f"Error with local model: {e}")
             return self._simplify_rule_based(text)
     
+    def simplify_document(self, text: str) -> Dict:
+        """
+        Simplify text of any length with the model, one chunk per prompt.
+        
+        The text is split on sentence boundaries into chunks of at most
+        AI_CHUNK_MAX_TOKENS, so long passages are not truncated. Chunks are
+        simplified concurrently (they share batches in the scheduler or the
+        model server), cached one by one and joined back in order. Returns
+        the simplified text and each chunk's token count, cache hit and time.
+        """
+        started = time.perf_counter()
+        chunks = self._chunks(text)
+        results = list(self._simplify_chunks(chunks))
+        return {
+            'simplified': ''.join(result['simplified'] + chunk['separator'] for chunk, result in zip(chunks, results)),
+            'chunks': [
+                {key: result[key] for key in ('index', 'tokens', 'cached', 'fallback', 'seconds')}
+                for result in results
+            ],
+            'seconds': round(time.perf_counter() - started, 4)
+        }
+    
+    def _chunks(self, text: str) -> List[Dict]:
+        return split_chunks(text, self.config.get('AI_CHUNK_MAX_TOKENS', 256), self._count_tokens)
+    
+    def _count_tokens(self, text: str) -> int:
+        tokenizer = getattr(self.pipeline, 'tokenizer', None)
+        if tokenizer is None:
+            return estimate_tokens(text)
+        return len(tokenizer.encode(text, add_special_tokens=False))
+    
+    def _simplify_chunks(self, chunks: List[Dict]) -> Iterator[Dict]:
+        """Yield each chunk's result in order while later chunks are still being simplified"""
+        if len(chunks) <= 1:
+            yield from (self._simplify_chunk(index, chunk['text']) for index, chunk in enumerate(chunks))
+            return
+        
+        pool = chunk_executor(self.config)
+        futures = [pool.submit(self._simplify_chunk, index, chunk['text']) for index, chunk in enumerate(chunks)]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            # Also reached when the consumer stops early: drop chunks not started yet
+            for future in futures:
+                future.cancel()
+    
+    def _simplify_chunk(self, index: int, text: str) -> Dict:
+        """Simplify one chunk, from the result cache when it has been simplified before"""
+        started = time.perf_counter()
+        params = self._generation_params(text)
+        result = {'index': index, 'tokens': self._count_tokens(text), 'cached': False, 'fallback': False}
+        try:
+            if params.get('do_sample'):
+                # Sampled outputs differ per call, so they are never cached
+                result['simplified'] = self._generate(text, params)
+            else:
+                key = simplification_cache.make_key(text, self._cache_model_name(), params)
+                cached = simplification_cache.get(key)
+                if cached is None:
+                    cached = self._generate(text, params)
+                    simplification_cache.put(key, cached, self._cache_model_name())
+                else:
+                    result['cached'] = True
+                result['simplified'] = cached
+        except Exception as e:
+            # One failed chunk falls back alone; the rest keep their model output
+            print(f"Error with local model on chunk {index}: {e}")
+            result['simplified'] = self._simplify_rule_based(text)
+            result['fallback'] = True
+        result['seconds'] = round(time.perf_counter() - started, 4)
+        return result
+    
+    def _cache_model_name(self) -> str:
+        """Model name for cache keys; int8 outputs can differ from fp32, so they are cached apart"""
+        model_name = self.config.get('AI_MODEL_NAME', 'google/flan-t5-small')
+        if self.config.get('AI_QUANTIZE_INT8'):
+            return f"{model_name}:int8"
+        return model_name
+    
+    def _generation_params(self, text: str) -> Dict:
+        """Decoding options for a simplification prompt"""
+        params = {
+            'max_length': min(len(text.split()) * 2, 512),
+            'num_return_sequences': 1
+        }
+        if self.config.get('AI_DETERMINISTIC_DECODING', True):
+            # Greedy decoding gives the same output for the same input
+            params['do_sample'] = False
+        else:
+            params['do_sample'] = True
+            params['temperature'] = 0.7
+        return params
+    
+    def _generate(self, text: str, params: Dict) -> str:
+        """Run the simplification prompt through the shared pipeline"""
+        prompt = f"simplify: {text}"
+        if self.model_server:
+            return self.model_server.generate(
+                prompt,
+                timeout=self.config.get('AI_BATCH_TIMEOUT', 60),
+                **params
+            )
+        if self.config.get('AI_BATCHING_ENABLED', True):
+            # Concurrent requests share one padded forward pass
+            scheduler = model_registry.get_scheduler(self.config)
+            return scheduler.submit(
+                prompt,
+                timeout=self.config.get('AI_BATCH_TIMEOUT', 60),
+                **params
+            )
+        result = self.pipeline(prompt, **params)
+        return result[0]['generated_text']
+    
+    def stream_simplify(self, text: str, cancelled: threading.Event) -> Iterator[str]:
+        """
+        Yield the simplified text in pieces that join to the full result.
+        
+        The local model streams a single-chunk text token by token. Longer
+        texts come chunk by chunk in order (see simplify_document), and
+        cached, rule-based and model server results sentence by sentence.
+        Setting cancelled (e.g. when the client disconnects) stops local
+        generation after the current token, or after the current chunks.
+        """
+        if not (self.config.get('USE_LOCAL_MODELS', True) and (self.pipeline or self.model_server)):
+            yield from sentence_pieces(self._simplify_rule_based(text))
+            return
+        
+        chunks = self._chunks(text)
+        if self.model_server or len(chunks) > 1:
+            for chunk, result in zip(chunks, self._simplify_chunks(chunks)):
+                if cancelled.is_set():
+                    return
+                yield from sentence_pieces(result['simplified'] + chunk['separator'])
+            return
+        
+        params = self._generation_params(text)
+        if not params.get('do_sample'):
+            cached = simplification_cache.get(simplification_cache.make_key(text, self._cache_model_name(), params))
+            if cached is not None:
+                yield from sentence_pieces(cached)
+                return
+        
+        started = False
+        try:
+            for piece in self._stream_with_slot(text, params, cancelled):
+                started = True
+                yield piece
+        except Exception as e:
+            if started:
+                raise
+            # Same fallback as simplify_text, e.g. when every stream slot is taken
+            print(f"Error with local model: {e}")
+            yield from sentence_pieces(self._simplify_rule_based(text))
+    
+    def _stream_with_slot(self, text: str, params: Dict, cancelled: threading.Event) -> Iterator[str]:
+        slots = model_registry.get_stream_slots(self.config)
+        if not slots.acquire(blocking=False):
+            raise QueueFullError('Too many simplifications are streaming')
+        try:
+            yield from self._stream_generate(text, params, cancelled)
+        finally:
+            slots.release()
+    
+    def _stream_generate(self, text: str, params: Dict, cancelled: threading.Event) -> Iterator[str]:
+        """Run generate() on a thread and yield decoded text as tokens arrive"""
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+        
+        class StopWhenCancelled(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return cancelled.is_set()
+        
+        tokenizer = self.pipeline.tokenizer
+        model = self.pipeline.model
+        streamer = TextIteratorStreamer(
+            tokenizer,
+            skip_prompt=True,
+            skip_special_tokens=True,
+            timeout=self.config.get('AI_BATCH_TIMEOUT', 60)
+        )
+        inputs = tokenizer(f"simplify: {text}", return_tensors='pt', truncation=True).to(model.device)
+        options = {name: value for name, value in params.items() if name != 'num_return_sequences'}
+        errors = []
+        
+        def generate():
+            try:
+                with inference_context(self.config):
+                    model.generate(
+                        **inputs,
+                        **options,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StopWhenCancelled()])
+                    )
+            except Exception as e:
+                errors.append(e)
+                # Unblock the reader
+                streamer.end()
+        
+        worker = threading.Thread(target=generate, name='simplify-stream', daemon=True)
+        worker.start()
+        try:
+            for piece in streamer:
+                if piece:
+                    yield piece
+        finally:
+            # Also reached when the consumer stops early: stop generating after this token
+            cancelled.set()
+        worker.join()
+        if errors:
+            raise errors[0]
+    
     def _simplify_with_huggingface(self, text: str) -> str:
         """Use HuggingFace T5 model for text simplification"""
         headers = {
@@ -117,19 +317,6 @@ class AIHelpers:
         
         return self._simplify_rule_based(text)
     
-    def _simplify_with_local_model(self, text: str) -> str:
-        """Use local T5 model for text simplification"""
-        try:
-            if self.pipeline:
-                prompt = f"simplify: {text}"
-                result = self.pipeline(prompt, max_length=len(text.split()) * 2, temperature=0.7)
-                return result[0]['generated_text']
-            else:
-                return self._simplify_rule_based(text)
-        except Exception as e:
-            print(f"Error with local model: {e}")
-            return self._simplify_rule_based(text)
-    
     def _simplify_rule_based(self, text: str) -> str:
         """Rule-based text simplification for dyslexic readers"""
         # Split into sentences
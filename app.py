@@ -1,14 +1,25 @@
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
 import os
-import csv
-import json
-from datetime import datetime
-import uuid
 from config import Config
+from cli import register_commands
+from utils.model_registry import model_registry
+from utils.model_server import model_server_client
+from utils.nltk_data import nltk_data
+from utils.result_cache import simplification_cache
+from utils.file_manager import file_manager
+from utils.response_cache import dashboard_cache
+from utils.progress_events import progress_events
+from utils.progress_rollups import progress_rollups
+from utils.recommendation_store import recommendation_store
+from utils.cohort_stats import cohort_stats
 
-app = Flask(__name__)
-app.config.from_object(Config)
-app.secret_key = app.config.get('SECRET_KEY', 'learning-disability-support-platform-2024')
+# Import all modules
+from modules.auth import admin_required, auth_bp, init_sample_users
+from modules.dyslexia import dyslexia_bp
+from modules.dyscalculia import dyscalculia_bp
+from modules.dysgraphia import dysgraphia_bp
+from modules.dyspraxia import dyspraxia_bp
+from modules.dashboard import dashboard_bp
 
 # Create necessary directories
 def create_directories():
@@ -27,30 +38,69 @@ def create_directories():
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
 
-create_directories()
-
-# Import all modules
-from modules.auth import auth_bp
-from modules.dyslexia import dyslexia_bp
-from modules.dyscalculia import dyscalculia_bp
-from modules.dysgraphia import dysgraphia_bp
-from modules.dyspraxia import dyspraxia_bp
-from modules.dashboard import dashboard_bp
-
-# Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(dyslexia_bp, url_prefix='/dyslexia')
-app.register_blueprint(dyscalculia_bp, url_prefix='/dyscalculia')
-app.register_blueprint(dysgraphia_bp, url_prefix='/dysgraphia')
-app.register_blueprint(dyspraxia_bp, url_prefix='/dyspraxia')
-app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
+def create_app(config_class=Config):
+    """Build the Flask app.
+    
+    Importing this module only defines things; the data directories, the
+    shared stores' settings and the sample users are set up here, once per
+    process (wsgi.py, `flask --app app` and `python app.py` all call it).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    app.secret_key = app.config.get('SECRET_KEY', 'learning-disability-support-platform-2024')
+    
+    create_directories()
+    file_manager.configure(app.config)
+    simplification_cache.configure(app.config)
+    model_server_client.configure(app.config)
+    nltk_data.configure(app.config)
+    dashboard_cache.configure(app.config)
+    progress_events.configure(app.config)
+    progress_rollups.configure(app.config)
+    recommendation_store.configure(app.config)
+    cohort_stats.configure(app.config)
+    init_sample_users()
+    
+    # Register blueprints
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(dyslexia_bp, url_prefix='/dyslexia')
+    app.register_blueprint(dyscalculia_bp, url_prefix='/dyscalculia')
+    app.register_blueprint(dysgraphia_bp, url_prefix='/dysgraphia')
+    app.register_blueprint(dyspraxia_bp, url_prefix='/dyspraxia')
+    app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
+    
+    app.add_url_rule('/', 'index', index)
+    app.add_url_rule('/ai/stats', 'ai_stats', ai_stats)
+    app.add_url_rule('/storage/stats', 'storage_stats', storage_stats)
+    
+    register_commands(app)
+    
+    # Load the simplification model once per worker instead of on first request
+    if app.config.get('AI_WARMUP_ON_START') and not model_server_client.enabled:
+        model_registry.warmup(app.config)
+    return app
 
-@app.route('/')
 def index():
     if 'user_id' in session:
         return redirect(url_for('dashboard.main'))
     return render_template('index.html')
 
+@admin_required
+def ai_stats():
+    """Report model registry, batching, model server and result cache metrics"""
+    return jsonify({
+        'success': True,
+        'models': model_registry.stats(),
+        'model_server': model_server_client.stats() if model_server_client.enabled else None,
+        'cache': simplification_cache.stats()
+    })
+
+@admin_required
+def storage_stats():
+    """Report write-behind queue depth and flush counters"""
+    return jsonify({'success': True, 'storage': file_manager.stats()})
+
 if __name__ == '__main__':
+    app = create_app()
     port = int(os.environ.get('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
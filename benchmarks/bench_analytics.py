@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pandas analytics engine against pure-Python aggregation
+
+Generates users and progress rows spread over the four activity datasets
+in a temporary data directory, then computes every user's dashboard
+metrics three ways:
+
+- once per user from their own rows (user_summaries.compute, what a full
+  summary rebuild does), timed on a sample and scaled to all users
+- one streaming pass over every dataset, folding rows into per-user sums
+- AnalyticsEngine.user_metrics(), cold and after an incremental refresh
+
+It also times cohort statistics and checks the engine against the
+per-user results on the sample.
+
+Usage: python benchmarks/bench_analytics.py [rows] [users]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from modules.dashboard import dashboard_data_from_summary
+from utils.analytics import METRICS, AnalyticsEngine
+from utils.datasets import DATASETS
+from utils.file_manager import file_manager
+from utils.user_summaries import SUMMARY_DATASETS, add_row, empty_summary, summary_from_rows, user_summaries
+
+SAMPLE_USERS = 50
+APPENDED_ROWS = 1000
+
+
+def values(dataset, user_id, moment, rng):
+    answer = rng.randint(0, 20)
+    row = {
+        'user_id': user_id,
+        'activity': 'practice',
+        'original_text': 'A short passage',
+        'difficulty': rng.choice(['easy', 'medium', 'hard']),
+        'word_count': rng.randint(5, 150),
+        'readability_score': 'Easy',
+        'game_type': 'phonics',
+        'score': rng.randint(0, 5),
+        'total_questions': 5,
+        'accuracy': round(rng.uniform(0, 100), 1),
+        'problem_type': 'addition',
+        'correct': rng.random() < 0.7,
+        'user_answer': answer,
+        'correct_answer': answer,
+        'text_sample': 'The quick brown fox',
+        'issues_count': rng.randint(0, 6),
+        'exercise_name': 'Stand on One Foot',
+        'duration': round(rng.uniform(5, 60), 1),
+        'stability_score': rng.randint(20, 100),
+        'timestamp': moment.isoformat(),
+    }
+    return [row[field] for field in DATASETS[dataset]['fieldnames']]
+
+
+def generate(rows, users):
+    rng = random.Random(7)
+    user_ids = [f'user_{i:05d}' for i in range(users)]
+    start = datetime(2024, 1, 1)
+
+    spec = DATASETS['users']
+    os.makedirs(os.path.dirname(spec['path']), exist_ok=True)
+    with open(spec['path'], 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(spec['fieldnames'])
+        for i, user_id in enumerate(user_ids):
+            writer.writerow([user_id, f'name{i}', f'name{i}@example.com', 'hash', rng.choice(['child', 'parent']),
+                             rng.randint(6, 14), rng.choice(['dyslexia', 'dyscalculia', 'dysgraphia']),
+                             (start + timedelta(days=rng.randint(0, 300))).isoformat()])
+
+    datasets = list(SUMMARY_DATASETS)
+    writers, files = {}, []
+    for dataset in datasets:
+        path = DATASETS[dataset]['path']
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        file = open(path, 'w', newline='', encoding='utf-8')
+        files.append(file)
+        writers[dataset] = csv.writer(file)
+        writers[dataset].writerow(DATASETS[dataset]['fieldnames'])
+    step = timedelta(seconds=max(1, 365 * 86400 // max(rows, 1)))
+    for i in range(rows):
+        dataset = datasets[i % len(datasets)]
+        writers[dataset].writerow(values(dataset, rng.choice(user_ids), start + step * i, rng))
+    for file in files:
+        file.close()
+    return user_ids
+
+
+def single_pass_metrics():
+    """Every user's summary from one streaming pass per dataset"""
+    summaries = {}
+    days = {}
+    for dataset, spec in SUMMARY_DATASETS.items():
+        for row in file_manager.iter_rows(dataset):
+            user_id = row['user_id']
+            summary = summaries.get(user_id)
+            if summary is None:
+                summary = summaries[user_id] = empty_summary()
+                days[user_id] = []
+            add_row(summary, dataset, row)
+            if spec['overall']:
+                days[user_id].append(row['timestamp'].split('T')[0])
+    return summaries, days
+
+
+def timed(label, timings, call):
+    started = time.perf_counter()
+    value = call()
+    timings[label] = time.perf_counter() - started
+    return value
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        started = time.perf_counter()
+        user_ids = generate(rows, users)
+        generate_seconds = time.perf_counter() - started
+        sample = random.Random(3).sample(user_ids, min(SAMPLE_USERS, len(user_ids)))
+
+        timings = {}
+        user_summaries.compute(user_ids[0])  # builds the per-user indexes, once
+        timed('per user (sample)', timings, lambda: [
+            dashboard_data_from_summary(user_summaries.compute(user_id)) for user_id in sample
+        ])
+        timings['per user (all users, scaled)'] = timings.pop('per user (sample)') * len(user_ids) / len(sample)
+        timed('one pure-Python pass', timings, single_pass_metrics)
+
+        engine = AnalyticsEngine()
+        metrics = timed('engine: load + metrics (cold)', timings, engine.user_metrics)
+        timed('engine: metrics (unchanged)', timings, engine.user_metrics)
+
+        rng = random.Random(11)
+        moment = datetime(2030, 1, 1)
+        for i in range(APPENDED_ROWS):
+            dataset = list(SUMMARY_DATASETS)[i % len(SUMMARY_DATASETS)]
+            row = dict(zip(DATASETS[dataset]['fieldnames'], values(dataset, rng.choice(user_ids), moment, rng)))
+            file_manager.append_csv(DATASETS[dataset]['path'], row, DATASETS[dataset]['fieldnames'])
+        file_manager.flush()
+        metrics = timed(f'engine: metrics after {APPENDED_ROWS} appends', timings, engine.user_metrics)
+        timed('engine: cohort stats by role', timings, lambda: engine.cohort_stats('role'))
+
+        for user_id in sample:
+            fresh = dashboard_data_from_summary(summary_from_rows({
+                dataset: file_manager.iter_rows(dataset, user_id=user_id) for dataset in SUMMARY_DATASETS
+            }))
+            for name in METRICS:
+                module, field = name.split('.')
+                got = metrics.at[user_id, name].item() if user_id in metrics.index else 0
+                assert abs(got - fresh[module][field]) < 1e-6, (user_id, name, got, fresh[module][field])
+
+        memory = sum(frame['bytes'] for frame in engine.stats()['frames'].values())
+
+    print(f"Dataset: {rows} rows, {users} users (generated in {generate_seconds:.1f}s); "
+          f"engine frames hold {memory / 1e6:.0f} MB")
+    for label, seconds in timings.items():
+        print(f"{label:40}{seconds * 1000:>12.1f} ms")
+    print(f"Engine metrics match per-user results for {len(sample)} users")
+
+
+if __name__ == '__main__':
+    main()
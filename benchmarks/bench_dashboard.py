@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Benchmark /dashboard/data aggregation: per-metric CSV reads vs single scan
+vs the per-user summary record
+
+Generates synthetic progress history in a temporary data directory, then
+compares the original per-metric read pattern with a summary computed from
+the raw rows and the saved summary record. All must produce byte-identical
+JSON.
+
+Usage: python benchmarks/bench_dashboard.py [users] [rows_per_module]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.file_manager import file_manager
+from utils.user_summaries import streak_from_dates, user_summaries
+from modules.dashboard import dashboard_data_from_summary
+
+FIELDS = {
+    'dyslexia/progress.csv': ['user_id', 'activity', 'original_text', 'difficulty', 'word_count', 'readability_score', 'timestamp'],
+    'dyslexia/games.csv': ['user_id', 'game_type', 'difficulty', 'score', 'total_questions', 'accuracy', 'timestamp'],
+    'dyscalculia/progress.csv': ['user_id', 'problem_type', 'difficulty', 'correct', 'user_answer', 'correct_answer', 'timestamp'],
+    'dysgraphia/progress.csv': ['user_id', 'activity', 'text_sample', 'word_count', 'issues_count', 'timestamp'],
+    'dyspraxia/progress.csv': ['user_id', 'activity', 'exercise_name', 'duration', 'stability_score', 'timestamp'],
+}
+
+
+def make_row(path, user_id, timestamp):
+    values = {
+        'user_id': user_id,
+        'activity': 'activity',
+        'original_text': 'some text',
+        'difficulty': random.choice(['Easy', 'Medium', 'Hard']),
+        'word_count': random.randint(1, 120),
+        'readability_score': 'Easy',
+        'game_type': 'phonics',
+        'score': random.randint(0, 5),
+        'total_questions': 5,
+        'accuracy': round(random.uniform(0, 100), 2),
+        'problem_type': 'arithmetic',
+        'correct': random.choice([True, False]),
+        'user_answer': random.randint(0, 20),
+        'correct_answer': random.randint(0, 20),
+        'text_sample': 'Line one\nline two',
+        'issues_count': random.randint(0, 6),
+        'exercise_name': 'Stand on One Foot',
+        'duration': round(random.uniform(1, 20), 3),
+        'stability_score': random.randint(0, 100),
+        'timestamp': timestamp,
+    }
+    return {field: values[field] for field in FIELDS[path]}
+
+
+def generate(users, rows_per_module):
+    random.seed(7)
+    start = datetime(2025, 1, 1)
+    user_ids = [f'user_{i:04d}' for i in range(users)]
+    for path, fieldnames in FIELDS.items():
+        rows = []
+        for i in range(rows_per_module):
+            timestamp = (start + timedelta(minutes=37 * i)).isoformat()
+            rows.append(make_row(path, random.choice(user_ids), timestamp))
+        file_manager.write_csv(os.path.join('data', path), rows, fieldnames)
+    return user_ids
+
+PROGRESS_MODULES = ['dyslexia', 'dyscalculia', 'dysgraphia', 'dyspraxia']
+
+RECENT_ACTIVITY_LIMIT = 5
+
+
+def summarize_dyslexia(user_progress, user_games):
+    total_games = len(user_games)
+    total_accuracy = sum(float(g.get('accuracy', 0)) for g in user_games)
+    avg_accuracy = total_accuracy / total_games if total_games else 0
+    return {
+        'total_sessions': len(user_progress),
+        'total_games': total_games,
+        'avg_accuracy': round(avg_accuracy, 1),
+        'recent_activity': user_progress[-RECENT_ACTIVITY_LIMIT:]
+    }
+
+
+def summarize_dyscalculia(user_progress):
+    total_answers = len(user_progress)
+    correct_answers = sum(1 for p in user_progress if p.get('correct') == 'True')
+    return {
+        'total_problems': total_answers,
+        'correct_answers': correct_answers,
+        'accuracy': (correct_answers / total_answers * 100) if total_answers > 0 else 0,
+        'recent_activity': user_progress[-RECENT_ACTIVITY_LIMIT:]
+    }
+
+
+def summarize_dysgraphia(user_progress):
+    total_sessions = len(user_progress)
+    total_words = sum(int(p.get('word_count', 0)) for p in user_progress)
+    return {
+        'total_sessions': total_sessions,
+        'total_words_written': total_words,
+        'avg_words_per_session': total_words / total_sessions if total_sessions else 0,
+        'recent_activity': user_progress[-RECENT_ACTIVITY_LIMIT:]
+    }
+
+
+def summarize_dyspraxia(user_progress):
+    total_exercises = len(user_progress)
+    total_stability = sum(float(p.get('stability_score', 0)) for p in user_progress)
+    total_duration = 0
+    for p in user_progress:
+        total_duration += float(p.get('duration', 0))
+    avg_stability = total_stability / total_exercises if total_exercises else 0
+    return {
+        'total_exercises': total_exercises,
+        'avg_stability': round(avg_stability, 1),
+        'total_duration': total_duration,
+        'recent_activity': user_progress[-RECENT_ACTIVITY_LIMIT:]
+    }
+
+
+def baseline_dashboard_data(user_id):
+    """The per-metric read pattern /dashboard/data used before the single scan"""
+    def user_rows(path):
+        return [p for p in file_manager.read_csv(path) if p['user_id'] == user_id]
+
+    def all_dates():
+        dates = []
+        for module in PROGRESS_MODULES:
+            for activity in user_rows(f'data/{module}/progress.csv'):
+                if 'timestamp' in activity:
+                    dates.append(activity['timestamp'].split('T')[0])
+        return dates
+
+    total = sum(len(user_rows(f'data/{m}/progress.csv')) for m in PROGRESS_MODULES)
+    return {
+        'dyslexia': summarize_dyslexia(
+            user_rows('data/dyslexia/progress.csv'), user_rows('data/dyslexia/games.csv')),
+        'dyscalculia': summarize_dyscalculia(user_rows('data/dyscalculia/progress.csv')),
+        'dysgraphia': summarize_dysgraphia(user_rows('data/dysgraphia/progress.csv')),
+        'dyspraxia': summarize_dyspraxia(user_rows('data/dyspraxia/progress.csv')),
+        'overall_stats': {
+            'total_activities': total,
+            'active_days': len(set(all_dates())),
+            'streak': streak_from_dates(all_dates())
+        }
+    }
+
+
+def computed_dashboard_data(user_id):
+    """One streaming pass over the user's rows, as the summary rebuild does"""
+    return dashboard_data_from_summary(user_summaries.compute(user_id))
+
+
+def saved_dashboard_data(user_id):
+    """What /dashboard/data serves: the incrementally maintained summary record"""
+    return dashboard_data_from_summary(user_summaries.get(user_id))
+
+
+def measure(build, user_ids):
+    reads = [0]
+    originals = {name: getattr(file_manager, name) for name in ('read_csv', 'read_user', 'iter_rows')}
+
+    def counting(original):
+        def read(*args, **kwargs):
+            reads[0] += 1
+            return original(*args, **kwargs)
+        return read
+
+    for name, original in originals.items():
+        setattr(file_manager, name, counting(original))
+    original_json = file_manager.read_json
+    file_manager.read_json = counting(original_json)
+    try:
+        started = time.perf_counter()
+        payloads = [json.dumps(build(user_id), sort_keys=True) for user_id in user_ids]
+        elapsed = time.perf_counter() - started
+    finally:
+        for name, original in originals.items():
+            setattr(file_manager, name, original)
+        file_manager.read_json = original_json
+    return payloads, reads[0] / len(user_ids), elapsed / len(user_ids)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        user_ids = generate(users, rows)
+        sample = user_ids[:25]
+        # Build the per-user indexes up front, as the migrate command would
+        for path in FIELDS:
+            file_manager.read_user(os.path.join('data', path), sample[0])
+
+        before, before_reads, before_time = measure(baseline_dashboard_data, sample)
+        after, after_reads, after_time = measure(computed_dashboard_data, sample)
+        # Summaries are built once (as the first dashboard view or the rebuild command would)
+        for user_id in sample:
+            user_summaries.get(user_id)
+        summary, summary_reads, summary_time = measure(saved_dashboard_data, sample)
+
+    assert before == after, 'dashboard JSON differs between baseline and single scan'
+    assert before == summary, 'dashboard JSON differs between baseline and summary record'
+
+    print(f"Dataset: {users} users, {rows} rows per file ({len(FIELDS)} files)")
+    print(f"{'':14}{'dataset reads':>15}{'ms/request':>12}")
+    print(f"{'per-metric':14}{before_reads:>15.0f}{before_time * 1000:>12.1f}")
+    print(f"{'single pass':14}{after_reads:>15.0f}{after_time * 1000:>12.1f}")
+    print(f"{'summary':14}{summary_reads:>15.0f}{summary_time * 1000:>12.1f}")
+    print(f"Speedup: {before_time / after_time:.1f}x single pass, {before_time / summary_time:.1f}x summary; "
+          f"JSON identical for {len(sample)} users")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CPU inference profiles of the simplification model
+
+Loads the model as fp32 (the baseline) and as dynamic int8, quantized at
+load and from a pre-quantized checkpoint, each through ModelRegistry as the
+app does. For each profile it reports:
+
+- load time, weight memory and process RSS growth
+- single-prompt latency (p50/p95), as an uncached /simplify request sees it
+- throughput with prompts batched as BatchScheduler runs them
+- output drift against fp32: exact matches and mean word-level similarity
+
+Torch thread counts apply to the whole process, so they are set once from
+the threads argument (0 keeps torch's default) for every profile.
+
+Usage: python benchmarks/bench_inference.py [repeats] [threads] [interop_threads]
+"""
+
+import difflib
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from config import Config
+from utils import inference_profile
+from utils.model_registry import ModelRegistry
+
+TEXTS = [
+    "The magnificent elephant demonstrated extraordinary intelligence while investigating the complex problem presented by the researchers.",
+    "Photosynthesis is the process by which green plants utilize sunlight to synthesize nutrients from carbon dioxide and water.",
+    "Consequently, the committee decided to postpone the meeting until further information could be acquired from the regional offices.",
+    "Although the weather was unpredictable, the explorers continued their journey across the enormous frozen landscape.",
+    "The ancient manuscript, which had been preserved in the monastery for centuries, contained detailed astronomical observations.",
+    "Nevertheless, the students were able to demonstrate a thorough understanding of the fundamental principles of multiplication.",
+    "Volcanic eruptions can diminish global temperatures because ash particles reflect sunlight back into space.",
+    "The librarian recommended several books that would help the children commence their research on marine ecosystems.",
+]
+BATCH_SIZE = 8
+
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def generation_params(text):
+    # Same decoding options as AIHelpers with AI_DETERMINISTIC_DECODING
+    return {'max_length': min(len(text.split()) * 2, 512), 'num_return_sequences': 1, 'do_sample': False}
+
+
+def run_profile(config, repeats):
+    registry = ModelRegistry()
+    rss_before = rss_bytes()
+    pipe = registry.get_pipeline(config)
+    stats = registry.stats()[0]
+
+    outputs = [pipe(f"simplify: {text}", **generation_params(text))[0]['generated_text'] for text in TEXTS]
+    latencies = []
+    for _ in range(repeats):
+        for text in TEXTS:
+            started = time.perf_counter()
+            pipe(f"simplify: {text}", **generation_params(text))
+            latencies.append(time.perf_counter() - started)
+
+    prompts = [f"simplify: {text}" for text in TEXTS] * repeats
+    params = generation_params(max(TEXTS, key=len))
+    started = time.perf_counter()
+    pipe(prompts, batch_size=BATCH_SIZE, **params)
+    batch_seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'load_seconds': stats['load_time'],
+        'weights_mb': stats['memory_bytes'] / 1e6,
+        'rss_mb': (rss_bytes() - rss_before) / 1e6,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+        'throughput': len(prompts) / batch_seconds,
+        'outputs': outputs,
+    }
+
+
+def drift(outputs, baseline):
+    exact = sum(a == b for a, b in zip(outputs, baseline)) / len(baseline)
+    similarity = statistics.mean(
+        difflib.SequenceMatcher(None, a.split(), b.split()).ratio() for a, b in zip(outputs, baseline)
+    )
+    return exact, similarity
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    interop_threads = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    base = {key: value for key, value in vars(Config).items() if key.isupper()}
+    base.update(AI_TORCH_THREADS=threads, AI_TORCH_INTEROP_THREADS=interop_threads)
+    inference_profile.apply_thread_settings(base)
+
+    import torch
+    print(f"torch {torch.__version__}: {torch.get_num_threads()} intra-op, "
+          f"{torch.get_num_interop_threads()} inter-op threads; {os.cpu_count()} CPUs")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        checkpoint = os.path.join(workdir, 'model-int8.pt')
+        profiles = {
+            'fp32': dict(base, AI_QUANTIZE_INT8=False),
+            'int8, quantized at load': dict(base, AI_QUANTIZE_INT8=True, AI_QUANTIZED_CHECKPOINT=None),
+        }
+        results = {label: run_profile(config, repeats) for label, config in profiles.items()}
+
+        from transformers import AutoModelForSeq2SeqLM
+        model = AutoModelForSeq2SeqLM.from_pretrained(base['AI_MODEL_NAME'], cache_dir=base['MODEL_CACHE_DIR'])
+        model = inference_profile.quantize_int8(inference_profile.prepare_for_inference(model))
+        inference_profile.save_quantized(model, checkpoint, base['AI_MODEL_NAME'])
+        del model
+        checkpoint_mb = os.path.getsize(checkpoint) / 1e6
+        results['int8, from checkpoint'] = run_profile(
+            dict(base, AI_QUANTIZE_INT8=True, AI_QUANTIZED_CHECKPOINT=checkpoint), repeats
+        )
+
+    baseline = results['fp32']['outputs']
+    print(f"{len(TEXTS)} prompts x {repeats} repeats; batches of {BATCH_SIZE}; int8 checkpoint {checkpoint_mb:.1f} MB")
+    print(f"{'profile':26}{'load s':>8}{'weights MB':>12}{'RSS MB':>9}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'prompts/s':>11}{'exact':>8}{'similarity':>12}")
+    for label, result in results.items():
+        exact, similarity = drift(result['outputs'], baseline)
+        print(f"{label:26}{result['load_seconds']:>8.2f}{result['weights_mb']:>12.1f}{result['rss_mb']:>9.1f}"
+              f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['throughput']:>11.2f}"
+              f"{exact:>8.0%}{similarity:>12.3f}")
+    for text, fp32, int8 in zip(TEXTS, baseline, results['int8, quantized at load']['outputs']):
+        if fp32 != int8:
+            print(f"\n  {text}\n  fp32: {fp32}\n  int8: {int8}")
+
+
+if __name__ == '__main__':
+    main()
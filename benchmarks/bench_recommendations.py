@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batch recommendation job in users per second
+
+Generates users and progress rows in a temporary data directory (see
+bench_analytics.py), builds every user's summary, then evaluates dashboard
+recommendations and learning patterns for all users:
+
+- inline, one user at a time, as /dashboard/data used to on every request
+- RecommendationStore.precompute() with one process and with several
+- serving the stored results, and recomputing only users with new activity
+
+and times the rule evaluator alone, per user and as one batch, with the
+shipped rules and with SYNTHETIC_RULES more.
+
+Usage: python benchmarks/bench_recommendations.py [rows] [users] [workers]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_analytics import generate, values
+from modules.dashboard import PATTERN_RULES, RECOMMENDATION_RULES, dashboard_ai, dashboard_data_from_summary, learner_insights, learner_insights_many
+from utils.datasets import DATASETS
+from utils.file_manager import file_manager
+from utils.progress_writes import record_progress
+from utils.recommendation_store import RecommendationStore
+from utils.rule_engine import RuleEvaluator
+from utils.user_summaries import SUMMARY_DATASETS, user_summaries
+
+ACTIVE_USERS = 200
+SYNTHETIC_RULES = 500
+
+
+def synthetic_rules(count, rng):
+    metrics = [metric for rule in RECOMMENDATION_RULES + PATTERN_RULES for metric, _, _ in rule['when']]
+    return [
+        {'when': [(rng.choice(metrics), rng.choice(['<', '>']), rng.randint(0, 100)) for _ in range(rng.randint(1, 3))],
+         'group': rng.choice([None, f'group{rng.randint(0, 50)}'])}
+        for _ in range(count)
+    ]
+
+
+def timed(label, timings, users, call):
+    started = time.perf_counter()
+    value = call()
+    timings[label] = (time.perf_counter() - started, users)
+    return value
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else (os.cpu_count() or 1)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        user_ids = generate(rows, users)
+        started = time.perf_counter()
+        summaries = user_summaries.get_many(user_ids)
+        summary_seconds = time.perf_counter() - started
+
+        timings = {}
+        datas = [dashboard_data_from_summary(summaries[user_id]) for user_id in user_ids]
+        timed('rules: per user', timings, len(datas), lambda: [dashboard_ai.insights(data) for data in datas])
+        timed('rules: one batch', timings, len(datas), lambda: dashboard_ai.insights_many(datas))
+        rules = RECOMMENDATION_RULES + PATTERN_RULES + synthetic_rules(SYNTHETIC_RULES, random.Random(1))
+        evaluator = RuleEvaluator(rules, dashboard_ai.performance_thresholds)
+        timed(f'{len(rules)} rules: per user', timings, len(datas), lambda: [evaluator.evaluate(data) for data in datas])
+        timed(f'{len(rules)} rules: one batch', timings, len(datas),
+              lambda: evaluator.evaluate_many([evaluator.vector(data) for data in datas]))
+
+        store = RecommendationStore()
+        inline = timed('inline, per request', timings, len(user_ids), lambda: {
+            user_id: learner_insights(user_summaries.get(user_id)) for user_id in user_ids
+        })
+        timed('precompute, workers=1', timings, len(user_ids),
+              lambda: store.precompute(user_ids, learner_insights_many, workers=1))
+        timed(f'precompute, workers={workers}', timings, len(user_ids),
+              lambda: store.precompute(user_ids, learner_insights_many, workers=workers))
+        served = timed('serve stored results', timings, len(user_ids), lambda: {
+            user_id: store.get_for(user_id, user_summaries.get(user_id), learner_insights) for user_id in user_ids
+        })
+
+        rng = random.Random(5)
+        active = rng.sample(user_ids, min(ACTIVE_USERS, len(user_ids)))
+        for user_id in active:
+            dataset = rng.choice(list(SUMMARY_DATASETS))
+            spec = DATASETS[dataset]
+            row = dict(zip(spec['fieldnames'], values(dataset, user_id, datetime(2030, 1, 1), rng)))
+            record_progress(spec['path'], row, spec['fieldnames'])
+        file_manager.flush()
+        timed(f'serve after activity from {len(active)} users', timings, len(user_ids), lambda: [
+            store.get_for(user_id, user_summaries.get(user_id), learner_insights) for user_id in user_ids
+        ])
+        stats = store.stats()
+
+        for user_id in user_ids:
+            assert served[user_id]['recommendations'] == inline[user_id]['recommendations'], user_id
+            assert served[user_id]['learning_patterns'] == inline[user_id]['learning_patterns'], user_id
+
+    print(f"Dataset: {rows} rows, {users} users; summaries built in {summary_seconds:.1f}s")
+    for label, (seconds, count) in timings.items():
+        print(f"{label:40}{seconds * 1000:>12.1f} ms{count / seconds:>12.0f} users/s")
+    print(f"Served {stats['served']} stored results, recomputed {stats['recomputed']} users; "
+          f"stored results match inline evaluation")
+
+
+if __name__ == '__main__':
+    main()
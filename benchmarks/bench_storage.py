@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Benchmark the CSV and SQLite storage backends
+
+Generates one large dyscalculia progress dataset in a temporary data
+directory, imports it into SQLite, then times the same FileManager calls
+on both backends and checks they return the same results.
+
+Usage: python benchmarks/bench_storage.py [rows] [users]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.datasets import DATASETS
+from utils.file_manager import FileManager
+from utils.sqlite_store import SQLiteStore
+
+DATASET = 'dyscalculia_progress'
+PATH = DATASETS[DATASET]['path']
+FIELDNAMES = DATASETS[DATASET]['fieldnames']
+SQLITE_PATH = 'data/storage.db'
+
+
+def generate(rows, users):
+    random.seed(7)
+    start = datetime(2024, 1, 1)
+    user_ids = [f'user_{i:05d}' for i in range(users)]
+    os.makedirs(os.path.dirname(PATH), exist_ok=True)
+    with open(PATH, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDNAMES)
+        for i in range(rows):
+            answer = random.randint(0, 20)
+            writer.writerow([
+                random.choice(user_ids), 'addition', random.choice(['easy', 'medium', 'hard']),
+                random.random() < 0.7, answer, answer if random.random() < 0.7 else answer + 1,
+                (start + timedelta(seconds=30 * i)).isoformat()
+            ])
+    return user_ids
+
+
+def timed(label, results, call, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        value = call()
+    results[label] = (time.perf_counter() - started) * 1000 / repeat
+    return value
+
+
+def run(manager, sample, results):
+    outputs = {}
+    outputs['read_user'] = timed('read_user (per user)', results,
+                                 lambda: [manager.read_user(DATASET, u) for u in sample], 1)
+    outputs['recent'] = timed('newest 10 (per user)', results,
+                              lambda: [manager.query(DATASET, user_id=u, newest_first=True, limit=10) for u in sample], 1)
+    outputs['aggregate'] = timed('aggregate (per user)', results, lambda: [
+        manager.aggregate(DATASET, {'total': ('count', None), 'answers': ('avg', 'user_answer')}, user_id=u)
+        for u in sample
+    ], 1)
+    outputs['correct'] = timed('count correct (per user)', results, lambda: [
+        manager.aggregate(DATASET, {'n': ('count', None)}, user_id=u, where={'correct': True}) for u in sample
+    ], 1)
+    outputs['dates'] = timed('active dates (per user)', results,
+                             lambda: [manager.active_dates(u, [DATASET]) for u in sample], 1)
+    outputs['range'] = timed('one day, all users', results, lambda: manager.query(
+        DATASET, since='2024-01-05', until='2024-01-06'), 1)
+    outputs['count_by_user'] = timed('count by user', results, lambda: manager.count_by_user(DATASET), 1)
+    timed('full read', results, lambda: len(manager.read_csv(PATH)), 1)
+    timed('append (per row)', results, lambda: [manager.append_csv(PATH, {
+        'user_id': u, 'problem_type': 'addition', 'difficulty': 'easy', 'correct': True,
+        'user_answer': 1, 'correct_answer': 1, 'timestamp': '2030-01-01T00:00:00'
+    }, FIELDNAMES) for u in sample], 1)
+    for label in ('read_user (per user)', 'newest 10 (per user)', 'aggregate (per user)',
+                  'count correct (per user)', 'active dates (per user)', 'append (per row)'):
+        results[label] /= len(sample)
+    return outputs
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        user_ids = generate(rows, users)
+        sample = random.Random(3).sample(user_ids, 50)
+
+        started = time.perf_counter()
+        SQLiteStore(SQLITE_PATH).import_csv(DATASET, PATH)
+        import_seconds = time.perf_counter() - started
+
+        timings = {}
+        outputs = {}
+        for backend in ('csv', 'sqlite'):
+            manager = FileManager()
+            manager.configure({'STORAGE_BACKEND': backend, 'SQLITE_STORAGE_PATH': SQLITE_PATH})
+            started = time.perf_counter()
+            manager.read_user(DATASET, sample[0])  # opens the database / builds the per-user index
+            timings[backend] = {'first query (cold)': (time.perf_counter() - started) * 1000}
+            outputs[backend] = run(manager, sample, timings[backend])
+
+    for key, expected in outputs['csv'].items():
+        assert outputs['sqlite'][key] == expected, f'{key} differs between backends'
+
+    print(f"Dataset: {rows} rows, {users} users; SQLite import took {import_seconds:.1f}s")
+    print(f"{'ms':28}{'csv':>12}{'sqlite':>12}")
+    for label in timings['csv']:
+        print(f"{label:28}{timings['csv'][label]:>12.2f}{timings['sqlite'][label]:>12.2f}")
+    print(f"Results identical for {len(sample)} users")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import os
+import time
+
+import click
+
+from modules.dashboard import learner_insights_many
+from utils import import_report as import_timing
+from utils import inference_profile
+from utils.analytics import COHORT_COLUMNS, METRICS, analytics
+from utils.cohort_stats import cohort_stats as saved_cohort_stats
+from utils.datasets import DATASETS
+from utils.model_server import ModelServer, ModelServerError
+from utils.progress_rollups import progress_rollups
+from utils.progress_store import progress_store
+from utils.recommendation_store import recommendation_store
+from utils.result_cache import simplification_cache
+from utils.sqlite_store import SQLiteStore
+from utils.user_summaries import user_summaries
+
+
+def register_commands(app):
+    """Attach maintenance commands to the Flask CLI"""
+
+    @app.cli.command('migrate-progress-index')
+    def migrate_progress_index():
+        """Rebuild the per-user and activity-id index of every CSV dataset"""
+        for name, spec in DATASETS.items():
+            rows, users, activities = progress_store.rebuild(spec['path'])
+            click.echo(f"{name}: indexed {rows} rows for {users} users ({activities} activity ids)")
+
+    @app.cli.command('import-csv-to-sqlite')
+    def import_csv_to_sqlite():
+        """Copy every CSV dataset into the SQLite storage database"""
+        store = SQLiteStore(app.config.get('SQLITE_STORAGE_PATH', 'data/storage.db'))
+        for name, spec in DATASETS.items():
+            if not os.path.exists(spec['path']):
+                click.echo(f"{name}: no CSV at {spec['path']}, skipped")
+                continue
+            rows = store.import_csv(name, spec['path'])
+            click.echo(f"{name}: imported {rows} rows")
+        click.echo(f"Done. Set STORAGE_BACKEND=sqlite to serve from {store.path}")
+
+    @app.cli.command('rebuild-user-summaries')
+    def rebuild_user_summaries():
+        """Recompute every user's dashboard summary from raw rows and report drift"""
+        users = user_summaries.user_ids()
+        drifted = 0
+        for user_id in users:
+            drift = user_summaries.rebuild(user_id)
+            if drift:
+                drifted += 1
+                click.echo(f"{user_id}: {', '.join(drift)}")
+        click.echo(f"Rebuilt {len(users)} summaries, {drifted} had drifted")
+
+    @app.cli.command('compact-progress-rollups')
+    def compact_progress_rollups():
+        """Drop day and week trend buckets past their retention"""
+        files, removed = progress_rollups.compact_all()
+        click.echo(f"Compacted {files} rollups, removed {removed} buckets")
+
+    @app.cli.command('precompute-recommendations')
+    @click.option('--user', 'user_ids', multiple=True, help='Only these users (repeatable)')
+    @click.option('--workers', type=int, default=None, help='Worker processes (default RECOMMENDATIONS_BATCH_WORKERS)')
+    def precompute_recommendations(user_ids, workers):
+        """Store every user's dashboard recommendations and learning patterns"""
+        users = list(user_ids) or user_summaries.user_ids()
+        started = time.perf_counter()
+        stored = recommendation_store.precompute(users, learner_insights_many, workers=workers)
+        seconds = time.perf_counter() - started
+        rate = stored / seconds if seconds else 0
+        click.echo(f"Stored recommendations for {stored} of {len(users)} users in {seconds:.1f}s ({rate:.0f} users/s)")
+
+    @app.cli.command('model-server')
+    @click.option('--workers', type=int, default=None, help='Model worker processes (default AI_MODEL_WORKERS)')
+    @click.option('--socket', 'address', default=None, help='Unix socket path (default AI_MODEL_SERVER_SOCKET)')
+    def model_server(workers, address):
+        """Serve the simplification model to every web worker on this host"""
+        config = dict(app.config)
+        if workers is not None:
+            config['AI_MODEL_WORKERS'] = workers
+        config['AI_MODEL_SERVER_SOCKET'] = address or config.get('AI_MODEL_SERVER_SOCKET') or 'data/model_server.sock'
+        try:
+            server = ModelServer(config)
+        except ModelServerError as e:
+            raise click.ClickException(str(e))
+        server.serve_forever()
+
+    @app.cli.command('clear-ai-cache')
+    @click.option('--max-entries', type=int, default=None, help='Keep only the newest N results on disk (0 removes all)')
+    @click.option('--max-age-seconds', type=float, default=None, help='Remove results older than this from disk')
+    def clear_ai_cache(max_entries, max_age_seconds):
+        """Evict cached simplification results from the shared disk tier"""
+        if max_entries is None and max_age_seconds is None:
+            raise click.UsageError('Pass --max-entries and/or --max-age-seconds')
+        removed = simplification_cache.prune_disk(max_entries=max_entries, max_age_seconds=max_age_seconds)
+        click.echo(f"Removed {removed} cached results from {simplification_cache.cache_dir}")
+
+    @app.cli.command('quantize-model')
+    @click.option('--output', default=None, help='Checkpoint path (default AI_QUANTIZED_CHECKPOINT)')
+    def quantize_model(output):
+        """Write the int8 checkpoint that AI_QUANTIZE_INT8 workers load"""
+        from transformers import AutoModelForSeq2SeqLM
+
+        model_name = app.config.get('AI_MODEL_NAME', 'google/flan-t5-small')
+        path = output or app.config.get('AI_QUANTIZED_CHECKPOINT')
+        started = time.perf_counter()
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, cache_dir=app.config.get('MODEL_CACHE_DIR'))
+        model = inference_profile.quantize_int8(inference_profile.prepare_for_inference(model))
+        inference_profile.save_quantized(model, path, model_name)
+        size = os.path.getsize(path) / 1e6
+        click.echo(f"Wrote {model_name} (int8) to {path}: {size:.1f} MB in {time.perf_counter() - started:.1f}s")
+
+    @app.cli.command('import-report')
+    @click.option('--top', type=int, default=15, help='Modules to list')
+    def import_report(top):
+        """Time a cold start (import app + create_app) in a fresh interpreter"""
+        report = import_timing.measure(cwd=app.root_path)
+        click.echo(import_timing.format_report(report, app.config.get('STARTUP_IMPORT_BUDGET_MS', 800), top))
+
+    @app.cli.command('precompute-cohort-stats')
+    def precompute_cohort_stats():
+        """Save the cohort distributions /dashboard/compare reads"""
+        started = time.perf_counter()
+        snapshot = saved_cohort_stats.precompute(analytics)
+        cohorts = sum(len(groups) for groups in snapshot['cohorts'].values())
+        click.echo(f"Saved {cohorts} cohorts to {saved_cohort_stats.path} in {time.perf_counter() - started:.1f}s")
+
+    @app.cli.command('cohort-stats')
+    @click.option('--by', type=click.Choice(COHORT_COLUMNS), default='role', help='User column to group by')
+    def cohort_stats(by):
+        """Print user counts and dashboard metric distributions per cohort"""
+        for cohort, group in analytics.cohort_stats(by).items():
+            click.echo(f"{by}={cohort}: {group['users']} users, {group['active_users']} active")
+            for name in METRICS:
+                metric = group['metrics'][name]
+                click.echo(f"  {name:36} mean {metric['mean']:>10} median {metric['median']:>10} p90 {metric['p90']:>10}")
+        loaded = analytics.stats()
+        click.echo(f"Loaded {loaded['rows_loaded']} rows into {len(loaded['frames'])} frames")
@@ -9,6 +9,96 @@ class Config:
     AI_MODEL_NAME = "google/flan-t5-small"
     USE_LOCAL_MODELS = True
     MODEL_CACHE_DIR = "data/ai_models"
+    AI_WARMUP_ON_START = os.environ.get('AI_WARMUP_ON_START', 'False').lower() == 'true'
+    
+    # Micro-batching of concurrent simplification requests
+    AI_BATCHING_ENABLED = True
+    AI_BATCH_MAX_SIZE = 8
+    AI_BATCH_MAX_WAIT_MS = 10
+    AI_BATCH_QUEUE_DEPTH = 64
+    AI_BATCH_TIMEOUT = 60  # seconds a request waits for its batch
+    
+    # Long texts are simplified as chunks of at most this many tokens (split on
+    # sentence boundaries) on one shared pool of AI_CHUNK_WORKERS threads per
+    # worker, each cached on its own
+    AI_CHUNK_MAX_TOKENS = 256
+    AI_CHUNK_WORKERS = 8
+    
+    # Streamed simplifications run their own generate() each; at most this many per worker
+    AI_STREAM_MAX_CONCURRENT = 2
+    
+    # CPU inference profile: dynamic int8 quantization of the Linear layers
+    # (`flask quantize-model` writes the checkpoint so workers skip quantizing
+    # at load) and torch thread counts; 0 threads keeps torch's default
+    AI_QUANTIZE_INT8 = os.environ.get('AI_QUANTIZE_INT8', 'False').lower() == 'true'
+    AI_QUANTIZED_CHECKPOINT = "data/ai_models/flan-t5-small-int8.pt"
+    AI_TORCH_THREADS = int(os.environ.get('AI_TORCH_THREADS', 0))
+    AI_TORCH_INTEROP_THREADS = int(os.environ.get('AI_TORCH_INTEROP_THREADS', 0))
+    AI_INFERENCE_MODE = True
+    
+    # Shared model server (flask model-server): when the socket is set, web
+    # workers send simplifications there instead of loading the model each
+    AI_MODEL_SERVER_SOCKET = os.environ.get('AI_MODEL_SERVER_SOCKET', '')
+    # Shared by the server and web workers; falls back to SECRET_KEY, never the default one
+    AI_MODEL_SERVER_AUTHKEY = os.environ.get('AI_MODEL_SERVER_AUTHKEY', '')
+    AI_MODEL_WORKERS = int(os.environ.get('AI_MODEL_WORKERS', 1))
+    AI_MODEL_SERVER_QUEUE_DEPTH = 64
+    
+    # Simplification result cache (greedy decoding keeps results reusable)
+    AI_DETERMINISTIC_DECODING = True
+    AI_CACHE_ENABLED = True
+    AI_CACHE_MAX_ENTRIES = 1024
+    AI_CACHE_DIR = "data/ai_models/simplification_cache"
+    
+    # NLTK data is looked up on first use; set False on boxes without network access
+    NLTK_AUTO_DOWNLOAD = os.environ.get('NLTK_AUTO_DOWNLOAD', 'True').lower() == 'true'
+    
+    # Cold `import app` + create_app() budget, checked by test_startup_time.py
+    # and reported by `flask import-report`
+    STARTUP_IMPORT_BUDGET_MS = int(os.environ.get('STARTUP_IMPORT_BUDGET_MS', 800))
+    
+    # CSV storage: buffer appends off the request thread and write them in groups
+    CSV_WRITE_BEHIND = os.environ.get('CSV_WRITE_BEHIND', 'True').lower() == 'true'
+    CSV_FLUSH_MAX_ROWS = 64
+    CSV_FLUSH_INTERVAL_MS = 50
+    CSV_DURABILITY = os.environ.get('CSV_DURABILITY', 'batch')  # 'none', 'batch' or 'row' (fsync)
+    
+    # Dataset storage: 'csv' files or an embedded 'sqlite' database (WAL mode)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'csv')
+    SQLITE_STORAGE_PATH = os.environ.get('SQLITE_STORAGE_PATH', 'data/storage.db')
+    
+    # /dashboard/data responses cached per user until their next progress write
+    DASHBOARD_CACHE_ENABLED = True
+    DASHBOARD_CACHE_MAX_ENTRIES = 1024
+    
+    # Trend rollups: day buckets kept 120 days, week buckets 3 years, months forever
+    ROLLUP_DAY_RETENTION_DAYS = 120
+    ROLLUP_WEEK_RETENTION_WEEKS = 156
+    ROLLUP_COMPACT_INTERVAL_SECONDS = int(os.environ.get('ROLLUP_COMPACT_INTERVAL_SECONDS', 6 * 3600))
+    
+    # Parent/teacher group dashboards: groups this large use a thread pool
+    GROUP_DASHBOARD_WORKERS = 4
+    GROUP_DASHBOARD_PARALLEL_MIN = 16
+    # Usernames allowed to read the operational /*/stats endpoints (comma-separated)
+    ADMIN_USERNAMES = [name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()]
+    # One-time codes learners issue (on their profile) for a parent or teacher to link with them
+    LINK_CODE_TTL_SECONDS = 15 * 60
+    
+    # Dashboard recommendations: stored per user by the precompute-recommendations job
+    # (run nightly) and recomputed for one user on their next visit after new activity
+    RECOMMENDATIONS_PRECOMPUTED = True
+    RECOMMENDATIONS_BATCH_WORKERS = int(os.environ.get('RECOMMENDATIONS_BATCH_WORKERS', os.cpu_count() or 1))
+    RECOMMENDATIONS_BATCH_CHUNK_SIZE = 500
+    
+    # /dashboard/compare reads cohort distributions saved by the precompute-cohort-stats job (run nightly)
+    COHORT_STATS_PATH = 'data/analytics/cohort_stats.json'
+    
+    # /dashboard/stream server-sent events. Each open stream holds a worker thread, so
+    # run gunicorn with threads (e.g. --worker-class gthread --threads 32) to use them
+    DASHBOARD_STREAM_MAX_PER_WORKER = int(os.environ.get('DASHBOARD_STREAM_MAX_PER_WORKER', 20))
+    DASHBOARD_STREAM_HEARTBEAT_SECONDS = 15
+    DASHBOARD_STREAM_POLL_SECONDS = 2.0
+    DASHBOARD_STREAM_MAX_SECONDS = 300
     
     # TTS Configuration
     TTS_ENGINE = 'browser'  # Use browser's built-in TTS for now
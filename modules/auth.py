@@ -1,6 +1,9 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app
 from utils.file_manager import file_manager
+import functools
 import hashlib
+import secrets
+import time
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -26,16 +29,43 @@ SAMPLE_USERS = [
     }
 ]
 
+# Roles that can follow other learners' progress
+GUARDIAN_ROLES = ('parent', 'teacher')
+
+LINKS_FILE = 'data/users/guardian_links.csv'
+LINK_FIELDNAMES = ['guardian_id', 'learner_id', 'created_at']
+
+# One-time codes a learner gives a parent or teacher to link with them
+LINK_CODES_FILE = 'data/users/link_codes.json'
+LINK_CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+LINK_CODE_LENGTH = 8
+
+USER_FIELDNAMES = ['id', 'username', 'email', 'password_hash', 'role', 'age', 'conditions', 'created_at']
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
+def create_user(username, email, password, role='child', age='', conditions=''):
+    """Append a user account and return its row"""
+    user_data = {
+        'id': file_manager.generate_id(),
+        'username': username,
+        'email': email,
+        'password_hash': hash_password(password),
+        'role': role,
+        'age': age,
+        'conditions': conditions,
+        'created_at': file_manager.get_timestamp()
+    }
+    file_manager.append_csv('data/users/users.csv', user_data, USER_FIELDNAMES)
+    return user_data
+
 def init_sample_users():
     """Initialize sample users in CSV file"""
     users_file = 'data/users/users.csv'
-    existing_users = file_manager.read_csv(users_file)
+    existing_user = file_manager.find_first(users_file)
     
-    if not existing_users:
-        fieldnames = ['id', 'username', 'email', 'password_hash', 'role', 'age', 'conditions', 'created_at']
+    if not existing_user:
         users_data = []
         
         for user in SAMPLE_USERS:
@@ -50,10 +80,8 @@ def init_sample_users():
                 'created_at': file_manager.get_timestamp()
             })
         
-        file_manager.write_csv(users_file, users_data, fieldnames)
-
-# Initialize sample users on module load
-init_sample_users()
+        # Another worker may have seeded (or registered) users in the meantime
+        file_manager.update_csv(users_file, lambda rows: rows or users_data, USER_FIELDNAMES)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -62,19 +90,21 @@ def login():
         username = data.get('username')
         password = data.get('password')
         
-        users = file_manager.read_csv('data/users/users.csv')
         password_hash = hash_password(password)
+        user = file_manager.find_first(
+            'data/users/users.csv',
+            where={'username': username, 'password_hash': password_hash}
+        )
         
-        for user in users:
-            if user['username'] == username and user['password_hash'] == password_hash:
-                session['user_id'] = user['id']
-                session['username'] = user['username']
-                session['role'] = user['role']
-                session['conditions'] = user['conditions'].split(',') if user['conditions'] else []
-                
-                if request.is_json:
-                    return jsonify({'success': True, 'redirect': '/dashboard'})
-                return redirect(url_for('dashboard.main'))
+        if user:
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+            session['role'] = user['role']
+            session['conditions'] = user['conditions'].split(',') if user['conditions'] else []
+            
+            if request.is_json:
+                return jsonify({'success': True, 'redirect': '/dashboard'})
+            return redirect(url_for('dashboard.main'))
         
         if request.is_json:
             return jsonify({'success': False, 'message': 'Invalid credentials'})
@@ -87,19 +117,14 @@ def register():
     if request.method == 'POST':
         data = request.get_json() if request.is_json else request.form
         
-        user_data = {
-            'id': file_manager.generate_id(),
-            'username': data.get('username'),
-            'email': data.get('email'),
-            'password_hash': hash_password(data.get('password')),
-            'role': data.get('role', 'child'),
-            'age': data.get('age', ''),
-            'conditions': ','.join(data.getlist('conditions') if hasattr(data, 'getlist') else data.get('conditions', [])),
-            'created_at': file_manager.get_timestamp()
-        }
-        
-        fieldnames = ['id', 'username', 'email', 'password_hash', 'role', 'age', 'conditions', 'created_at']
-        file_manager.append_csv('data/users/users.csv', user_data, fieldnames)
+        user_data = create_user(
+            data.get('username'),
+            data.get('email'),
+            data.get('password'),
+            role=data.get('role', 'child'),
+            age=data.get('age', ''),
+            conditions=','.join(data.getlist('conditions') if hasattr(data, 'getlist') else data.get('conditions', []))
+        )
         
         session['user_id'] = user_data['id']
         session['username'] = user_data['username']
@@ -122,7 +147,102 @@ def profile():
     if 'user_id' not in session:
         return redirect(url_for('auth.login'))
     
-    users = file_manager.read_csv('data/users/users.csv')
-    user = next((u for u in users if u['id'] == session['user_id']), None)
+    user = next(iter(file_manager.read_user('users', session['user_id'])), None)
     
-    return render_template('auth/profile.html', user=user)
+    return render_template('auth/profile.html', user=user, can_share=session.get('role') not in GUARDIAN_ROLES)
+
+def admin_required(view):
+    """Only let signed-in users listed in ADMIN_USERNAMES call the view"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if 'user_id' not in session:
+            return jsonify({'success': False, 'message': 'Not logged in'})
+        if session.get('username') not in current_app.config.get('ADMIN_USERNAMES', []):
+            return jsonify({'success': False, 'message': 'Administrators only'})
+        return view(*args, **kwargs)
+    return wrapped
+
+def linked_learners(guardian_id):
+    """Learner ids linked to a guardian, in the order they were added"""
+    rows = file_manager.iter_rows(LINKS_FILE, columns=['learner_id'], user_id=guardian_id)
+    return list(dict.fromkeys(row['learner_id'] for row in rows))
+
+def link_code_key(code):
+    """How a link code is stored, so the codes file never holds usable codes"""
+    return hashlib.sha256(code.strip().upper().encode()).hexdigest()
+
+def issue_link_code(learner_id, ttl_seconds):
+    """A new one-time link code for the learner, replacing any they issued before"""
+    code = ''.join(secrets.choice(LINK_CODE_ALPHABET) for _ in range(LINK_CODE_LENGTH))
+    now = time.time()
+    
+    def issue(codes):
+        codes = {key: entry for key, entry in codes.items()
+                 if entry['expires'] > now and entry['learner_id'] != learner_id}
+        codes[link_code_key(code)] = {'learner_id': learner_id, 'expires': now + ttl_seconds}
+        return codes
+    
+    file_manager.update_json(LINK_CODES_FILE, issue)
+    return code
+
+def redeem_link_code(code):
+    """Consume a link code; returns the learner who issued it, or None if it is unknown or expired"""
+    key = link_code_key(code)
+    found = []
+    
+    def redeem(codes):
+        entry = codes.pop(key, None)
+        if entry is None:
+            return None
+        if entry['expires'] > time.time():
+            found.append(entry['learner_id'])
+        return codes
+    
+    file_manager.update_json(LINK_CODES_FILE, redeem)
+    return found[0] if found else None
+
+@auth_bp.route('/link-code', methods=['POST'])
+def link_code():
+    """Issue a one-time code the learner gives a parent or teacher to follow their progress"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    if session.get('role') in GUARDIAN_ROLES:
+        return jsonify({'success': False, 'message': 'Only learners can share their progress'})
+    
+    ttl_seconds = current_app.config.get('LINK_CODE_TTL_SECONDS', 900)
+    return jsonify({'success': True, 'code': issue_link_code(session['user_id'], ttl_seconds),
+                    'expires_in': ttl_seconds})
+
+@auth_bp.route('/learners', methods=['GET', 'POST'])
+def learners():
+    """List the learners a parent or teacher follows, or link one with a code the learner issued"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    if session.get('role') not in GUARDIAN_ROLES:
+        return jsonify({'success': False, 'message': 'Only parents and teachers can follow learners'})
+    
+    guardian_id = session['user_id']
+    
+    if request.method == 'POST':
+        data = request.get_json() if request.is_json else request.form
+        learner_id = redeem_link_code(data.get('code') or '')
+        if learner_id is None or learner_id == guardian_id:
+            return jsonify({'success': False, 'message': 'Invalid or expired link code'})
+        if learner_id not in linked_learners(guardian_id):
+            file_manager.append_csv(LINKS_FILE, {
+                'guardian_id': guardian_id,
+                'learner_id': learner_id,
+                'created_at': file_manager.get_timestamp()
+            }, LINK_FIELDNAMES)
+    
+    learner_ids = linked_learners(guardian_id)
+    wanted = set(learner_ids)
+    names = {
+        user['id']: user['username']
+        for user in file_manager.iter_rows('users', columns=['id', 'username'],
+                                           predicate=lambda row: row['id'] in wanted)
+    }
+    return jsonify({
+        'success': True,
+        'learners': [{'id': learner_id, 'username': names.get(learner_id, '')} for learner_id in learner_ids]
+    })
@@ -1,11 +1,129 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app, stream_with_context
+from modules.auth import GUARDIAN_ROLES, admin_required, linked_learners
+from utils.analytics import COHORT_COLUMNS
+from utils.cohort_stats import cohort_stats
 from utils.file_manager import file_manager
-import pandas as pd
-from datetime import datetime, timedelta
+from utils.lazy import lazy_import
+from utils.progress_events import StreamLimitError, progress_events
+from utils.progress_rollups import BUCKET_SIZES, ROLLUP_DATASETS, auto_bucket, progress_rollups
+from utils.recommendation_store import recommendation_store
+from utils.response_cache import dashboard_cache
+from utils.rule_engine import RuleEvaluator
+from utils.user_summaries import usable, user_summaries
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import json
+import os
+import threading
+import time
+
+np = lazy_import('numpy')
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Recommendation rules in the order they are listed to the user (after priority).
+# Thresholds may name a DashboardAI.performance_thresholds entry; rules sharing
+# a group are tried in order and only the first that holds fires.
+RECOMMENDATION_RULES = [
+    {
+        'group': 'dyslexia',
+        'when': [('dyslexia.total_sessions', '>', 0), ('dyslexia.avg_accuracy', '<', 'needs_improvement')],
+        'recommendation': {
+            'type': 'dyslexia',
+            'priority': 'high',
+            'title': 'Focus on Phonics Practice',
+            'description': 'Your reading accuracy could improve. Try the Sound Matching game daily.',
+            'action': 'Play phonics games for 15 minutes daily',
+            'module': 'dyslexia',
+            'icon': 'book-open',
+            'color': 'dyslexia'
+        }
+    },
+    {
+        'group': 'dyslexia',
+        'when': [('dyslexia.total_sessions', '>', 0), ('dyslexia.avg_accuracy', '<', 'good')],
+        'recommendation': {
+            'type': 'dyslexia',
+            'priority': 'medium',
+            'title': 'Continue Reading Practice',
+            'description': 'You\'re making good progress! Keep practicing with text simplification.',
+            'action': 'Use the smart reader 3 times this week',
+            'module': 'dyslexia',
+            'icon': 'book-open',
+            'color': 'dyslexia'
+        }
+    },
+    {
+        'when': [('dyscalculia.total_problems', '>', 0), ('dyscalculia.accuracy', '<', 'needs_improvement')],
+        'recommendation': {
+            'type': 'dyscalculia',
+            'priority': 'high',
+            'title': 'Math Fundamentals Practice',
+            'description': 'Focus on basic arithmetic with visual aids to build confidence.',
+            'action': 'Practice visual math problems daily',
+            'module': 'dyscalculia',
+            'icon': 'calculator',
+            'color': 'dyscalculia'
+        }
+    },
+    {
+        'when': [('dysgraphia.total_sessions', '>', 0), ('dysgraphia.avg_words_per_session', '<', 20)],
+        'recommendation': {
+            'type': 'dysgraphia',
+            'priority': 'medium',
+            'title': 'Increase Writing Practice',
+            'description': 'Try to write longer pieces. Use writing prompts for inspiration.',
+            'action': 'Write at least 50 words per session',
+            'module': 'dysgraphia',
+            'icon': 'pen',
+            'color': 'dysgraphia'
+        }
+    },
+    {
+        'when': [('dyspraxia.total_exercises', '>', 0), ('dyspraxia.avg_stability', '<', 'needs_improvement')],
+        'recommendation': {
+            'type': 'dyspraxia',
+            'priority': 'high',
+            'title': 'Balance Training Focus',
+            'description': 'Your balance scores suggest more practice is needed. Start with easier exercises.',
+            'action': 'Practice balance exercises for 10 minutes daily',
+            'module': 'dyspraxia',
+            'icon': 'running',
+            'color': 'dyspraxia'
+        }
+    },
+    {
+        # Overall activity
+        'when': [('overall_stats.total_activities', '<', 10)],
+        'recommendation': {
+            'type': 'general',
+            'priority': 'medium',
+            'title': 'Increase Overall Activity',
+            'description': 'Try to use the platform more regularly for better results.',
+            'action': 'Aim for at least 2 activities per day',
+            'module': 'dashboard',
+            'icon': 'chart-line',
+            'color': 'general'
+        }
+    },
+]
+
+# Learning pattern rules: each adds a strength or an area for improvement, in table order
+PATTERN_RULES = [
+    {'when': [('dyslexia.avg_accuracy', '>', 'good')], 'strength': 'Reading and phonics skills'},
+    {'when': [('dyscalculia.accuracy', '>', 'good')], 'strength': 'Mathematical problem solving'},
+    {'when': [('dysgraphia.avg_words_per_session', '>', 30)], 'strength': 'Written expression'},
+    {'when': [('dyspraxia.avg_stability', '>', 'good')], 'strength': 'Balance and coordination'},
+    {'when': [('dyslexia.avg_accuracy', '<', 'needs_improvement')], 'area': 'Reading fluency and comprehension'},
+    {'when': [('dyscalculia.accuracy', '<', 'needs_improvement')], 'area': 'Number sense and calculation'},
+    {'when': [('dysgraphia.avg_words_per_session', '<', 15)], 'area': 'Writing length and expression'},
+    {'when': [('dyspraxia.avg_stability', '<', 'needs_improvement')], 'area': 'Motor coordination and balance'},
+]
+
+PRIORITY_ORDER = {'high': 3, 'medium': 2, 'low': 1}
+
+MAX_RECOMMENDATIONS = 5
+
 class DashboardAI:
     def __init__(self):
         self.performance_thresholds = {
@@ -13,147 +131,68 @@ class DashboardAI:
             'good': 70,
             'needs_improvement': 50
         }
+        self.compile_rules()
+    
+    def compile_rules(self):
+        """Compile the rule tables; call again after changing performance_thresholds"""
+        self.rules = RuleEvaluator(RECOMMENDATION_RULES + PATTERN_RULES, self.performance_thresholds)
+        # Highest priority first, table order within a priority (a stable sort)
+        self._recommendation_order = sorted(
+            range(len(RECOMMENDATION_RULES)),
+            key=lambda i: PRIORITY_ORDER.get(RECOMMENDATION_RULES[i]['recommendation']['priority'], 0),
+            reverse=True
+        )
+        self._pattern_offset = len(RECOMMENDATION_RULES)
     
     def generate_ai_recommendations(self, user_data):
         """Generate AI-based recommendations based on user performance"""
-        recommendations = []
-        
-        # Analyze dyslexia performance
-        dyslexia_data = user_data.get('dyslexia', {})
-        if dyslexia_data.get('total_sessions', 0) > 0:
-            avg_accuracy = dyslexia_data.get('avg_accuracy', 0)
-            
-            if avg_accuracy < self.performance_thresholds['needs_improvement']:
-                recommendations.append({
-                    'type': 'dyslexia',
-                    'priority': 'high',
-                    'title': 'Focus on Phonics Practice',
-                    'description': 'Your reading accuracy could improve. Try the Sound Matching game daily.',
-                    'action': 'Play phonics games for 15 minutes daily',
-                    'module': 'dyslexia',
-                    'icon': 'book-open',
-                    'color': 'dyslexia'
-                })
-            elif avg_accuracy < self.performance_thresholds['good']:
-                recommendations.append({
-                    'type': 'dyslexia',
-                    'priority': 'medium',
-                    'title': 'Continue Reading Practice',
-                    'description': 'You\'re making good progress! Keep practicing with text simplification.',
-                    'action': 'Use the smart reader 3 times this week',
-                    'module': 'dyslexia',
-                    'icon': 'book-open',
-                    'color': 'dyslexia'
-                })
-        
-        # Analyze dyscalculia performance
-        dyscalculia_data = user_data.get('dyscalculia', {})
-        if dyscalculia_data.get('total_problems', 0) > 0:
-            accuracy = dyscalculia_data.get('accuracy', 0)
-            
-            if accuracy < self.performance_thresholds['needs_improvement']:
-                recommendations.append({
-                    'type': 'dyscalculia',
-                    'priority': 'high',
-                    'title': 'Math Fundamentals Practice',
-                    'description': 'Focus on basic arithmetic with visual aids to build confidence.',
-                    'action': 'Practice visual math problems daily',
-                    'module': 'dyscalculia',
-                    'icon': 'calculator',
-                    'color': 'dyscalculia'
-                })
-        
-        # Analyze dysgraphia performance
-        dysgraphia_data = user_data.get('dysgraphia', {})
-        if dysgraphia_data.get('total_sessions', 0) > 0:
-            avg_words = dysgraphia_data.get('avg_words_per_session', 0)
-            
-            if avg_words < 20:
-                recommendations.append({
-                    'type': 'dysgraphia',
-                    'priority': 'medium',
-                    'title': 'Increase Writing Practice',
-                    'description': 'Try to write longer pieces. Use writing prompts for inspiration.',
-                    'action': 'Write at least 50 words per session',
-                    'module': 'dysgraphia',
-                    'icon': 'pen',
-                    'color': 'dysgraphia'
-                })
-        
-        # Analyze dyspraxia performance
-        dyspraxia_data = user_data.get('dyspraxia', {})
-        if dyspraxia_data.get('total_exercises', 0) > 0:
-            avg_stability = dyspraxia_data.get('avg_stability', 0)
-            
-            if avg_stability < self.performance_thresholds['needs_improvement']:
-                recommendations.append({
-                    'type': 'dyspraxia',
-                    'priority': 'high',
-                    'title': 'Balance Training Focus',
-                    'description': 'Your balance scores suggest more practice is needed. Start with easier exercises.',
-                    'action': 'Practice balance exercises for 10 minutes daily',
-                    'module': 'dyspraxia',
-                    'icon': 'running',
-                    'color': 'dyspraxia'
-                })
-        
-        # Overall activity recommendations
-        total_activities = user_data.get('overall_stats', {}).get('total_activities', 0)
-        if total_activities < 10:
-            recommendations.append({
-                'type': 'general',
-                'priority': 'medium',
-                'title': 'Increase Overall Activity',
-                'description': 'Try to use the platform more regularly for better results.',
-                'action': 'Aim for at least 2 activities per day',
-                'module': 'dashboard',
-                'icon': 'chart-line',
-                'color': 'general'
-            })
-        
-        # Sort by priority
-        priority_order = {'high': 3, 'medium': 2, 'low': 1}
-        recommendations.sort(key=lambda x: priority_order.get(x['priority'], 0), reverse=True)
-        
-        return recommendations[:5]  # Return top 5 recommendations
+        return self._recommendations(set(self.rules.evaluate(user_data)))
     
     def analyze_learning_patterns(self, user_data):
         """Analyze learning patterns and provide insights"""
+        return self._patterns(set(self.rules.evaluate(user_data)))
+    
+    def insights(self, user_data):
+        """Recommendations and learning patterns from one evaluation of the rules"""
+        fired = set(self.rules.evaluate(user_data))
+        return {'recommendations': self._recommendations(fired), 'learning_patterns': self._patterns(fired)}
+    
+    def insights_many(self, users_data):
+        """insights() for a list of users' dashboard data, evaluating the rules over all of them at once.
+        
+        Users with the same fired rules share one recommendations list and
+        learning patterns dict; treat them as read-only.
+        """
+        if not users_data:
+            return []
+        fired = self.rules.evaluate_many([self.rules.vector(data) for data in users_data])
+        outcomes, which = np.unique(fired, axis=0, return_inverse=True)
+        shared = []
+        for row in outcomes:
+            indexes = set(row.nonzero()[0].tolist())
+            shared.append((self._recommendations(indexes), self._patterns(indexes)))
+        return [
+            {'recommendations': shared[i][0], 'learning_patterns': shared[i][1]}
+            for i in which.reshape(-1).tolist()
+        ]
+    
+    def _recommendations(self, fired):
+        recommendations = [dict(RECOMMENDATION_RULES[i]['recommendation']) for i in self._recommendation_order if i in fired]
+        return recommendations[:MAX_RECOMMENDATIONS]  # Return top 5 recommendations
+    
+    def _patterns(self, fired):
         patterns = {
             'strengths': [],
             'areas_for_improvement': [],
             'learning_style': 'balanced',
             'progress_trend': 'stable'
         }
-        
-        # Identify strengths
-        for module, data in user_data.items():
-            if module == 'overall_stats':
-                continue
-                
-            if module == 'dyslexia' and data.get('avg_accuracy', 0) > self.performance_thresholds['good']:
-                patterns['strengths'].append('Reading and phonics skills')
-            elif module == 'dyscalculia' and data.get('accuracy', 0) > self.performance_thresholds['good']:
-                patterns['strengths'].append('Mathematical problem solving')
-            elif module == 'dysgraphia' and data.get('avg_words_per_session', 0) > 30:
-                patterns['strengths'].append('Written expression')
-            elif module == 'dyspraxia' and data.get('avg_stability', 0) > self.performance_thresholds['good']:
-                patterns['strengths'].append('Balance and coordination')
-        
-        # Identify areas for improvement
-        for module, data in user_data.items():
-            if module == 'overall_stats':
-                continue
-                
-            if module == 'dyslexia' and data.get('avg_accuracy', 0) < self.performance_thresholds['needs_improvement']:
-                patterns['areas_for_improvement'].append('Reading fluency and comprehension')
-            elif module == 'dyscalculia' and data.get('accuracy', 0) < self.performance_thresholds['needs_improvement']:
-                patterns['areas_for_improvement'].append('Number sense and calculation')
-            elif module == 'dysgraphia' and data.get('avg_words_per_session', 0) < 15:
-                patterns['areas_for_improvement'].append('Writing length and expression')
-            elif module == 'dyspraxia' and data.get('avg_stability', 0) < self.performance_thresholds['needs_improvement']:
-                patterns['areas_for_improvement'].append('Motor coordination and balance')
-        
+        for offset, rule in enumerate(PATTERN_RULES):
+            if self._pattern_offset + offset in fired:
+                if 'strength' in rule:
+                    patterns['strengths'].append(rule['strength'])
+                else:
+                    patterns['areas_for_improvement'].append(rule['area'])
         return patterns
 
 dashboard_ai = DashboardAI()
@@ -171,28 +210,321 @@ def get_dashboard_data():
     
     user_id = session['user_id']
     
-    # Collect data from all modules
-    data = {
-        'dyslexia': get_dyslexia_progress(user_id),
-        'dyscalculia': get_dyscalculia_progress(user_id),
-        'dysgraphia': get_dysgraphia_progress(user_id),
-        'dyspraxia': get_dyspraxia_progress(user_id),
-        'overall_stats': get_overall_stats(user_id)
-    }
+    # The summary's version changes on every progress write, so it identifies the response
+    summary = user_summaries.get(user_id)
+    version = summary.get('version', 0)
+    generation = summary_generation(summary)
+    # A rebuild that lost a race carries a version it does not own; never cache it
+    cacheable = usable(summary)
+    etag = dashboard_cache.etag(user_id, generation)
+    
+    if cacheable and etag in request.if_none_match:
+        dashboard_cache.not_modified()
+        return revalidation_headers(current_app.response_class(status=304), etag, summary)
+    
+    body = dashboard_cache.get(user_id, generation) if cacheable else None
+    if body is None:
+        # Collect data from all modules via the user's running summary
+        data = dashboard_data_from_summary(summary)
+        
+        # AI recommendations and learning patterns, precomputed unless activity arrived since
+        insights = recommendation_store.get_for(user_id, summary, learner_insights)
+        
+        body = jsonify({
+            'success': True, 
+            'version': version,
+            'data': data,
+            'recommendations': insights['recommendations'],
+            'learning_patterns': insights['learning_patterns'],
+            'recommendations_generated_at': insights['generated_at']
+        }).get_data()
+        if cacheable:
+            dashboard_cache.put(user_id, generation, body)
+    
+    response = current_app.response_class(body, mimetype='application/json')
+    if not cacheable:
+        response.cache_control.no_store = True
+        return response
+    return revalidation_headers(response, etag, summary)
+
+@dashboard_bp.route('/compare')
+def compare_with_cohort():
+    """How the user's dashboard numbers rank among users with the same role (or ?by=)"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
     
-    # Generate AI recommendations
-    recommendations = dashboard_ai.generate_ai_recommendations(data)
+    by = request.args.get('by', 'role')
+    if by not in COHORT_COLUMNS:
+        return jsonify({'success': False, 'message': f"by must be one of: {', '.join(COHORT_COLUMNS)}"})
+    
+    # Cohort distributions come from the precompute-cohort-stats job; never load every dataset here
+    user = file_manager.find_first('users', user_id=session['user_id'])
+    data = dashboard_data_from_summary(user_summaries.get(session['user_id']))
+    comparison = cohort_stats.compare(user, data, by=by)
+    if comparison is None:
+        return jsonify({'success': False, 'message': 'Cohort statistics are not available yet'})
+    return jsonify({'success': True, 'by': by, **comparison})
+
+@dashboard_bp.route('/group')
+def get_group_dashboard():
+    """Dashboard data for several followed learners at once, plus group totals"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    if session.get('role') not in GUARDIAN_ROLES:
+        return jsonify({'success': False, 'message': 'Only parents and teachers can view learner groups'})
     
-    # Analyze learning patterns
-    learning_patterns = dashboard_ai.analyze_learning_patterns(data)
+    linked = linked_learners(session['user_id'])
+    requested = [learner_id for learner_id in request.args.get('learners', '').split(',') if learner_id] or linked
+    unknown = [learner_id for learner_id in requested if learner_id not in set(linked)]
+    if unknown:
+        return jsonify({'success': False, 'message': f"Not following: {', '.join(unknown)}"})
     
+    learners = collect_group_data(requested, current_app.config)
+    return jsonify({'success': True, 'learners': learners, 'group': group_summary(learners)})
+
+@dashboard_bp.route('/cache/stats')
+@admin_required
+def dashboard_cache_stats():
+    """Report dashboard response cache hits, misses and 304s"""
     return jsonify({
-        'success': True, 
-        'data': data,
-        'recommendations': recommendations,
-        'learning_patterns': learning_patterns
+        'success': True,
+        'cache': dashboard_cache.stats(),
+        'recommendations': recommendation_store.stats(),
+        'streams': progress_events.stats()
     })
 
+def summary_generation(summary):
+    """The summary's version plus what it holds.
+    
+    Versions restart when a summary is deleted and rebuilt, so the version
+    alone could match a tag or cache entry from the old record.
+    """
+    return '|'.join(str(summary.get(key)) for key in ('version', 'updated_at', 'total_activities', 'last_day'))
+
+def revalidation_headers(response, etag, summary):
+    """ETag and Last-Modified, and make browsers revalidate before reusing the response"""
+    response.set_etag(etag)
+    if summary.get('updated_at'):
+        # Timestamps are naive local time; HTTP dates are UTC
+        response.last_modified = datetime.fromisoformat(summary['updated_at']).astimezone(timezone.utc)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@dashboard_bp.route('/calendar')
+def get_activity_calendar():
+    """Active/inactive flag per day for the activity heatmap"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else datetime.now().date()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else end - timedelta(days=364)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'})
+    if start > end or (end - start).days > 3660:
+        return jsonify({'success': False, 'message': 'Invalid date range'})
+    
+    calendar = user_summaries.calendar(session['user_id'])
+    last_day = calendar.last_day()
+    
+    return jsonify({
+        'success': True,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': calendar.days(start, end),
+        'active_days': calendar.active_days(),
+        'streak': calendar.streak(),
+        'current_streak': calendar.current_streak(datetime.now().date()),
+        'last_active': last_day.isoformat() if last_day else None
+    })
+
+@dashboard_bp.route('/trends')
+def get_progress_trends():
+    """Per-bucket counts and score/accuracy/duration/word totals for trend charts"""
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    
+    try:
+        end = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if 'end' in request.args else datetime.now().date()
+        start = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if 'start' in request.args else end - timedelta(days=89)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Dates must be YYYY-MM-DD'})
+    if start > end:
+        return jsonify({'success': False, 'message': 'Invalid date range'})
+    
+    bucket = request.args.get('bucket', 'auto')
+    if bucket == 'auto':
+        bucket = auto_bucket(start, end)
+    if bucket not in BUCKET_SIZES:
+        return jsonify({'success': False, 'message': f"bucket must be auto or one of: {', '.join(BUCKET_SIZES)}"})
+    datasets = [d for d in request.args.get('datasets', '').split(',') if d] or None
+    if datasets and any(d not in ROLLUP_DATASETS for d in datasets):
+        return jsonify({'success': False, 'message': f"datasets must be among: {', '.join(ROLLUP_DATASETS)}"})
+    
+    trends = progress_rollups.series(session['user_id'], start, end, bucket, datasets)
+    return jsonify({'success': True, 'start': start.isoformat(), 'end': end.isoformat(), **trends})
+
+@dashboard_bp.route('/stream')
+def stream_progress():
+    """Server-sent events with the user's dashboard changes as they are written.
+    
+    Events carry the summary version as their id. The first connection
+    passes ?since=<version from /dashboard/data>; browsers reconnect with
+    Last-Event-ID. Events: activity (a new progress row), summary (changed
+    counters only), recommendations, and snapshot (the full dashboard data,
+    sent when the changes since that version are unknown to this worker).
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    
+    user_id = session['user_id']
+    since = request.headers.get('Last-Event-ID') or request.args.get('since')
+    try:
+        since = int(since) if since else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Last-Event-ID must be a summary version'})
+    
+    try:
+        progress_events.open(user_id)
+    except StreamLimitError as e:
+        response = jsonify({'success': False, 'message': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_MS // 1000)
+        return response
+    
+    response = current_app.response_class(stream_with_context(progress_stream(user_id, since)),
+                                          mimetype='text/event-stream')
+    # Runs however the stream ends, including a client that never read it
+    response.call_on_close(lambda: progress_events.close(user_id))
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+# Browsers wait this long before reconnecting a closed stream
+STREAM_RETRY_MS = 3000
+
+# Datasets whose new rows are pushed as activity events, by dashboard module
+ACTIVITY_EVENT_MODULES = {
+    'dyslexia_progress': 'dyslexia',
+    'dyscalculia_progress': 'dyscalculia',
+    'dysgraphia_progress': 'dysgraphia',
+    'dyspraxia_progress': 'dyspraxia'
+}
+
+def progress_stream(user_id, since):
+    """Yield SSE lines for user_id until DASHBOARD_STREAM_MAX_SECONDS pass"""
+    deadline = time.monotonic() + progress_events.max_stream_seconds
+    yield f'retry: {STREAM_RETRY_MS}\n\n'
+    
+    summary_path = user_summaries.path(user_id)
+    marker = file_marker(summary_path)
+    seen = progress_events.changes(user_id)
+    summary = user_summaries.get(user_id)
+    state = stream_state(user_id, summary)
+    if usable(summary):
+        progress_events.remember(user_id, state['version'], state)
+    
+    events = []
+    if since is not None and since != state['version']:
+        previous = progress_events.recall(user_id, since)
+        events = stream_deltas(previous, state) if previous is not None else None
+        if events is not None:
+            progress_events.count('resumed')
+        else:
+            progress_events.count('snapshots')
+            events = [snapshot_event(summary, state)]
+    
+    last_sent = time.monotonic()
+    while True:
+        if events:
+            progress_events.count('events', len(events))
+            for name, data in events:
+                yield f"id: {state['version']}\nevent: {name}\ndata: {json.dumps(data)}\n\n"
+            events = []
+            last_sent = time.monotonic()
+        
+        now = time.monotonic()
+        if now >= deadline:
+            return
+        if now - last_sent >= progress_events.heartbeat_seconds:
+            yield ': heartbeat\n\n'
+            last_sent = now
+        
+        # Woken early by writes in this worker; the poll catches the other workers'
+        timeout = min(progress_events.poll_interval, progress_events.heartbeat_seconds, deadline - now)
+        seen = progress_events.wait(user_id, seen, timeout)
+        current = file_marker(summary_path)
+        if current == marker:
+            continue
+        marker = current
+        summary = user_summaries.get(user_id)
+        # A rebuild that lost a race does not own its version; the racing write changes the file again
+        if not usable(summary) or summary.get('version') == state['version']:
+            continue
+        latest = stream_state(user_id, summary)
+        events = stream_deltas(state, latest)
+        if events is None:
+            progress_events.count('snapshots')
+            events = [snapshot_event(summary, latest)]
+        state = latest
+        progress_events.remember(user_id, state['version'], state)
+
+def file_marker(path):
+    """Changes whenever the file is replaced or rewritten"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def stream_state(user_id, summary):
+    """What a stream has told the client as of this summary"""
+    data = dashboard_data_from_summary(summary)
+    insights = recommendation_store.get_for(user_id, summary, learner_insights)
+    return {
+        'version': summary.get('version', 0),
+        'fields': {
+            module: {field: value for field, value in values.items() if field != 'recent_activity'}
+            for module, values in data.items()
+        },
+        'counts': {dataset: totals['count'] for dataset, totals in summary['datasets'].items()},
+        'recent': {dataset: summary['datasets'][dataset]['recent'] for dataset in ACTIVITY_EVENT_MODULES},
+        'recommendations': insights['recommendations'],
+        'learning_patterns': insights['learning_patterns']
+    }
+
+def snapshot_event(summary, state):
+    """The event replacing everything a client shows"""
+    return ('snapshot', {'data': dashboard_data_from_summary(summary),
+                         'recommendations': state['recommendations'],
+                         'learning_patterns': state['learning_patterns']})
+
+def stream_deltas(old, new):
+    """(event, data) pairs taking a client from one stream state to another, or None if only a snapshot can"""
+    events = []
+    for dataset, module in ACTIVITY_EVENT_MODULES.items():
+        added = new['counts'].get(dataset, 0) - old['counts'].get(dataset, 0)
+        if added < 0 or added > len(new['recent'][dataset]):
+            # The summary keeps only the last few rows (or was rebuilt with fewer); resend it all
+            return None
+        if added > 0:
+            for row in new['recent'][dataset][-added:]:
+                events.append(('activity', {'module': module, 'dataset': dataset, 'row': row}))
+    
+    changes = {}
+    for module, values in new['fields'].items():
+        changed = {field: value for field, value in values.items() if old['fields'].get(module, {}).get(field) != value}
+        if changed:
+            changes[module] = changed
+    if changes:
+        events.append(('summary', {'changes': changes}))
+    
+    if (new['recommendations'], new['learning_patterns']) != (old['recommendations'], old['learning_patterns']):
+        events.append(('recommendations', {'recommendations': new['recommendations'],
+                                           'learning_patterns': new['learning_patterns']}))
+    return events
+
 @dashboard_bp.route('/activity-report/<activity_id>')
 def get_activity_report(activity_id):
     """Get detailed report for a specific activity"""
@@ -201,7 +533,7 @@ def get_activity_report(activity_id):
     
     user_id = session['user_id']
     
-    # Parse activity_id to determine module and specific activity
+    # Activity ids are "<module>_<timestamp>", the row's full ISO timestamp
     try:
         module, timestamp = activity_id.split('_', 1)
         
@@ -222,151 +554,161 @@ def get_activity_report(activity_id):
     except Exception as e:
         return jsonify({'success': False, 'message': f'Error generating report: {str(e)}'})
 
-def get_dyslexia_progress(user_id):
-    """Get dyslexia progress data"""
-    progress_data = file_manager.read_csv('data/dyslexia/progress.csv')
-    games_data = file_manager.read_csv('data/dyslexia/games.csv')
-    
-    user_progress = [p for p in progress_data if p['user_id'] == user_id]
-    user_games = [g for g in games_data if g['user_id'] == user_id]
-    
-    # Calculate average accuracy
-    total_accuracy = sum(float(g.get('accuracy', 0)) for g in user_games)
-    avg_accuracy = total_accuracy / len(user_games) if user_games else 0
-    
-    return {
-        'total_sessions': len(user_progress),
-        'total_games': len(user_games),
-        'avg_accuracy': round(avg_accuracy, 1),
-        'recent_activity': user_progress[-5:] if user_progress else []
-    }
+def find_user_activity(filepath, user_id, timestamp):
+    """The user's row with exactly this timestamp, found with one index lookup"""
+    return file_manager.find_activity(filepath, user_id, timestamp)
 
-def get_dyscalculia_progress(user_id):
-    """Get dyscalculia progress data"""
-    progress_data = file_manager.read_csv('data/dyscalculia/progress.csv')
-    user_progress = [p for p in progress_data if p['user_id'] == user_id]
-    
-    correct_answers = len([p for p in user_progress if p.get('correct') == 'True'])
-    total_answers = len(user_progress)
-    
-    return {
-        'total_problems': total_answers,
-        'correct_answers': correct_answers,
-        'accuracy': (correct_answers / total_answers * 100) if total_answers > 0 else 0,
-        'recent_activity': user_progress[-5:] if user_progress else []
-    }
+_group_executor = None
+_group_executor_lock = threading.Lock()
 
-def get_dysgraphia_progress(user_id):
-    """Get dysgraphia progress data"""
-    progress_data = file_manager.read_csv('data/dysgraphia/progress.csv')
-    user_progress = [p for p in progress_data if p['user_id'] == user_id]
-    
-    total_words = sum(int(p.get('word_count', 0)) for p in user_progress)
-    
+def group_executor(config):
+    """Thread pool shared by large group dashboards"""
+    global _group_executor
+    with _group_executor_lock:
+        if _group_executor is None:
+            _group_executor = ThreadPoolExecutor(
+                max_workers=config.get('GROUP_DASHBOARD_WORKERS', 4),
+                thread_name_prefix='group-dashboard'
+            )
+        return _group_executor
+
+def collect_group_data(learner_ids, config):
+    """Dashboard data, recommendations and patterns per learner.
+    
+    Summaries are read in one batch (learners without one are rebuilt
+    together in a single pass over each dataset); large groups read and
+    shape them on a thread pool.
+    """
+    learner_ids = list(dict.fromkeys(learner_ids))
+    parallel = len(learner_ids) >= config.get('GROUP_DASHBOARD_PARALLEL_MIN', 16)
+    executor = group_executor(config) if parallel else None
+    summaries = user_summaries.get_many(learner_ids, executor)
+    shape = executor.map if executor is not None else map
+    return dict(zip(learner_ids, shape(learner_dashboard, (summaries[i] for i in learner_ids))))
+
+def learner_insights(summary):
+    """Recommendations and learning patterns for one user's summary"""
+    return dashboard_ai.insights(dashboard_data_from_summary(summary))
+
+def learner_insights_many(summaries):
+    """learner_insights() for a list of summaries, with the rules evaluated over the whole batch"""
+    return dashboard_ai.insights_many([dashboard_data_from_summary(summary) for summary in summaries])
+
+def learner_dashboard(summary):
+    data = dashboard_data_from_summary(summary)
     return {
-        'total_sessions': len(user_progress),
-        'total_words_written': total_words,
-        'avg_words_per_session': total_words / len(user_progress) if user_progress else 0,
-        'recent_activity': user_progress[-5:] if user_progress else []
+        'data': data,
+        **dashboard_ai.insights(data),
+        'last_active': summary.get('last_day')
     }
 
-def get_dyspraxia_progress(user_id):
-    """Get dyspraxia progress data"""
-    progress_data = file_manager.read_csv('data/dyspraxia/progress.csv')
-    user_progress = [p for p in progress_data if p['user_id'] == user_id]
+def group_summary(learners):
+    """Totals and averages across learners, shaped like the per-learner data"""
+    dashboards = list(learners.values())
+    overall = [d['data']['overall_stats'] for d in dashboards]
+    active_since = (datetime.now().date() - timedelta(days=6)).isoformat()
     
-    avg_stability = sum(float(p.get('stability_score', 0)) for p in user_progress) / len(user_progress) if user_progress else 0
+    def total(module, field):
+        return sum(d['data'][module][field] for d in dashboards)
     
-    return {
-        'total_exercises': len(user_progress),
-        'avg_stability': round(avg_stability, 1),
-        'total_duration': sum(float(p.get('duration', 0)) for p in user_progress),
-        'recent_activity': user_progress[-5:] if user_progress else []
-    }
-
-def get_overall_stats(user_id):
-    """Get overall statistics across all modules"""
-    all_activities = 0
+    def mean_over_active(module, field, count_field):
+        values = [d['data'][module][field] for d in dashboards if d['data'][module][count_field]]
+        return round(sum(values) / len(values), 1) if values else 0
     
-    for module in ['dyslexia', 'dyscalculia', 'dysgraphia', 'dyspraxia']:
-        progress_data = file_manager.read_csv(f'data/{module}/progress.csv')
-        user_activities = [p for p in progress_data if p['user_id'] == user_id]
-        all_activities += len(user_activities)
+    problems = total('dyscalculia', 'total_problems')
+    correct = total('dyscalculia', 'correct_answers')
+    sessions = total('dysgraphia', 'total_sessions')
+    words = total('dysgraphia', 'total_words_written')
     
     return {
-        'total_activities': all_activities,
-        'active_days': calculate_active_days(user_id),
-        'streak': calculate_streak(user_id)
+        'learners': len(dashboards),
+        'active_learners': sum(1 for stats in overall if stats['total_activities']),
+        'active_last_7_days': sum(1 for d in dashboards if d['last_active'] and d['last_active'] >= active_since),
+        'total_activities': sum(stats['total_activities'] for stats in overall),
+        'avg_streak': round(sum(stats['streak'] for stats in overall) / len(overall), 1) if overall else 0,
+        'dyslexia': {
+            'total_sessions': total('dyslexia', 'total_sessions'),
+            'total_games': total('dyslexia', 'total_games'),
+            'avg_accuracy': mean_over_active('dyslexia', 'avg_accuracy', 'total_games')
+        },
+        'dyscalculia': {
+            'total_problems': problems,
+            'correct_answers': correct,
+            'accuracy': (correct / problems * 100) if problems > 0 else 0
+        },
+        'dysgraphia': {
+            'total_sessions': sessions,
+            'total_words_written': words,
+            'avg_words_per_session': words / sessions if sessions else 0
+        },
+        'dyspraxia': {
+            'total_exercises': total('dyspraxia', 'total_exercises'),
+            'avg_stability': mean_over_active('dyspraxia', 'avg_stability', 'total_exercises'),
+            'total_duration': total('dyspraxia', 'total_duration')
+        },
+        'needs_attention': [
+            learner_id for learner_id, d in learners.items()
+            if any(r['priority'] == 'high' for r in d['recommendations'])
+        ]
     }
 
-def calculate_active_days(user_id):
-    """Calculate number of active days"""
-    all_dates = set()
-    
-    for module in ['dyslexia', 'dyscalculia', 'dysgraphia', 'dyspraxia']:
-        progress_data = file_manager.read_csv(f'data/{module}/progress.csv')
-        user_activities = [p for p in progress_data if p['user_id'] == user_id]
-        
-        for activity in user_activities:
-            if 'timestamp' in activity:
-                date = activity['timestamp'].split('T')[0]
-                all_dates.add(date)
+def dashboard_data_from_summary(summary):
+    """Shape a summary record (see utils/user_summaries.py) like the per-module summaries"""
+    datasets = summary['datasets']
     
-    return len(all_dates)
-
-def calculate_streak(user_id):
-    """Calculate current streak of consecutive days"""
-    all_dates = []
-    
-    for module in ['dyslexia', 'dyscalculia', 'dysgraphia', 'dyspraxia']:
-        progress_data = file_manager.read_csv(f'data/{module}/progress.csv')
-        user_activities = [p for p in progress_data if p['user_id'] == user_id]
-        
-        for activity in user_activities:
-            if 'timestamp' in activity:
-                date = activity['timestamp'].split('T')[0]
-                all_dates.append(date)
+    games = datasets['dyslexia_games']
+    avg_accuracy = games['sums']['accuracy'] / games['count'] if games['count'] else 0
     
-    if not all_dates:
-        return 0
+    dyscalculia = datasets['dyscalculia_progress']
+    correct_answers = dyscalculia['matches']['correct']
+    total_answers = dyscalculia['count']
     
-    # Sort dates and find consecutive days
-    unique_dates = sorted(set(all_dates), reverse=True)
+    dysgraphia = datasets['dysgraphia_progress']
+    total_words = dysgraphia['sums']['word_count']
     
-    if not unique_dates:
-        return 0
+    dyspraxia = datasets['dyspraxia_progress']
+    avg_stability = dyspraxia['sums']['stability_score'] / dyspraxia['count'] if dyspraxia['count'] else 0
     
-    streak = 1
-    current_date = datetime.strptime(unique_dates[0], '%Y-%m-%d').date()
-    
-    for i in range(1, len(unique_dates)):
-        prev_date = datetime.strptime(unique_dates[i], '%Y-%m-%d').date()
-        if (current_date - prev_date).days == 1:
-            streak += 1
-            current_date = prev_date
-        else:
-            break
-    
-    return streak
+    return {
+        'dyslexia': {
+            'total_sessions': datasets['dyslexia_progress']['count'],
+            'total_games': games['count'],
+            'avg_accuracy': round(avg_accuracy, 1),
+            'recent_activity': datasets['dyslexia_progress']['recent']
+        },
+        'dyscalculia': {
+            'total_problems': total_answers,
+            'correct_answers': correct_answers,
+            'accuracy': (correct_answers / total_answers * 100) if total_answers > 0 else 0,
+            'recent_activity': dyscalculia['recent']
+        },
+        'dysgraphia': {
+            'total_sessions': dysgraphia['count'],
+            'total_words_written': total_words,
+            'avg_words_per_session': total_words / dysgraphia['count'] if dysgraphia['count'] else 0,
+            'recent_activity': dysgraphia['recent']
+        },
+        'dyspraxia': {
+            'total_exercises': dyspraxia['count'],
+            'avg_stability': round(avg_stability, 1),
+            'total_duration': dyspraxia['sums']['duration'],
+            'recent_activity': dyspraxia['recent']
+        },
+        'overall_stats': {
+            'total_activities': summary['total_activities'],
+            'active_days': summary['active_days'],
+            'streak': summary['streak']
+        }
+    }
 
 def get_dyslexia_activity_report(user_id, timestamp):
     """Generate detailed report for dyslexia activity"""
-    progress_data = file_manager.read_csv('data/dyslexia/progress.csv')
-    games_data = file_manager.read_csv('data/dyslexia/games.csv')
-    
     # Find specific activity
-    activity = None
-    for p in progress_data:
-        if p['user_id'] == user_id and timestamp in p.get('timestamp', ''):
-            activity = p
-            break
+    activity = find_user_activity('data/dyslexia/progress.csv', user_id, timestamp)
     
     if not activity:
         # Try games data
-        for g in games_data:
-            if g['user_id'] == user_id and timestamp in g.get('timestamp', ''):
-                activity = g
-                break
+        activity = find_user_activity('data/dyslexia/games.csv', user_id, timestamp)
     
     if not activity:
         return {'error': 'Activity not found'}
@@ -427,13 +769,7 @@ def get_dyslexia_activity_report(user_id, timestamp):
 
 def get_dyscalculia_activity_report(user_id, timestamp):
     """Generate detailed report for dyscalculia activity"""
-    progress_data = file_manager.read_csv('data/dyscalculia/progress.csv')
-    
-    activity = None
-    for p in progress_data:
-        if p['user_id'] == user_id and timestamp in p.get('timestamp', ''):
-            activity = p
-            break
+    activity = find_user_activity('data/dyscalculia/progress.csv', user_id, timestamp)
     
     if not activity:
         return {'error': 'Activity not found'}
@@ -468,13 +804,7 @@ def get_dyscalculia_activity_report(user_id, timestamp):
 
 def get_dysgraphia_activity_report(user_id, timestamp):
     """Generate detailed report for dysgraphia activity"""
-    progress_data = file_manager.read_csv('data/dysgraphia/progress.csv')
-    
-    activity = None
-    for p in progress_data:
-        if p['user_id'] == user_id and timestamp in p.get('timestamp', ''):
-            activity = p
-            break
+    activity = find_user_activity('data/dysgraphia/progress.csv', user_id, timestamp)
     
     if not activity:
         return {'error': 'Activity not found'}
@@ -514,13 +844,7 @@ def get_dysgraphia_activity_report(user_id, timestamp):
 
 def get_dyspraxia_activity_report(user_id, timestamp):
     """Generate detailed report for dyspraxia activity"""
-    progress_data = file_manager.read_csv('data/dyspraxia/progress.csv')
-    
-    activity = None
-    for p in progress_data:
-        if p['user_id'] == user_id and timestamp in p.get('timestamp', ''):
-            activity = p
-            break
+    activity = find_user_activity('data/dyspraxia/progress.csv', user_id, timestamp)
     
     if not activity:
         return {'error': 'Activity not found'}
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from utils.file_manager import file_manager
+from utils.progress_writes import record_progress
 import random
 import math
 
@@ -155,7 +156,7 @@ def check_answer():
     }
     
     fieldnames = ['user_id', 'problem_type', 'difficulty', 'correct', 'user_answer', 'correct_answer', 'timestamp']
-    file_manager.append_csv('data/dyscalculia/progress.csv', progress_data, fieldnames)
+    record_progress('data/dyscalculia/progress.csv', progress_data, fieldnames)
     
     return jsonify({
         'success': True,
@@ -1,5 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from utils.file_manager import file_manager
+from utils.progress_writes import record_progress
 import re
 import random
 
@@ -290,7 +291,7 @@ def analyze_writing():
     }
     
     fieldnames = ['user_id', 'activity', 'text_sample', 'word_count', 'issues_count', 'timestamp']
-    file_manager.append_csv('data/dysgraphia/progress.csv', progress_data, fieldnames)
+    record_progress('data/dysgraphia/progress.csv', progress_data, fieldnames)
     
     return jsonify({
         'success': True,
@@ -316,7 +317,7 @@ def save_writing():
     }
     
     fieldnames = ['user_id', 'prompt', 'text_sample', 'word_count', 'time_spent', 'category', 'difficulty', 'timestamp']
-    file_manager.append_csv('data/dysgraphia/writings.csv', writing_data, fieldnames)
+    record_progress('data/dysgraphia/writings.csv', writing_data, fieldnames)
     
     return jsonify({'success': True, 'message': 'Writing saved successfully'})
 
@@ -325,15 +326,12 @@ def writing_history():
     if 'user_id' not in session:
         return jsonify({'success': False, 'message': 'Not logged in'})
     
-    writings = file_manager.read_csv('data/dysgraphia/writings.csv')
-    user_writings = [w for w in writings if w['user_id'] == session['user_id']]
-    
-    # Sort by timestamp, most recent first
-    user_writings.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    # Writings are appended as they happen, so the newest are at the end of the file
+    recent_writings = file_manager.recent('dysgraphia_writings', 10, user_id=session['user_id'])
     
     return jsonify({
         'success': True,
-        'history': user_writings[:10]  # Return last 10 writings
+        'history': recent_writings  # Return last 10 writings
     })
 
 @dysgraphia_bp.route('/get-letter-practice', methods=['POST'])
@@ -1,8 +1,11 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app, stream_with_context
 from utils.file_manager import file_manager
+from utils.progress_writes import record_progress
+from utils.result_cache import simplification_cache
+from utils.nltk_data import sent_tokenize, word_tokenize
+import json
 import re
-import nltk
-from nltk.tokenize import sent_tokenize, word_tokenize
+import threading
 import random
 
 import os
@@ -12,11 +15,8 @@ os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
 
 dyslexia_bp = Blueprint('dyslexia', __name__)
 
-# Download NLTK data if not present
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt')
+# Cache namespace for rule-based output; bump when the rules change
+RULE_BASED_MODEL_NAME = 'dyslexia-rules-v1'
 
 class DyslexiaAI:
     def __init__(self):
@@ -90,6 +90,32 @@ class DyslexiaAI:
             # Fallback to existing rule-based method
             return self._rule_based_simplify(text)
 
+    def simplify_document(self, text):
+        """Like simplify_text, with the model's per-chunk timing ('chunks' is empty when the model was not used)"""
+        try:
+            from ai_helpers import AIHelpers
+            
+            ai_helper = AIHelpers(current_app.config)
+            if ai_helper.pipeline or ai_helper.model_server:
+                document = ai_helper.simplify_document(text)
+                document['simplified'] = self._post_process_for_dyslexia(document['simplified'])
+                return document
+        except Exception as e:
+            print(f"AI simplification failed, using rule-based: {e}")
+        return {'simplified': self.simplify_text(text), 'chunks': []}
+
+    def stream_simplify(self, text, cancelled):
+        """Yield simplify_text(text) in pieces as the local model produces them"""
+        try:
+            from ai_helpers import AIHelpers
+            
+            ai_helper = AIHelpers(current_app.config)
+        except Exception as e:
+            print(f"AI simplification failed, using rule-based: {e}")
+            yield self._rule_based_simplify(text)
+            return
+        yield from ai_helper.stream_simplify(text, cancelled)
+
     def _post_process_for_dyslexia(self, text):
         """Additional processing specific to dyslexia needs"""
         # Your existing logic here...
@@ -98,6 +124,12 @@ class DyslexiaAI:
         return text
 
     def _rule_based_simplify(self, text):
+        """Rule-based simplification, served from the shared result cache"""
+        return simplification_cache.get_or_compute(
+            text, RULE_BASED_MODEL_NAME, None, self._compute_rule_based_simplify
+        )
+
+    def _compute_rule_based_simplify(self, text):
         """Your existing rule-based simplification logic"""
         # Move your existing simplification logic here
         sentences = sent_tokenize(text)
@@ -289,27 +321,17 @@ def simplify_text():
         return jsonify({'success': False, 'message': 'No text provided'})
     
     try:
-        simplified = dyslexia_ai.simplify_text(text)
+        document = dyslexia_ai.simplify_document(text)
         analysis = dyslexia_ai.analyze_text(text)
         
         # Save progress
-        progress_data = {
-            'user_id': session['user_id'],
-            'activity': 'text_simplification',
-            'original_text': text[:100] + '...' if len(text) > 100 else text,
-            'difficulty': analysis['difficulty'],
-            'word_count': analysis['word_count'],
-            'readability_score': analysis['readability_score'],
-            'timestamp': file_manager.get_timestamp()
-        }
-        
-        fieldnames = ['user_id', 'activity', 'original_text', 'difficulty', 'word_count', 'readability_score', 'timestamp']
-        file_manager.append_csv('data/dyslexia/progress.csv', progress_data, fieldnames)
+        record_simplification(session['user_id'], text, analysis)
         
         return jsonify({
             'success': True,
             'original': text,
-            'simplified': simplified,
+            'simplified': document['simplified'],
+            'chunks': document['chunks'],
             'analysis': analysis
         })
         
@@ -319,6 +341,71 @@ def simplify_text():
             'message': f'Error processing text: {str(e)}'
         }), 500
 
+@dyslexia_bp.route('/simplify/stream', methods=['POST'])
+def simplify_text_stream():
+    """Like /simplify, as server-sent events: analysis first, then the simplified text as it is generated.
+    
+    Events: analysis {original, analysis}, chunk {text} (chunks join to the
+    simplified text), then done {simplified} or error {message}. Generation
+    stops once the client disconnects.
+    """
+    if 'user_id' not in session:
+        return jsonify({'success': False, 'message': 'Not logged in'})
+    
+    data = request.get_json()
+    text = data.get('text', '')
+    
+    if not text.strip():
+        return jsonify({'success': False, 'message': 'No text provided'})
+    
+    try:
+        analysis = dyslexia_ai.analyze_text(text)
+        record_simplification(session['user_id'], text, analysis)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error processing text: {str(e)}'
+        }), 500
+    
+    cancelled = threading.Event()
+    
+    def events():
+        yield server_event('analysis', {'original': text, 'analysis': analysis})
+        pieces = []
+        try:
+            for piece in dyslexia_ai.stream_simplify(text, cancelled):
+                pieces.append(piece)
+                yield server_event('chunk', {'text': piece})
+        except Exception as e:
+            yield server_event('error', {'message': f'Error simplifying text: {str(e)}'})
+            return
+        yield server_event('done', {'simplified': ''.join(pieces)})
+    
+    response = current_app.response_class(stream_with_context(events()), mimetype='text/event-stream')
+    # Closing the response (finished or client gone) stops the generation thread
+    response.call_on_close(cancelled.set)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def server_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+def record_simplification(user_id, text, analysis):
+    """Save a text simplification to the user's dyslexia progress"""
+    progress_data = {
+        'user_id': user_id,
+        'activity': 'text_simplification',
+        'original_text': text[:100] + '...' if len(text) > 100 else text,
+        'difficulty': analysis['difficulty'],
+        'word_count': analysis['word_count'],
+        'readability_score': analysis['readability_score'],
+        'timestamp': file_manager.get_timestamp()
+    }
+    
+    fieldnames = ['user_id', 'activity', 'original_text', 'difficulty', 'word_count', 'readability_score', 'timestamp']
+    record_progress('data/dyslexia/progress.csv', progress_data, fieldnames)
+
 @dyslexia_bp.route('/games')
 def games():
     if 'user_id' not in session:
@@ -406,7 +493,7 @@ def submit_game():
         }
         
         fieldnames = ['user_id', 'game_type', 'difficulty', 'score', 'total_questions', 'accuracy', 'timestamp']
-        file_manager.append_csv('data/dyslexia/games.csv', game_data, fieldnames)
+        record_progress('data/dyslexia/games.csv', game_data, fieldnames)
         
         return jsonify({
             'success': True,
@@ -1,10 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for
 from utils.file_manager import file_manager
-import cv2
-import numpy as np
-import base64
-import io
-from PIL import Image
+from utils.progress_writes import record_progress
 import json
 
 dyspraxia_bp = Blueprint('dyspraxia', __name__)
@@ -241,7 +237,7 @@ def submit_balance_result():
         }
         
         fieldnames = ['user_id', 'activity', 'exercise_name', 'duration', 'stability_score', 'timestamp']
-        file_manager.append_csv('data/dyspraxia/progress.csv', progress_data, fieldnames)
+        record_progress('data/dyspraxia/progress.csv', progress_data, fieldnames)
         
         return jsonify({
             'success': True,
@@ -9,5 +9,31 @@ python -c "import nltk; nltk.download('punkt'); nltk.download('stopwords'); nltk
 # Create necessary directories
 mkdir -p data/users data/progress data/dyslexia data/dyscalculia data/dysgraphia data/dyspraxia data/ai_models static/uploads static/user_data
 
+# Start the shared model server when the web workers are configured to use it
+if [ -n "$AI_MODEL_SERVER_SOCKET" ]; then
+    # Its connections exchange pickles, so it needs a private key
+    if [ -z "$AI_MODEL_SERVER_AUTHKEY" ] && { [ -z "$SECRET_KEY" ] || [ "$SECRET_KEY" = "dev-secret-key" ]; }; then
+        echo "Set AI_MODEL_SERVER_AUTHKEY or SECRET_KEY to use the model server" >&2
+        exit 1
+    fi
+
+    # Restart it whenever it exits, and stop it when this script exits
+    rm -f "$AI_MODEL_SERVER_SOCKET"
+    (
+        while true; do
+            flask --app app model-server
+            echo "Model server exited with status $?; restarting" >&2
+            sleep 2
+        done
+    ) &
+    trap 'kill 0' EXIT
+
+    # Until the socket exists web workers fall back to rule-based simplification, so wait for it
+    for _ in $(seq 120); do
+        [ -S "$AI_MODEL_SERVER_SOCKET" ] && break
+        sleep 1
+    done
+fi
+
 # Start the application
 gunicorn --bind 0.0.0.0:$PORT wsgi:app
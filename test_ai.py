@@ -42,6 +42,19 @@ def test_ai_helpers():
     except Exception as e:
         print(f"❌ Text annotation failed: {e}")
     
+    # Test streamed simplification
+    print("\n4. Testing streamed simplification...")
+    import threading
+    
+    try:
+        pieces = list(ai_helper.stream_simplify(test_text, threading.Event()))
+    except LookupError as e:
+        print(f"⚠️ Streamed simplification skipped, NLTK data is missing: {e}")
+    else:
+        print(f"Streamed {len(pieces)} pieces: {''.join(pieces)}")
+        assert ''.join(pieces) == simplified
+        print("✅ Streamed simplification matches!")
+    
     print("\n" + "=" * 50)
     print("Test completed!")
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Check the table-driven dashboard rules, one user at a time and in batches
+"""
+
+import random
+
+from modules.dashboard import PATTERN_RULES, RECOMMENDATION_RULES, dashboard_ai
+from utils.rule_engine import RuleEvaluator
+
+
+def dashboard_data(rng):
+    value = lambda: rng.choice([0, 1, 9, 10, 14, 15, 19, 20, 30, 31, 49.9, 50, 69.9, 70, 70.1, rng.uniform(0, 100)])
+    return {
+        'dyslexia': {'total_sessions': value(), 'total_games': value(), 'avg_accuracy': value()},
+        'dyscalculia': {'total_problems': value(), 'correct_answers': value(), 'accuracy': value()},
+        'dysgraphia': {'total_sessions': value(), 'total_words_written': value(), 'avg_words_per_session': value()},
+        'dyspraxia': {'total_exercises': value(), 'avg_stability': value(), 'total_duration': value()},
+        'overall_stats': {'total_activities': value(), 'active_days': value(), 'streak': value()},
+    }
+
+
+def test_rules_match_thresholds():
+    low = {
+        'dyslexia': {'total_sessions': 3, 'avg_accuracy': 49.9},
+        'dyscalculia': {'total_problems': 4, 'accuracy': 20},
+        'dysgraphia': {'total_sessions': 2, 'avg_words_per_session': 12},
+        'dyspraxia': {'total_exercises': 1, 'avg_stability': 10},
+        'overall_stats': {'total_activities': 9},
+    }
+    titles = [r['title'] for r in dashboard_ai.generate_ai_recommendations(low)]
+    # High priority first, then table order
+    assert titles == ['Focus on Phonics Practice', 'Math Fundamentals Practice', 'Balance Training Focus',
+                      'Increase Writing Practice', 'Increase Overall Activity']
+    patterns = dashboard_ai.analyze_learning_patterns(low)
+    assert patterns['strengths'] == []
+    assert patterns['areas_for_improvement'] == [
+        'Reading fluency and comprehension', 'Number sense and calculation',
+        'Writing length and expression', 'Motor coordination and balance'
+    ]
+
+    # Only the first rule of a group fires
+    low['dyslexia']['avg_accuracy'] = 50
+    titles = [r['title'] for r in dashboard_ai.generate_ai_recommendations(low)]
+    assert 'Continue Reading Practice' in titles and 'Focus on Phonics Practice' not in titles
+
+    high = {
+        'dyslexia': {'total_sessions': 0, 'avg_accuracy': 70.1},
+        'dyscalculia': {'total_problems': 5, 'accuracy': 90},
+        'dysgraphia': {'total_sessions': 5, 'avg_words_per_session': 31},
+        'dyspraxia': {'total_exercises': 5, 'avg_stability': 70},
+        'overall_stats': {'total_activities': 10},
+    }
+    insights = dashboard_ai.insights(high)
+    assert insights['recommendations'] == []
+    assert insights['learning_patterns']['strengths'] == [
+        'Reading and phonics skills', 'Mathematical problem solving', 'Written expression'
+    ]
+
+
+def test_batch_evaluation_matches_single_users():
+    rng = random.Random(3)
+    users = [dashboard_data(rng) for _ in range(2000)]
+    assert dashboard_ai.insights_many(users) == [dashboard_ai.insights(data) for data in users]
+    assert dashboard_ai.insights_many([]) == []
+
+    evaluator = RuleEvaluator(RECOMMENDATION_RULES + PATTERN_RULES, dashboard_ai.performance_thresholds)
+    fired = evaluator.evaluate_many([evaluator.vector(data) for data in users])
+    for row, data in zip(fired, users):
+        assert row.nonzero()[0].tolist() == evaluator.evaluate(data)
+
+
+if __name__ == "__main__":
+    test_rules_match_thresholds()
+    test_batch_evaluation_matches_single_users()
+    print("✅ Dashboard rules agree one user at a time and in batches!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Check chunked simplification of long documents: splitting, order, per-chunk caching and concurrency
+"""
+
+import tempfile
+import threading
+import time
+
+from ai_helpers import AIHelpers
+from utils.result_cache import simplification_cache
+from utils.text_chunks import estimate_tokens, split_chunks
+
+PARAGRAPHS = [
+    ' '.join(f'Paragraph {p} sentence {s} has a few words in it.' for s in range(12))
+    for p in range(3)
+]
+
+
+class SlowUpperPipeline:
+    """Stands in for the transformers pipeline: upper-cases the prompt after a delay"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt, **params):
+        with self._lock:
+            self.prompts.append(prompt)
+        time.sleep(self.delay)
+        return [{'generated_text': prompt[len('simplify: '):].upper()}]
+
+
+def test_split_chunks_keeps_sentences_and_paragraphs():
+    text = '\n\n'.join(PARAGRAPHS)
+    chunks = split_chunks(text, 40)
+    assert all(estimate_tokens(chunk['text']) <= 40 for chunk in chunks)
+    assert all(chunk['text'].endswith('.') for chunk in chunks)
+    assert ''.join(chunk['text'] + chunk['separator'] for chunk in chunks) == text
+    assert [chunk['separator'] for chunk in chunks].count('\n\n') == 2
+
+    # Editing one paragraph changes only that paragraph's chunks
+    edited = split_chunks('\n\n'.join([PARAGRAPHS[0], 'A new first sentence. ' + PARAGRAPHS[1], PARAGRAPHS[2]]), 40)
+    unchanged = [chunk['text'] for chunk in chunks if not chunk['text'].startswith('Paragraph 1')]
+    assert all(text in [chunk['text'] for chunk in edited] for text in unchanged)
+
+    # A sentence over the budget is split between words
+    long_sentence = ' '.join(['word'] * 100) + '.'
+    pieces = split_chunks(long_sentence, 30)
+    assert len(pieces) > 1 and all(estimate_tokens(piece['text']) <= 30 for piece in pieces)
+    assert split_chunks('  \n\n ', 30) == []
+
+
+def test_simplify_document_in_parallel_with_chunk_cache():
+    settings = (simplification_cache.cache_dir, simplification_cache.enabled)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            simplification_cache.cache_dir, simplification_cache.enabled = cache_dir, True
+            simplification_cache.clear()
+            helper = AIHelpers({'USE_LOCAL_MODELS': False, 'AI_BATCHING_ENABLED': False,
+                                'AI_CHUNK_MAX_TOKENS': 40, 'AI_CHUNK_WORKERS': 8})
+            # Attach the stand-in after construction so no real model is loaded
+            helper.config['USE_LOCAL_MODELS'] = True
+            helper.pipeline = SlowUpperPipeline(0.2)
+            text = '\n\n'.join(PARAGRAPHS)
+
+            started = time.perf_counter()
+            document = helper.simplify_document(text)
+            seconds = time.perf_counter() - started
+            chunks = document['chunks']
+            assert document['simplified'] == text.upper()
+            assert len(chunks) > 4 and [chunk['index'] for chunk in chunks] == list(range(len(chunks)))
+            assert not any(chunk['cached'] or chunk['fallback'] for chunk in chunks)
+            assert all(chunk['seconds'] >= 0.2 for chunk in chunks)
+            # Chunks run concurrently, not one after another
+            assert seconds < 0.2 * len(chunks) / 2
+
+            helper.pipeline.prompts.clear()
+            edited = '\n\n'.join([PARAGRAPHS[0], PARAGRAPHS[1].replace('sentence 3 ', 'line 3 '), PARAGRAPHS[2]])
+            document = helper.simplify_document(edited)
+            assert document['simplified'] == edited.upper()
+            assert len(helper.pipeline.prompts) == 1 and 'LINE 3' in document['simplified']
+            assert sum(not chunk['cached'] for chunk in document['chunks']) == 1
+
+            streamed = ''.join(helper.stream_simplify(edited, threading.Event()))
+            assert streamed == edited.upper()
+    finally:
+        simplification_cache.cache_dir, simplification_cache.enabled = settings
+        simplification_cache.clear()
+
+
+if __name__ == "__main__":
+    test_split_chunks_keeps_sentences_and_paragraphs()
+    test_simplify_document_in_parallel_with_chunk_cache()
+    print("✅ Long documents are simplified chunk by chunk!")
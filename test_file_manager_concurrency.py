@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Multi-process stress test for FileManager CSV appends and rewrites
+"""
+
+import csv
+import multiprocessing
+import os
+import tempfile
+
+from utils.file_manager import FileManager
+
+WORKERS = 6
+ROWS_PER_WORKER = 150
+FIELDNAMES = ['user_id', 'activity', 'text_sample', 'word_count', 'issues_count', 'timestamp']
+DATASET = 'data/dysgraphia/progress.csv'
+
+
+def append_rows(workdir, worker, write_behind):
+    os.chdir(workdir)
+    manager = FileManager()
+    manager.configure({'CSV_WRITE_BEHIND': write_behind, 'CSV_FLUSH_MAX_ROWS': 16, 'CSV_DURABILITY': 'none'})
+    for i in range(ROWS_PER_WORKER):
+        manager.append_csv(DATASET, {
+            'user_id': f'worker_{worker}',
+            'activity': 'writing_analysis',
+            # Quoted newlines and commas make torn rows easy to spot
+            'text_sample': f'Line "{i}" of worker {worker},\nsecond line',
+            'word_count': i,
+            'issues_count': worker,
+            'timestamp': f'{worker}-{i:05d}'
+        }, FIELDNAMES)
+    manager.flush()
+
+
+def run_workers(workdir, write_behind):
+    processes = [
+        multiprocessing.Process(target=append_rows, args=(workdir, worker, write_behind))
+        for worker in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+
+def check_integrity(workdir):
+    os.chdir(workdir)
+    path = os.path.join(workdir, DATASET)
+
+    with open(path, newline='', encoding='utf-8') as file:
+        records = list(csv.reader(file))
+    assert records[0] == FIELDNAMES, 'header must be written exactly once, first'
+    assert all(len(record) == len(FIELDNAMES) for record in records[1:]), 'torn or interleaved row'
+    assert FIELDNAMES not in records[1:], 'header written more than once'
+
+    manager = FileManager()
+    rows = manager.read_csv(DATASET)
+    assert len(rows) == WORKERS * ROWS_PER_WORKER
+
+    for worker in range(WORKERS):
+        expected = [f'{worker}-{i:05d}' for i in range(ROWS_PER_WORKER)]
+        scanned = [r['timestamp'] for r in rows if r['user_id'] == f'worker_{worker}']
+        indexed = [r['timestamp'] for r in manager.read_user(DATASET, f'worker_{worker}')]
+        assert scanned == expected, f'worker {worker} rows lost or reordered'
+        assert indexed == expected, f'worker {worker} index out of sync'
+        assert manager.read_user(DATASET, f'worker_{worker}')[3]['text_sample'] == f'Line "3" of worker {worker},\nsecond line'
+
+
+def test_concurrent_appends():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run_workers(workdir, write_behind=False)
+            check_integrity(workdir)
+    finally:
+        os.chdir(cwd)
+
+
+def test_concurrent_write_behind_appends():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            run_workers(workdir, write_behind=True)
+            check_integrity(workdir)
+    finally:
+        os.chdir(cwd)
+
+
+def test_rewrite_during_appends():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            processes = [
+                multiprocessing.Process(target=append_rows, args=(workdir, worker, False))
+                for worker in range(WORKERS)
+            ]
+            for process in processes:
+                process.start()
+
+            # Rewrite the file (keeping its rows) while the workers append
+            manager = FileManager()
+            for _ in range(20):
+                manager.update_csv(DATASET, lambda rows: rows, FIELDNAMES)
+
+            for process in processes:
+                process.join()
+                assert process.exitcode == 0
+            check_integrity(workdir)
+    finally:
+        os.chdir(cwd)
+
+
+def test_torn_trailing_row_is_ignored():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            manager = FileManager()
+            manager.append_csv(DATASET, {
+                'user_id': 'user_001', 'activity': 'a', 'text_sample': 'ok',
+                'word_count': 1, 'issues_count': 0, 'timestamp': 't1'
+            }, FIELDNAMES)
+            with open(DATASET, 'ab') as file:
+                file.write(b'user_001,a,"half written\nsample')
+
+            assert [r['timestamp'] for r in manager.read_csv(DATASET)] == ['t1']
+            assert [r['timestamp'] for r in manager.read_user(DATASET, 'user_001')] == ['t1']
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_concurrent_appends()
+    test_concurrent_write_behind_appends()
+    test_rewrite_during_appends()
+    test_torn_trailing_row_is_ignored()
+    print("✅ All concurrency checks passed!")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Check that parents and teachers follow learners only through codes the learners issue
+"""
+
+import os
+import tempfile
+
+from flask import Flask
+
+from modules.auth import auth_bp, issue_link_code
+from utils.file_manager import file_manager
+
+
+def test_learners_link_with_one_time_codes():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            app = Flask(__name__)
+            app.secret_key = 'test'
+            app.config['LINK_CODE_TTL_SECONDS'] = 60
+            app.register_blueprint(auth_bp, url_prefix='/auth')
+            learner, guardian = app.test_client(), app.test_client()
+
+            learner.post('/auth/register', json={'username': 'kid', 'email': '', 'password': 'pw', 'role': 'child'})
+            kid = file_manager.find_first('data/users/users.csv', where={'username': 'kid'})
+            assert not learner.get('/auth/learners').get_json()['success']
+
+            # A self-registered teacher follows no one until a learner hands over a code
+            guardian.post('/auth/register', json={'username': 'teach', 'email': '', 'password': 'pw2', 'role': 'teacher'})
+            assert guardian.get('/auth/learners').get_json()['learners'] == []
+            assert not guardian.post('/auth/link-code').get_json()['success']
+
+            code = learner.post('/auth/link-code').get_json()['code']
+            assert not guardian.post('/auth/learners', json={'code': 'WRONG234'}).get_json()['success']
+            linked = guardian.post('/auth/learners', json={'code': code.lower()}).get_json()
+            assert linked['learners'] == [{'id': kid['id'], 'username': 'kid'}]
+            # A code works once, and not after it expires
+            assert not guardian.post('/auth/learners', json={'code': code}).get_json()['success']
+            expired = issue_link_code(kid['id'], -1)
+            assert not guardian.post('/auth/learners', json={'code': expired}).get_json()['success']
+            assert len(guardian.get('/auth/learners').get_json()['learners']) == 1
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_learners_link_with_one_time_codes()
+    print("✅ Guardians link to learners with one-time codes!")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Check the shared model server: results, backpressure, timeouts and crashed workers
+"""
+
+import os
+import stat
+import tempfile
+import threading
+import time
+
+from utils.batching import QueueFullError
+from utils.model_server import ModelServer, ModelServerClient, ModelServerError
+
+
+class EchoPipeline:
+    """Stands in for the transformers pipeline inside the model workers"""
+
+    def __call__(self, prompts, batch_size=1, **params):
+        outputs = []
+        for prompt in prompts:
+            if prompt == 'crash':
+                os._exit(1)
+            if prompt.startswith('sleep'):
+                time.sleep(float(prompt.split()[1]))
+            outputs.append({'generated_text': f'{prompt.upper()} ({os.getpid()})'})
+        return outputs
+
+
+def echo_loader(config):
+    return EchoPipeline()
+
+
+def wait_until_ready(server, seconds=30):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if all(worker['ready'] for worker in server.stats()['workers']):
+            return
+        time.sleep(0.05)
+    raise AssertionError('model workers did not start')
+
+
+def test_model_server():
+    with tempfile.TemporaryDirectory() as workdir:
+        config = {
+            'AI_MODEL_SERVER_SOCKET': os.path.join(workdir, 'model.sock'),
+            'AI_MODEL_WORKERS': 2,
+            'AI_MODEL_SERVER_QUEUE_DEPTH': 4,
+            'AI_BATCH_MAX_SIZE': 1,
+            'SECRET_KEY': 'test',
+        }
+        # The default SECRET_KEY is public, and connections exchange pickles
+        for key in (None, 'dev-secret-key'):
+            try:
+                ModelServer(dict(config, SECRET_KEY=key), loader=echo_loader)
+                assert False, 'server should refuse a public authkey'
+            except ModelServerError:
+                pass
+        server = ModelServer(config, loader=echo_loader)
+        server.start()
+        try:
+            assert stat.S_IMODE(os.stat(config['AI_MODEL_SERVER_SOCKET']).st_mode) == 0o600
+            wait_until_ready(server)
+            client = ModelServerClient()
+            client.configure(config)
+            assert client.generate('simplify: hi', timeout=10, max_length=8).startswith('SIMPLIFY: HI (')
+
+            # Results reach the right caller when threads share the server
+            results = {}
+            threads = [threading.Thread(target=lambda n=n: results.__setitem__(n, client.generate(f'p{n}', timeout=10)))
+                       for n in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert {n: text.split()[0] for n, text in results.items()} == {n: f'P{n}' for n in range(4)}
+
+            # A request that outlives its timeout fails without blocking the next one
+            try:
+                client.generate('sleep 1.5', timeout=0.3)
+                assert False, 'slow request should time out'
+            except TimeoutError:
+                pass
+            assert client.generate('after', timeout=10).startswith('AFTER')
+
+            # Both workers busy and the queue full: further requests are refused at once
+            outcomes = []
+
+            def slow_request():
+                started = time.monotonic()
+                try:
+                    client.generate('sleep 1', timeout=10)
+                    outcomes.append(('ok', time.monotonic() - started))
+                except QueueFullError:
+                    outcomes.append(('busy', time.monotonic() - started))
+
+            blockers = [threading.Thread(target=slow_request) for _ in range(10)]
+            for thread in blockers:
+                thread.start()
+            for thread in blockers:
+                thread.join()
+            refused = [seconds for status, seconds in outcomes if status == 'busy']
+            assert 0 < len(refused) <= 10 - 4 and max(refused) < 0.5
+            assert len(outcomes) == 10
+
+            # A crashed worker fails its request and is replaced
+            try:
+                client.generate('crash', timeout=10)
+                assert False, 'crashed request should fail'
+            except ModelServerError:
+                pass
+            wait_until_ready(server)
+            assert client.generate('again', timeout=10).startswith('AGAIN')
+            stats = client.stats()
+            assert stats['crashed'] == 1 and stats['restarts'] == 1
+            assert stats['busy'] >= 1 and stats['timeouts'] == 1
+        finally:
+            server.stop()
+        assert not os.path.exists(config['AI_MODEL_SERVER_SOCKET'])
+
+
+if __name__ == "__main__":
+    test_model_server()
+    print("✅ Model server shares workers, refuses overload and restarts crashes!")
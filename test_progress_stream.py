@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Check the dashboard progress stream: wake-ups, stream limits and delta events
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+
+from modules.dashboard import progress_stream
+from utils.datasets import DATASETS
+from utils.file_manager import file_manager
+from utils.progress_events import ProgressEventHub, StreamLimitError, progress_events
+from utils.progress_writes import record_progress
+from utils.user_summaries import RECENT_LIMIT, user_summaries
+
+
+def write(dataset, row):
+    spec = DATASETS[dataset]
+    record_progress(spec['path'], row, spec['fieldnames'])
+
+
+def dyscalculia_row(user_id, correct):
+    return {'user_id': user_id, 'problem_type': 'arithmetic', 'difficulty': 'easy', 'correct': correct,
+            'user_answer': 4, 'correct_answer': 4 if correct else 5, 'timestamp': file_manager.get_timestamp()}
+
+
+def parse(lines):
+    events = []
+    for block in lines:
+        fields = dict(line.split(': ', 1) for line in block.strip().split('\n') if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((int(fields['id']), fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_hub_wakes_and_limits_streams():
+    hub = ProgressEventHub(max_streams=2)
+    hub.open('a')
+    hub.open('a')
+    try:
+        hub.open('b')
+        assert False, 'third stream should be rejected'
+    except StreamLimitError:
+        pass
+
+    seen = hub.changes('a')
+    threading.Timer(0.05, hub.notify, ['a']).start()
+    started = time.monotonic()
+    assert hub.wait('a', seen, 5) == seen + 1
+    assert time.monotonic() - started < 1
+    # No wake-up without a write: the wait times out
+    assert hub.wait('a', seen + 1, 0.05) == seen + 1
+
+    hub.close('a')
+    hub.close('a')
+    hub.open('b')
+    assert hub.stats()['open_streams'] == 1
+    assert hub.stats()['rejected'] == 1
+
+
+def test_stream_sends_deltas_after_writes():
+    cwd = os.getcwd()
+    settings = (progress_events.poll_interval, progress_events.heartbeat_seconds, progress_events.max_stream_seconds)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            progress_events.poll_interval, progress_events.heartbeat_seconds = 0.1, 0.3
+            progress_events.max_stream_seconds = 1.0
+            write('dyscalculia_progress', dyscalculia_row('user_001', True))
+            version = user_summaries.get('user_001')['version']
+
+            progress_events.open('user_001')
+            try:
+                threading.Timer(0.2, write, ['dyscalculia_progress', dyscalculia_row('user_001', False)]).start()
+                lines = list(progress_stream('user_001', version))
+            finally:
+                progress_events.close('user_001')
+            assert lines[0].startswith('retry:')
+            assert any(line.startswith(': heartbeat') for line in lines)
+
+            events = parse(lines)
+            assert [name for _, name, _ in events] == ['activity', 'summary', 'recommendations']
+            # One version for the write's events (releasing the write bumps it again, with nothing to send)
+            assert len({event_id for event_id, _, _ in events}) == 1
+            assert events[0][2]['row']['correct'] == 'False'
+            changes = events[1][2]['changes']
+            assert changes['dyscalculia'] == {'total_problems': 2, 'accuracy': 50.0}
+            assert 'dyslexia' not in changes
+
+            # Reconnecting from the old version replays the same deltas; unknown versions get a snapshot
+            progress_events.max_stream_seconds = 0
+            assert [event[1:] for event in parse(progress_stream('user_001', version))] == [event[1:] for event in events]
+            snapshot = parse(progress_stream('user_001', 12345))
+            assert snapshot[0][1] == 'snapshot'
+            assert snapshot[0][2]['data']['dyscalculia']['total_problems'] == 2
+
+            # More new rows than the summary keeps cannot be sent as activity deltas
+            version = user_summaries.get('user_001')['version']
+            for _ in range(RECENT_LIMIT + 1):
+                write('dyscalculia_progress', dyscalculia_row('user_001', True))
+            events = parse(progress_stream('user_001', version))
+            assert [name for _, name, _ in events] == ['snapshot']
+            assert events[0][2]['data']['dyscalculia']['total_problems'] == RECENT_LIMIT + 3
+    finally:
+        progress_events.poll_interval, progress_events.heartbeat_seconds, progress_events.max_stream_seconds = settings
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_hub_wakes_and_limits_streams()
+    test_stream_sends_deltas_after_writes()
+    print("✅ Progress streams send deltas!")
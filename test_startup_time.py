@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Check that a cold start stays within STARTUP_IMPORT_BUDGET_MS and defers heavy libraries
+"""
+
+import tempfile
+
+from config import Config
+from utils.import_report import format_report, measure
+
+
+def test_cold_start_within_budget():
+    # A fresh interpreter in an empty directory, as a new gunicorn worker on a fresh box
+    with tempfile.TemporaryDirectory() as workdir:
+        report = measure(cwd=workdir)
+    print(format_report(report, Config.STARTUP_IMPORT_BUDGET_MS))
+    assert report['loaded'] == [], f"imported at startup: {report['loaded']}"
+    assert report['seconds'] * 1000 <= Config.STARTUP_IMPORT_BUDGET_MS, \
+        f"cold start took {report['seconds'] * 1000:.0f} ms (budget {Config.STARTUP_IMPORT_BUDGET_MS} ms)"
+
+
+if __name__ == "__main__":
+    test_cold_start_within_budget()
+    print("✅ Cold start is within budget!")
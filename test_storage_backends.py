@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Check that the CSV and SQLite storage backends return the same data
+"""
+
+import csv
+import os
+import tempfile
+
+from utils.file_manager import FileManager
+from utils.progress_store import iter_records, iter_records_reverse, progress_store
+
+FIELDNAMES = ['user_id', 'problem_type', 'difficulty', 'correct', 'user_answer', 'correct_answer', 'timestamp']
+DATASET = 'data/dyscalculia/progress.csv'
+
+ROWS = [
+    {'user_id': 'user_001', 'problem_type': 'addition', 'difficulty': 'easy', 'correct': True,
+     'user_answer': 4, 'correct_answer': 4, 'timestamp': '2025-01-02T10:00:00'},
+    {'user_id': 'user_002', 'problem_type': 'addition', 'difficulty': 'easy', 'correct': False,
+     'user_answer': 3, 'correct_answer': 5, 'timestamp': '2025-01-02T11:00:00'},
+    {'user_id': 'user_001', 'problem_type': 'subtraction', 'difficulty': 'medium', 'correct': False,
+     'user_answer': 1, 'correct_answer': 2, 'timestamp': '2025-01-01T09:00:00'},
+    {'user_id': 'user_001', 'problem_type': 'word "problems",\nmulti-line', 'difficulty': 'hard', 'correct': True,
+     'user_answer': 12, 'correct_answer': 12, 'timestamp': '2025-01-05T08:30:00'},
+]
+
+
+def run_backend(backend):
+    manager = FileManager()
+    manager.configure({'STORAGE_BACKEND': backend, 'SQLITE_STORAGE_PATH': 'data/storage.db'})
+    for row in ROWS:
+        manager.append_csv(DATASET, row, FIELDNAMES)
+
+    results = {
+        'read_csv': manager.read_csv(DATASET),
+        'read_user': manager.read_user(DATASET, 'user_001'),
+        'tail_user': manager.tail_user('dyscalculia_progress', 'user_001', 2),
+        'query': manager.query('dyscalculia_progress', user_id='user_001', newest_first=True,
+                               columns=['problem_type', 'timestamp'], limit=2),
+        'query_range': manager.query('dyscalculia_progress', since='2025-01-02', until='2025-01-03'),
+        'aggregate': manager.aggregate('dyscalculia_progress', {
+            'total': ('count', None),
+            'answers': ('sum', 'user_answer'),
+            'best': ('max', 'correct_answer'),
+        }, user_id='user_001'),
+        'correct': manager.aggregate('dyscalculia_progress', {'n': ('count', None)}, where={'correct': True}),
+        'dates': manager.active_dates('user_001', ['dyscalculia_progress']),
+        'counts': manager.count_by_user('dyscalculia_progress'),
+        'stream': list(manager.iter_rows(DATASET, columns=['user_id', 'timestamp'], where={'correct': False})),
+        'stream_user': list(manager.iter_rows('dyscalculia_progress', user_id='user_001',
+                                              predicate=lambda r: r['difficulty'] != 'easy')),
+        'first': manager.find_first(DATASET, where={'user_id': 'user_001', 'correct': True}),
+        'missing': manager.find_first(DATASET, where={'user_id': 'nobody'}),
+        'recent': manager.recent(DATASET, 2),
+        'recent_user': manager.recent('dyscalculia_progress', 5, user_id='user_001'),
+        'activity': manager.find_activity(DATASET, 'user_001', '2025-01-05T08:30:00'),
+        'activity_prefix': manager.find_activity(DATASET, 'user_001', '2025-01-05'),
+        'activity_other_user': manager.find_activity(DATASET, 'user_002', '2025-01-05T08:30:00'),
+    }
+
+    manager.update_csv(DATASET, lambda rows: [r for r in rows if r['user_id'] != 'user_002'], FIELDNAMES)
+    results['after_update'] = manager.read_csv(DATASET)
+    return results
+
+
+def test_backends_agree():
+    cwd = os.getcwd()
+    try:
+        results = {}
+        for backend in ('csv', 'sqlite'):
+            with tempfile.TemporaryDirectory() as workdir:
+                os.chdir(workdir)
+                results[backend] = run_backend(backend)
+                os.chdir(cwd)
+
+        for key, expected in results['csv'].items():
+            assert results['sqlite'][key] == expected, f'{key} differs between backends'
+
+        csv_results = results['csv']
+        assert csv_results['aggregate'] == {'total': 3, 'answers': 17.0, 'best': 12.0}
+        assert csv_results['correct'] == {'n': 2}
+        assert csv_results['dates'] == {'2025-01-01', '2025-01-02', '2025-01-05'}
+        assert [r['timestamp'] for r in csv_results['query']] == ['2025-01-05T08:30:00', '2025-01-02T10:00:00']
+        assert len(csv_results['after_update']) == 3
+        assert [r['user_id'] for r in csv_results['stream']] == ['user_002', 'user_001']
+        assert len(csv_results['stream_user']) == 2
+        assert csv_results['first']['timestamp'] == '2025-01-02T10:00:00'
+        assert csv_results['missing'] is None
+        assert [r['user_id'] for r in csv_results['recent']] == ['user_001', 'user_001']
+        assert [r['timestamp'] for r in csv_results['recent_user']] == [
+            '2025-01-05T08:30:00', '2025-01-01T09:00:00', '2025-01-02T10:00:00']
+        assert csv_results['activity']['problem_type'] == 'word "problems",\nmulti-line'
+        assert csv_results['activity_prefix'] is None
+        assert csv_results['activity_other_user'] is None
+    finally:
+        os.chdir(cwd)
+
+
+def test_reverse_reader_handles_quoted_newlines():
+    with tempfile.TemporaryDirectory() as workdir:
+        path = os.path.join(workdir, 'progress.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(['user_id', 'text_sample'])
+            for i in range(200):
+                writer.writerow([f'user_{i % 3}', f'line "{i}"\n\nnext, line\n' * (i % 4) + 'end'])
+            file.write('user_0,"torn\nrecord')
+
+        with open(path, 'rb') as file:
+            forward = list(iter_records(file))
+            header_end = forward[0][1]
+            end = forward[-1][0] + forward[-1][1]
+            for block_size in (1, 7, 64, 1 << 16):
+                backward = list(iter_records_reverse(file, header_end, end, block_size))
+                assert backward == forward[:0:-1], f'block size {block_size}'
+
+        manager = FileManager()
+        newest = manager.recent(path, 3)
+        assert [row['text_sample'][-3:] for row in newest] == ['end'] * 3
+        assert newest[0]['user_id'] == 'user_1'  # row 199; the torn record is skipped
+        assert [r['user_id'] for r in manager.recent(path, 2, user_id='user_2')] == ['user_2', 'user_2']
+
+
+def test_legacy_index_log_is_rebuilt():
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            manager = FileManager()
+            for row in ROWS:
+                manager.append_csv(DATASET, row, FIELDNAMES)
+            # Index logs written before activity ids had no timestamp column
+            idx_path = progress_store.index_path(DATASET)
+            with open(idx_path) as log:
+                legacy = ''.join(line.rsplit(',', 1)[0] + '\n' for line in log)
+            with open(idx_path, 'w') as log:
+                log.write(legacy)
+            progress_store._indexes.clear()
+
+            assert manager.find_activity(DATASET, 'user_002', '2025-01-02T11:00:00')['user_answer'] == '3'
+            assert len(manager.read_user(DATASET, 'user_001')) == 3
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_backends_agree()
+    test_reverse_reader_handles_quoted_newlines()
+    test_legacy_index_log_is_rebuilt()
+    print("✅ CSV and SQLite backends agree!")
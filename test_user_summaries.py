@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Check that incrementally maintained user summaries match a rebuild from raw rows
+"""
+
+import os
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+
+from modules.dashboard import dashboard_data_from_summary, learner_insights, learner_insights_many
+from utils.activity_calendar import ActivityCalendar
+from utils.analytics import METRICS, AnalyticsEngine
+from utils.cohort_stats import CohortStatsStore
+from utils.datasets import DATASETS
+from utils.progress_rollups import ROLLUP_DATASETS, ProgressRollupStore, progress_rollups
+from utils.progress_writes import PROGRESS_STORES, record_progress
+from utils.file_manager import file_manager
+from utils.recommendation_store import RecommendationStore
+from utils.user_summaries import SUMMARY_DATASETS, streak_from_dates, summary_drift, user_summaries
+
+
+def make_row(dataset, user_id, timestamp):
+    values = {
+        'user_id': user_id,
+        'activity': 'activity',
+        'original_text': 'some "quoted" text,\nsecond line',
+        'difficulty': random.choice(['Easy', 'Medium', 'Hard']),
+        'word_count': random.randint(1, 120),
+        'readability_score': 'Easy',
+        'game_type': 'phonics',
+        'score': random.randint(0, 5),
+        'total_questions': 5,
+        'accuracy': round(random.uniform(0, 100), 2),
+        'problem_type': 'arithmetic',
+        'correct': random.choice([True, False]),
+        'user_answer': random.randint(0, 20),
+        'correct_answer': random.randint(0, 20),
+        'text_sample': 'Line one\nline two',
+        'issues_count': random.randint(0, 6),
+        'exercise_name': 'Stand on One Foot',
+        'duration': round(random.uniform(1, 20), 3),
+        'stability_score': random.randint(0, 100),
+        'prompt': 'Describe your day',
+        'time_spent': random.randint(30, 900),
+        'category': 'general',
+        'timestamp': timestamp,
+    }
+    return {field: values[field] for field in DATASETS[dataset]['fieldnames']}
+
+
+def write(dataset, row):
+    spec = DATASETS[dataset]
+    record_progress(spec['path'], row, spec['fieldnames'])
+
+
+def test_incremental_summaries_match_rebuild():
+    random.seed(11)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            # An existing games file whose header predates the difficulty column
+            os.makedirs('data/dyslexia')
+            with open(DATASETS['dyslexia_games']['path'], 'w') as file:
+                file.write('user_id,game_type,score,total_questions,accuracy,timestamp\n')
+
+            start = datetime(2025, 3, 1, 9)
+            users = ['user_001', 'user_002', 'user_003']
+            write('dyscalculia_progress', make_row('dyscalculia_progress', 'user_001', start.isoformat()))
+            # First read builds the summary from raw rows
+            assert user_summaries.get('user_001')['datasets']['dyscalculia_progress']['count'] == 1
+
+            moment = start
+            for _ in range(300):
+                moment += timedelta(hours=random.choice([0, 1, 7, 20, 30, 60]))
+                dataset = random.choice(list(SUMMARY_DATASETS))
+                write(dataset, make_row(dataset, random.choice(users), moment.isoformat()))
+
+            for user_id in users:
+                summary = user_summaries.get(user_id)
+                assert summary_drift(summary, user_summaries.compute(user_id)) == [], user_id
+
+            # Rows dated before the last active day still land on the calendar
+            early = (start - timedelta(days=3)).isoformat()
+            write('dysgraphia_progress', make_row('dysgraphia_progress', 'user_001', early))
+            summary = file_manager.read_json(user_summaries.path('user_001'))
+            assert summary['stale'] is False
+            assert summary_drift(summary, user_summaries.compute('user_001')) == []
+            assert user_summaries.calendar('user_001').is_active(early[:10])
+            assert user_summaries.rebuild('user_001') == []
+
+            # Several missing summaries are rebuilt together in one pass
+            for user_id in users:
+                os.remove(user_summaries.path(user_id))
+            batch = user_summaries.get_many(users + ['nobody'])
+            for user_id in users:
+                assert summary_drift(batch[user_id], user_summaries.compute(user_id)) == [], user_id
+                assert user_summaries.rebuild(user_id) == []
+            assert batch['nobody']['total_activities'] == 0
+    finally:
+        os.chdir(cwd)
+
+
+def test_calendar_matches_date_sets():
+    rng = random.Random(5)
+    origin = date(2024, 12, 25)
+    for _ in range(200):
+        days = {origin + timedelta(days=rng.randint(0, 90)) for _ in range(rng.randint(0, 40))}
+        calendar = ActivityCalendar()
+        for day in rng.sample(sorted(days), len(days)):
+            calendar.add(day.isoformat())
+
+        strings = {day.isoformat() for day in days}
+        assert calendar.active_days() == len(strings)
+        assert calendar.streak() == streak_from_dates(strings)
+        window = [origin + timedelta(days=i) for i in range(-5, 100)]
+        assert calendar.days(window[0], window[-1]) == [int(day in days) for day in window]
+        if days:
+            assert calendar.last_day() == max(days)
+            today = max(days) + timedelta(days=1)
+            assert calendar.current_streak(today) == streak_from_dates(strings)
+            assert calendar.current_streak(today + timedelta(days=1)) == 0
+
+
+def assert_close(actual, expected, where=''):
+    if isinstance(expected, dict):
+        assert sorted(actual) == sorted(expected), where
+        for key in expected:
+            assert_close(actual[key], expected[key], f'{where}/{key}')
+    elif isinstance(expected, list):
+        assert len(actual) == len(expected), where
+        for index, value in enumerate(expected):
+            assert_close(actual[index], value, f'{where}/{index}')
+    elif isinstance(expected, float):
+        assert abs(actual - expected) < 1e-6, where
+    else:
+        assert actual == expected, where
+
+
+def test_incremental_rollups_match_rebuild():
+    random.seed(17)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            rollups = ProgressRollupStore()
+            rollups.configure({'ROLLUP_DAY_RETENTION_DAYS': 30, 'ROLLUP_WEEK_RETENTION_WEEKS': 10})
+            today = date.today()
+            user_id = 'user_001'
+            rows = []
+            for _ in range(400):
+                moment = datetime.combine(today, datetime.min.time()) - timedelta(hours=random.randint(0, 24 * 200))
+                dataset = random.choice(list(ROLLUP_DATASETS))
+                rows.append((dataset, make_row(dataset, user_id, moment.isoformat())))
+
+            for index, (dataset, row) in enumerate(rows):
+                spec = DATASETS[dataset]
+                rollups.reserve(spec['path'], row, spec['fieldnames'])
+                file_manager.append_csv(spec['path'], row, spec['fieldnames'])
+                rollups.record(spec['path'], row, spec['fieldnames'])
+                rollups.release(spec['path'], row, spec['fieldnames'])
+                if index == 0:
+                    rollups.get(user_id)  # first read builds the rollup from raw rows
+
+            # Rows older than the retention went to week and month buckets only
+            stored = rollups.get(user_id)
+            assert_close(stored['buckets'], rollups.compute(user_id)['buckets'])
+            assert stored['retained_from']['day'] == (today - timedelta(days=30)).isoformat()
+
+            later = today + timedelta(days=45)
+            assert rollups.compact_all(later)[1] > 0
+            stored = rollups.get(user_id)
+            assert all(start >= (later - timedelta(days=30)).isoformat() for start in stored['buckets']['day'])
+            assert stored['retained_from']['day'] == (later - timedelta(days=30)).isoformat()
+
+            # Any range, any bucket size: month buckets still cover compacted days
+            month = rollups.series(user_id, today - timedelta(days=200), today, 'month')
+            assert sum(b['datasets'].get('dyscalculia_progress', {}).get('count', 0) for b in month['buckets']) == \
+                len(list(file_manager.iter_rows('dyscalculia_progress', user_id=user_id)))
+            days = rollups.series(user_id, today - timedelta(days=6), today, 'day', ['dyspraxia_progress'])
+            assert all(set(b['datasets']) == {'dyspraxia_progress'} for b in days['buckets'])
+    finally:
+        os.chdir(cwd)
+
+
+def test_rebuild_interleaved_with_write():
+    random.seed(23)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            user_id = 'user_001'
+            spec = DATASETS['dyscalculia_progress']
+            stores = [user_summaries, ProgressRollupStore()]
+            moment = datetime(2025, 3, 1, 9)
+
+            def count(store):
+                record = store.get(user_id)
+                if store is user_summaries:
+                    return record['datasets']['dyscalculia_progress']['count']
+                return sum(bucket['dyscalculia_progress']['count'] for bucket in record['buckets']['month'].values())
+
+            def write_row():
+                nonlocal moment
+                moment += timedelta(hours=5)
+                row = make_row('dyscalculia_progress', user_id, moment.isoformat())
+                for store in stores:
+                    store.reserve(spec['path'], row, spec['fieldnames'])
+                file_manager.append_csv(spec['path'], row, spec['fieldnames'])
+                return row
+
+            def record_row(row):
+                for store in stores:
+                    store.record(spec['path'], row, spec['fieldnames'])
+                for store in stores:
+                    store.release(spec['path'], row, spec['fieldnames'])
+
+            record_row(write_row())
+            for store in stores:
+                assert count(store) == 1
+
+            # A rebuild between a write's append and its fold scans the row
+            # already; it must not be saved, or the fold counts the row twice
+            row = write_row()
+            for store in stores:
+                file_manager.update_json(store.path(user_id), lambda record: dict(record, stale=True))
+                assert count(store) == 2
+            record_row(row)
+            for store in stores:
+                assert count(store) == 2
+
+            # A write that lands after a rebuild scanned the rows is folded
+            # into the stored record, not lost under the rebuilt one
+            for store in stores:
+                file_manager.update_json(store.path(user_id), lambda record: dict(record, stale=True))
+                compute = store.compute
+
+                def compute_then_write(user_id, compute=compute):
+                    record = compute(user_id)
+                    record_row(write_row())
+                    return record
+
+                store.compute = compute_then_write
+                assert count(store) in (2, 3)
+                del store.compute
+            for store in stores:
+                assert count(store) == 4
+                assert not file_manager.read_json(store.path(user_id)).get('pending')
+    finally:
+        os.chdir(cwd)
+
+
+def test_rebuild_before_write_behind_flush():
+    random.seed(29)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            file_manager.configure({'CSV_WRITE_BEHIND': True, 'CSV_FLUSH_INTERVAL_MS': 60000, 'CSV_FLUSH_MAX_ROWS': 1000})
+            spec = DATASETS['dyscalculia_progress']
+            # A new user's first write: there is no summary or rollup to fold into yet
+            record_progress(spec['path'], make_row('dyscalculia_progress', 'user_001', '2025-03-01T09:00:00'),
+                            spec['fieldnames'])
+
+            # Another worker rebuilds while the row is still in this worker's buffer
+            appender, file_manager.write_behind = file_manager.write_behind, None
+            try:
+                assert user_summaries.get('user_001')['datasets']['dyscalculia_progress']['count'] == 0
+                assert progress_rollups.get('user_001')['buckets']['month'] == {}
+            finally:
+                file_manager.write_behind = appender
+
+            file_manager.flush()
+            assert user_summaries.get('user_001')['datasets']['dyscalculia_progress']['count'] == 1
+            assert sum(bucket['dyscalculia_progress']['count']
+                       for bucket in progress_rollups.get('user_001')['buckets']['month'].values()) == 1
+            for store in PROGRESS_STORES:
+                assert not file_manager.read_json(store.path('user_001')).get('pending')
+    finally:
+        file_manager.configure({})
+        os.chdir(cwd)
+
+
+def assert_engine_matches_summaries(engine, users):
+    for user_id in users:
+        expected = dashboard_data_from_summary(user_summaries.compute(user_id))
+        stats = engine.user_stats(user_id)
+        for name in METRICS:
+            module, field = name.split('.')
+            assert abs(stats[name] - expected[module][field]) < 1e-9, (user_id, name)
+
+
+def test_analytics_engine_matches_summaries():
+    random.seed(23)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            engine = AnalyticsEngine()
+            users = ['user_001', 'user_002', 'user_003', 'user_004']
+            moment = datetime(2025, 6, 1, 8)
+            for _ in range(3):
+                for _ in range(150):
+                    moment += timedelta(hours=random.choice([1, 5, 20, 30]))
+                    dataset = random.choice(list(SUMMARY_DATASETS))
+                    write(dataset, make_row(dataset, random.choice(users[:3]), moment.isoformat()))
+                file_manager.flush()
+                assert_engine_matches_summaries(engine, users)
+            assert engine.stats()['incremental_loads'] > 0
+
+            # A rewritten file is loaded again in full
+            spec = DATASETS['dyspraxia_progress']
+            file_manager.update_csv(spec['path'], lambda rows: rows[::2], spec['fieldnames'])
+            assert_engine_matches_summaries(engine, users)
+            assert engine.cohort_stats()['unknown']['users'] == 3
+
+            # /dashboard/compare places one user in the saved distributions
+            store = CohortStatsStore()
+            store.precompute(engine)
+            busiest = max(users[:3], key=lambda user_id: engine.user_stats(user_id)['overall_stats.total_activities'])
+            data = dashboard_data_from_summary(user_summaries.get(busiest))
+            comparison = store.compare(None, data, by='role')
+            assert comparison['cohort'] == 'unknown' and comparison['cohort_size'] == 3
+            metric = comparison['metrics']['overall_stats.total_activities']
+            assert metric['value'] == data['overall_stats']['total_activities'] and metric['percentile'] == 100
+    finally:
+        os.chdir(cwd)
+
+
+def test_precomputed_recommendations_follow_summary_version():
+    random.seed(17)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            users = [f'user_{i:03d}' for i in range(5)]
+            moment = datetime(2025, 2, 1, 8)
+            for _ in range(60):
+                moment += timedelta(hours=random.choice([1, 9, 30]))
+                dataset = random.choice(list(SUMMARY_DATASETS))
+                write(dataset, make_row(dataset, random.choice(users), moment.isoformat()))
+
+            store = RecommendationStore()
+            store.chunk_size = 2
+            assert store.precompute(users, learner_insights_many, workers=1) == len(users)
+            for user_id in users:
+                summary = user_summaries.get(user_id)
+                stored = store.get_for(user_id, summary, learner_insights)
+                assert stored['summary_version'] == summary['version']
+                assert stored['recommendations'] == learner_insights(summary)['recommendations']
+            assert store.stats()['served'] == len(users)
+
+            # New activity makes only that user's results out of date
+            write('dyspraxia_progress', make_row('dyspraxia_progress', users[0], moment.isoformat()))
+            summary = user_summaries.get(users[0])
+            assert store.get_for(users[0], summary, learner_insights)['summary_version'] == summary['version']
+            assert store.stats()['recomputed'] == 1
+            assert file_manager.read_json(store.path(users[0]))['summary_version'] == summary['version']
+            store.get_for(users[1], user_summaries.get(users[1]), learner_insights)
+            assert store.stats()['recomputed'] == 1
+    finally:
+        os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    test_incremental_summaries_match_rebuild()
+    test_calendar_matches_date_sets()
+    test_analytics_engine_matches_summaries()
+    test_incremental_rollups_match_rebuild()
+    test_rebuild_interleaved_with_write()
+    test_rebuild_before_write_behind_flush()
+    test_precomputed_recommendations_follow_summary_version()
+    print("✅ Incremental summaries match rebuilds!")
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+
+
+def as_date(day):
+    """Accept a date or a 'YYYY-MM-DD' string"""
+    if isinstance(day, date):
+        return day
+    return date.fromisoformat(day)
+
+
+class ActivityCalendar:
+    """One bit per day a user was active, counted from an origin day.
+
+    Bit i stands for origin + i days. Setting a bit before the origin moves
+    the origin back, so rows may arrive in any order. Active days are a
+    popcount and a streak is the run of set bits ending at a given day.
+    Stored in JSON as the origin day and the bits as hex.
+    """
+
+    def __init__(self, origin=None, bits=0):
+        self.origin = as_date(origin) if origin else None
+        self.bits = bits
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(data.get('origin'), int(data.get('bits') or '0', 16))
+
+    def to_dict(self):
+        return {
+            'origin': self.origin.isoformat() if self.origin else None,
+            'bits': format(self.bits, 'x')
+        }
+
+    def __eq__(self, other):
+        """Same active days, whatever the origins"""
+        if not isinstance(other, ActivityCalendar):
+            return NotImplemented
+        if not self.bits or not other.bits:
+            return self.bits == other.bits
+        origin = min(self.origin, other.origin)
+        return (self.bits << (self.origin - origin).days) == (other.bits << (other.origin - origin).days)
+
+    def add(self, day):
+        """Mark day active"""
+        day = as_date(day)
+        if self.origin is None:
+            self.origin = day
+        elif day < self.origin:
+            self.bits <<= (self.origin - day).days
+            self.origin = day
+        self.bits |= 1 << (day - self.origin).days
+
+    def is_active(self, day):
+        if self.origin is None:
+            return False
+        offset = (as_date(day) - self.origin).days
+        return offset >= 0 and bool(self.bits >> offset & 1)
+
+    def active_days(self):
+        return self.bits.bit_count()
+
+    def last_day(self):
+        """The most recent active day, or None"""
+        if not self.bits:
+            return None
+        return self.origin + timedelta(days=self.bits.bit_length() - 1)
+
+    def streak(self, until=None):
+        """Consecutive active days ending at until (default: the last active day)"""
+        if not self.bits:
+            return 0
+        end = self.bits.bit_length() - 1 if until is None else (as_date(until) - self.origin).days
+        if end < 0:
+            return 0
+        window = (1 << (end + 1)) - 1
+        gaps = ~self.bits & window
+        if not gaps:
+            return end + 1
+        # The highest unset bit at or below end is the most recent inactive day
+        return end - gaps.bit_length() + 1
+
+    def current_streak(self, today=None):
+        """Streak still alive today: ending today, or yesterday if today has no activity yet"""
+        today = as_date(today or date.today())
+        return self.streak(today) or self.streak(today - timedelta(days=1))
+
+    def days(self, start, end):
+        """0/1 per day from start to end inclusive, for heatmaps"""
+        start, end = as_date(start), as_date(end)
+        count = (end - start).days + 1
+        if count <= 0:
+            return []
+        if self.origin is None:
+            return [0] * count
+        offset = (start - self.origin).days
+        window = self.bits >> offset if offset >= 0 else self.bits << -offset
+        return [window >> i & 1 for i in range(count)]
@@ -0,0 +1,472 @@
+import csv
+import io
+import os
+import threading
+
+from utils.datasets import DATASETS
+from utils.file_locks import locked
+from utils.file_manager import complete_records, file_manager
+from utils.lazy import lazy_import
+from utils.progress_store import iter_records
+from utils.sqlite_store import quote
+
+np = lazy_import('numpy')
+pd = lazy_import('pandas')
+
+# Typed columns kept in memory for each dataset; free text stays on disk.
+# 'key' and 'category' columns are categoricals, 'number' is float64
+# (blank or invalid values become NaN), 'flag' is True where the stored
+# value is 'True', and 'time' is datetime64.
+FRAME_SCHEMAS = {
+    'users': {'id': 'key', 'role': 'category', 'age': 'number', 'conditions': 'category', 'created_at': 'time'},
+    'dyslexia_progress': {'user_id': 'key', 'difficulty': 'category', 'word_count': 'number', 'timestamp': 'time'},
+    'dyslexia_games': {'user_id': 'key', 'game_type': 'category', 'score': 'number',
+                       'total_questions': 'number', 'accuracy': 'number', 'timestamp': 'time'},
+    'dyscalculia_progress': {'user_id': 'key', 'problem_type': 'category', 'difficulty': 'category',
+                             'correct': 'flag', 'timestamp': 'time'},
+    'dysgraphia_progress': {'user_id': 'key', 'word_count': 'number', 'issues_count': 'number', 'timestamp': 'time'},
+    'dysgraphia_writings': {'user_id': 'key', 'category': 'category', 'difficulty': 'category',
+                            'word_count': 'number', 'time_spent': 'number', 'timestamp': 'time'},
+    'dyspraxia_progress': {'user_id': 'key', 'exercise_name': 'category', 'duration': 'number',
+                           'stability_score': 'number', 'timestamp': 'time'},
+}
+
+# Datasets whose rows count as activities for active days and streaks
+ACTIVITY_DATASETS = ['dyslexia_progress', 'dyscalculia_progress', 'dysgraphia_progress', 'dyspraxia_progress']
+
+# Per-user metrics, named like the /dashboard/data fields they match
+METRICS = [
+    'dyslexia.total_sessions', 'dyslexia.total_games', 'dyslexia.avg_accuracy',
+    'dyscalculia.total_problems', 'dyscalculia.correct_answers', 'dyscalculia.accuracy',
+    'dysgraphia.total_sessions', 'dysgraphia.total_words_written', 'dysgraphia.avg_words_per_session',
+    'dyspraxia.total_exercises', 'dyspraxia.avg_stability', 'dyspraxia.total_duration',
+    'overall_stats.total_activities', 'overall_stats.active_days', 'overall_stats.streak',
+]
+
+COHORT_COLUMNS = ('role', 'conditions', 'age', 'signup_month')
+
+
+def typed_frame(dataset, raw):
+    """Convert a frame of stored strings to the dataset's declared dtypes"""
+    schema = FRAME_SCHEMAS[dataset]
+    columns = {}
+    for column, kind in schema.items():
+        values = raw[column] if column in raw else pd.Series('', index=raw.index, dtype=object)
+        # read_csv may already have parsed a column to its final dtype
+        if kind in ('key', 'category'):
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.fillna('').astype('category')
+            columns[column] = values
+        elif kind == 'number':
+            if values.dtype != 'float64':
+                values = pd.to_numeric(values.fillna(''), errors='coerce').astype('float64')
+            columns[column] = values
+        elif kind == 'flag':
+            columns[column] = (values == 'True').to_numpy()
+        else:
+            columns[column] = pd.to_datetime(values.fillna(''), format='ISO8601', errors='coerce')
+    return pd.DataFrame(columns, index=pd.RangeIndex(len(raw)))
+
+
+def concat_frames(frames):
+    """Concatenate typed frames, merging categoricals instead of falling back to object"""
+    frames = [f for f in frames if len(f)]
+    if not frames:
+        return None
+    if len(frames) == 1:
+        return frames[0]
+    columns = {}
+    for column in frames[0].columns:
+        parts = [f[column] for f in frames]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            columns[column] = pd.api.types.union_categoricals(parts)
+        else:
+            columns[column] = np.concatenate([p.to_numpy() for p in parts])
+    return pd.DataFrame(columns)
+
+
+def day_numbers(times):
+    """Days since the epoch for a datetime64 column, NaN where the time is missing"""
+    days = times.to_numpy().astype('datetime64[D]').astype('int64').astype('float64')
+    days[times.isna().to_numpy()] = np.nan
+    return days
+
+
+def round_like_python(values, digits=1):
+    """round() per value: NumPy rounds 56.45 to 56.4 where the dashboard's round() gives 56.5"""
+    return values.map(lambda value: round(value, digits)).astype('float64')
+
+
+class _Frame:
+    def __init__(self, data, position):
+        self.data = data
+        self.position = position
+        self.version = 0
+
+
+class AnalyticsEngine:
+    """Columnar, typed copies of the datasets for bulk and cohort statistics.
+
+    Each dataset is parsed once into a pandas frame holding only the columns
+    in FRAME_SCHEMAS, converted to real dtypes, so aggregates run as
+    vectorized group-bys rather than per-row float()/int() calls. Frames
+    refresh incrementally: CSV files are read from the last byte consumed
+    (or from the last rowid with the SQLite backend), and only a file that
+    was rewritten is loaded again from scratch. One user's dashboard comes
+    from their summary record (utils/user_summaries.py); this engine is for
+    questions about every user at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._metrics = None
+        self._stats = {
+            'full_loads': 0,
+            'incremental_loads': 0,
+            'rows_loaded': 0
+        }
+
+    # -- Loading ---------------------------------------------------------
+
+    def frame(self, dataset):
+        """The dataset's typed frame, refreshed with any rows written since the last call"""
+        with self._lock:
+            return self._refresh(dataset).data
+
+    def _refresh(self, dataset):
+        current = self._frames.get(dataset)
+        if file_manager.sqlite is not None:
+            loaded = self._load_sqlite(dataset, current)
+        else:
+            loaded = self._load_csv(dataset, current)
+
+        if loaded is None:
+            return current
+        raw, position, full = loaded
+        new = typed_frame(dataset, raw)
+        if not full and not len(new):
+            # Only a torn record so far; nothing changed
+            current.position = position
+            return current
+        self._stats['full_loads' if full else 'incremental_loads'] += 1
+        self._stats['rows_loaded'] += len(new)
+        if full or current is None:
+            refreshed = _Frame(new, position)
+            refreshed.version = current.version + 1 if current else 1
+        else:
+            refreshed = _Frame(concat_frames([current.data, new]), position)
+            refreshed.version = current.version + 1
+        self._frames[dataset] = refreshed
+        return refreshed
+
+    def _read_raw(self, text, fieldnames, dataset):
+        schema = FRAME_SCHEMAS[dataset]
+        columns = [c for c in schema if c in fieldnames]
+        if not text:
+            return pd.DataFrame(columns=columns, dtype=object)
+        # Naming the columns makes pandas map fields by position, like csv.DictReader
+        options = dict(names=fieldnames, header=None, usecols=columns, keep_default_na=False, index_col=False)
+        numbers = [c for c in columns if schema[c] == 'number']
+        try:
+            # Let the C parser build categoricals and floats directly
+            return pd.read_csv(io.StringIO(text), na_values={c: [''] for c in numbers}, dtype={
+                c: 'float64' if schema[c] == 'number' else 'category' if schema[c] != 'time' else str
+                for c in columns
+            }, **options)
+        except ValueError:
+            # Some number column holds text; typed_frame turns it into NaN
+            return pd.read_csv(io.StringIO(text), dtype=str, na_filter=False, **options)
+
+    def _load_csv(self, dataset, current):
+        """Return (raw rows, position, full) or None when the file has not changed"""
+        path = DATASETS[dataset]['path']
+        file_manager.flush(path)
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:
+            return self._empty(dataset, current)
+
+        with file, locked(file, exclusive=False):
+            info = os.fstat(file.fileno())
+            position = current.position if current else None
+            # An atomic rewrite replaces the inode; a shorter file was truncated
+            full = position is None or position[0] != info.st_ino or info.st_size < position[2]
+            if not full and info.st_size == position[2]:
+                return None
+
+            if full:
+                header = next(iter_records(file), None)
+                if header is None:
+                    return self._empty(dataset, current)
+                fieldnames = next(csv.reader([header[2].decode('utf-8')]))
+                start = header[0] + header[1]
+            else:
+                fieldnames, start = position[1], position[2]
+
+            file.seek(start)
+            data = file.read(info.st_size - start)
+
+        text = data.decode('utf-8')
+        kept = complete_records(text)
+        # A torn trailing record is read again once its writer finishes it
+        end = start + len(data) - len(text[len(kept):].encode('utf-8'))
+        return self._read_raw(kept, fieldnames, dataset), (info.st_ino, fieldnames, end), full
+
+    def _empty(self, dataset, current):
+        # No file (or no header yet): an empty frame, loaded in full once there is one
+        if current is not None and current.position is None:
+            return None
+        return self._read_raw('', [], dataset), None, True
+
+    def _load_sqlite(self, dataset, current):
+        """Return (raw rows, position, full) or None when the table has not changed"""
+        conn = file_manager.sqlite.connection()
+        table = quote(dataset)
+        columns = [c for c in FRAME_SCHEMAS[dataset] if c in file_manager.sqlite.columns(dataset)]
+        selected = ', '.join(['rowid'] + [quote(c) for c in columns])
+
+        position = current.position if current else None
+        full = position is None
+        if not full:
+            last_rowid, count, last_row = position
+            # update() deletes and re-inserts, which reuses rowids; check the rows we have are still there
+            seen = conn.execute(f'SELECT COUNT(*) FROM {table} WHERE rowid <= ?', (last_rowid,)).fetchone()[0]
+            row = conn.execute(f'SELECT {selected} FROM {table} WHERE rowid = ?', (last_rowid,)).fetchone()
+            full = seen != count or (count and tuple(row or ()) != last_row)
+
+        if full:
+            cursor = conn.execute(f'SELECT {selected} FROM {table} ORDER BY rowid')
+            previous = 0
+        else:
+            cursor = conn.execute(f'SELECT {selected} FROM {table} WHERE rowid > ? ORDER BY rowid', (last_rowid,))
+            previous = count
+        rows = cursor.fetchall()
+        if not rows and not full:
+            return None
+
+        raw = pd.DataFrame.from_records(rows, columns=['rowid'] + columns)
+        if rows:
+            new_position = (rows[-1][0], previous + len(rows), tuple(rows[-1]))
+        else:
+            new_position = (0, 0, ())
+        return raw.drop(columns='rowid').astype(object), new_position, full
+
+    def refresh(self):
+        """Bring every frame up to date"""
+        with self._lock:
+            for dataset in FRAME_SCHEMAS:
+                self._refresh(dataset)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._metrics = None
+
+    # -- Per-user metrics ------------------------------------------------
+
+    def user_metrics(self):
+        """One row per user with the /dashboard/data numbers (see METRICS), all users at once"""
+        with self._lock:
+            frames = {dataset: self._refresh(dataset) for dataset in FRAME_SCHEMAS}
+            versions = tuple(frames[d].version for d in FRAME_SCHEMAS)
+            if self._metrics is not None and self._metrics[0] == versions:
+                return self._metrics[1]
+            metrics = self._compute_metrics({d: f.data for d, f in frames.items()})
+            self._metrics = (versions, metrics)
+            return metrics
+
+    def _compute_metrics(self, frames):
+        def by_user(dataset):
+            frame = frames[dataset]
+            return frame.groupby('user_id', observed=True, sort=False)
+
+        def per_user(series):
+            # Users are categoricals per dataset; align on plain strings
+            series.index = series.index.astype(str)
+            return series
+
+        dyslexia = per_user(by_user('dyslexia_progress').size())
+        games = by_user('dyslexia_games')
+        game_count = per_user(games.size())
+        accuracy_sum = per_user(games['accuracy'].sum())
+        dyscalculia = by_user('dyscalculia_progress')
+        problems = per_user(dyscalculia.size())
+        correct = per_user(dyscalculia['correct'].sum())
+        dysgraphia = by_user('dysgraphia_progress')
+        writing_sessions = per_user(dysgraphia.size())
+        words = per_user(dysgraphia['word_count'].sum())
+        dyspraxia = by_user('dyspraxia_progress')
+        exercises = per_user(dyspraxia.size())
+        stability_sum = per_user(dyspraxia['stability_score'].sum())
+        duration = per_user(dyspraxia['duration'].sum())
+
+        base = pd.DataFrame({
+            'dyslexia.total_sessions': dyslexia,
+            'dyslexia.total_games': game_count,
+            'accuracy_sum': accuracy_sum,
+            'dyscalculia.total_problems': problems,
+            'dyscalculia.correct_answers': correct,
+            'dysgraphia.total_sessions': writing_sessions,
+            'dysgraphia.total_words_written': words,
+            'dyspraxia.total_exercises': exercises,
+            'stability_sum': stability_sum,
+            'dyspraxia.total_duration': duration,
+        }).fillna(0)
+
+        def ratio(numerator, denominator):
+            return (numerator / denominator.where(denominator > 0)).fillna(0)
+
+        metrics = pd.DataFrame(index=base.index)
+        metrics['dyslexia.total_sessions'] = base['dyslexia.total_sessions'].astype('int64')
+        metrics['dyslexia.total_games'] = base['dyslexia.total_games'].astype('int64')
+        metrics['dyslexia.avg_accuracy'] = round_like_python(ratio(base['accuracy_sum'], base['dyslexia.total_games']))
+        metrics['dyscalculia.total_problems'] = base['dyscalculia.total_problems'].astype('int64')
+        metrics['dyscalculia.correct_answers'] = base['dyscalculia.correct_answers'].astype('int64')
+        metrics['dyscalculia.accuracy'] = ratio(base['dyscalculia.correct_answers'],
+                                                base['dyscalculia.total_problems']) * 100
+        metrics['dysgraphia.total_sessions'] = base['dysgraphia.total_sessions'].astype('int64')
+        metrics['dysgraphia.total_words_written'] = base['dysgraphia.total_words_written']
+        metrics['dysgraphia.avg_words_per_session'] = ratio(base['dysgraphia.total_words_written'],
+                                                            base['dysgraphia.total_sessions'])
+        metrics['dyspraxia.total_exercises'] = base['dyspraxia.total_exercises'].astype('int64')
+        metrics['dyspraxia.avg_stability'] = round_like_python(ratio(base['stability_sum'], base['dyspraxia.total_exercises']))
+        metrics['dyspraxia.total_duration'] = base['dyspraxia.total_duration']
+        metrics['overall_stats.total_activities'] = (
+            metrics['dyslexia.total_sessions'] + metrics['dyscalculia.total_problems'] +
+            metrics['dysgraphia.total_sessions'] + metrics['dyspraxia.total_exercises']
+        )
+
+        active_days, streak = self._day_stats(frames)
+        metrics['overall_stats.active_days'] = active_days.reindex(metrics.index, fill_value=0).astype('int64')
+        metrics['overall_stats.streak'] = streak.reindex(metrics.index, fill_value=0).astype('int64')
+        metrics.index.name = 'user_id'
+        return metrics.sort_index()
+
+    def _day_stats(self, frames):
+        """Distinct active days per user, and the run of consecutive days ending at each user's last one"""
+        keys = pd.api.types.union_categoricals([frames[d]['user_id'] for d in ACTIVITY_DATASETS])
+        days = np.concatenate([day_numbers(frames[d]['timestamp']) for d in ACTIVITY_DATASETS])
+        known = ~np.isnan(days)
+        codes = keys.codes[known].astype('int64')
+        days = days[known].astype('int64')
+        if not len(days):
+            empty = pd.Series(dtype='int64')
+            return empty, empty
+
+        # One int per (user, day): sorting orders by user then day, and repeats end up adjacent
+        pairs = np.sort(codes << 32 | (days - days.min()))
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        users = pairs >> 32
+        numbers = pairs & 0xFFFFFFFF
+
+        # A run starts at a user's first day or after a gap of more than one day
+        starts = np.ones(len(pairs), dtype=bool)
+        starts[1:] = (users[1:] != users[:-1]) | (numbers[1:] - numbers[:-1] != 1)
+        runs = np.cumsum(starts)
+        run_lengths = np.bincount(runs)
+
+        # Each user's last pair sits just before the next user's first
+        last = np.ones(len(pairs), dtype=bool)
+        last[:-1] = users[1:] != users[:-1]
+        names = keys.categories.astype(str)[users[last]]
+        active_days = pd.Series(np.bincount(users)[users[last]], index=names)
+        streak = pd.Series(run_lengths[runs[last]], index=names)
+        return active_days, streak
+
+    def user_stats(self, user_id):
+        """One user's METRICS as a dict (zeros for a user with no rows)"""
+        metrics = self.user_metrics()
+        if user_id in metrics.index:
+            return {name: metrics.at[user_id, name].item() for name in METRICS}
+        return {name: 0 for name in METRICS}
+
+    # -- Cohorts ---------------------------------------------------------
+
+    def cohort_members(self, by='role'):
+        """Map every user id to its cohort under one of COHORT_COLUMNS"""
+        if by not in COHORT_COLUMNS:
+            raise ValueError(f'Unknown cohort column: {by}')
+        users = self.frame('users')
+        ids = users['id'].astype(str).to_numpy()
+        if by == 'signup_month':
+            values = users['created_at'].dt.strftime('%Y-%m').fillna('unknown')
+        elif by == 'age':
+            values = users['age'].map(lambda age: 'unknown' if pd.isna(age) else str(int(age)))
+        else:
+            values = users[by].astype(str).replace('', 'unknown')
+        members = pd.Series(np.asarray(values, dtype=object), index=ids)
+        return members[~members.index.duplicated()]
+
+    def _with_cohorts(self, by):
+        metrics = self.user_metrics()
+        members = self.cohort_members(by)
+        # Users with progress rows but no account row still count, as 'unknown'
+        index = metrics.index.union(members.index)
+        table = metrics.reindex(index, fill_value=0)
+        table['cohort'] = members.reindex(index).fillna('unknown')
+        return table
+
+    def cohort_stats(self, by='role'):
+        """Users, active users and mean/median/p90 of every metric per cohort"""
+        table = self._with_cohorts(by)
+        def p90(values):
+            return values.quantile(0.9)
+
+        grouped = table.groupby('cohort', sort=True)
+        sizes = grouped.size()
+        active = (table['overall_stats.total_activities'] > 0).groupby(table['cohort']).sum()
+        described = grouped[METRICS].agg(['mean', 'median', p90])
+
+        stats = {}
+        for cohort in sizes.index:
+            row = described.loc[cohort]
+            stats[cohort] = {
+                'users': int(sizes[cohort]),
+                'active_users': int(active[cohort]),
+                'metrics': {
+                    name: {
+                        'mean': round(float(row[(name, 'mean')]), 2),
+                        'median': round(float(row[(name, 'median')]), 2),
+                        'p90': round(float(row[(name, 'p90')]), 2)
+                    }
+                    for name in METRICS
+                }
+            }
+        return stats
+
+    def cohort_distributions(self, by='role', points=100):
+        """Per cohort: users, and each metric's median and points + 1 evenly spaced quantiles"""
+        table = self._with_cohorts(by)
+        levels = np.linspace(0, 1, points + 1)
+        distributions = {}
+        for cohort, group in table.groupby('cohort', sort=True):
+            quantiles = group[METRICS].quantile(levels)
+            distributions[cohort] = {
+                'users': len(group),
+                'metrics': {
+                    name: {
+                        'median': round(float(group[name].median()), 2),
+                        'quantiles': [float(value) for value in quantiles[name]]
+                    }
+                    for name in METRICS
+                }
+            }
+        return distributions
+
+    def stats(self):
+        """Report loads, rows held and memory per frame"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['frames'] = {
+                dataset: {
+                    'rows': len(frame.data),
+                    'bytes': int(frame.data.memory_usage(deep=True).sum())
+                }
+                for dataset, frame in self._frames.items()
+            }
+        return stats
+
+
+# Global instance
+analytics = AnalyticsEngine()
@@ -0,0 +1,175 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the batching queue is at its configured depth"""
+
+
+class _PendingPrompt:
+    def __init__(self, prompt, params):
+        self.prompt = prompt
+        self.params = params
+        self.enqueued_at = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class BatchScheduler:
+    """Dynamic micro-batching in front of a text2text pipeline.
+
+    Concurrent callers block in submit() while a single worker thread
+    collects prompts for up to max_wait_ms (or until max_batch_size prompts
+    are waiting) and runs them through the pipeline as one padded batch.
+    """
+
+    def __init__(self, pipeline, max_batch_size=8, max_wait_ms=10, max_queue_depth=64):
+        self.pipeline = pipeline
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue_depth)))
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = {}
+        self._recent_delays = deque(maxlen=1000)
+        self._total_delay = 0.0
+        self._max_delay = 0.0
+        self._processed = 0
+        self._rejected = 0
+        self._submit_lock = threading.Lock()
+        self._stopped = False
+        self._worker = threading.Thread(target=self._run, name='simplify-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt, timeout=None, **params):
+        """Queue a prompt and wait for its generated text"""
+        pending = _PendingPrompt(prompt, params)
+        with self._submit_lock:
+            if self._stopped:
+                raise RuntimeError('Batch scheduler has been stopped')
+            try:
+                self._queue.put_nowait(pending)
+            except queue.Full:
+                with self._stats_lock:
+                    self._rejected += 1
+                raise QueueFullError('Simplification queue is full')
+
+        if not pending.done.wait(timeout):
+            raise TimeoutError('Timed out waiting for simplification batch')
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stop(self):
+        """Finish the prompts already queued, then end the worker thread"""
+        with self._submit_lock:
+            if self._stopped:
+                return
+            self._stopped = True
+        # None marks the end of the queue; nothing can be submitted after it
+        self._queue.put(None)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first.enqueued_at + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        pending = self._queue.get(timeout=remaining)
+                    else:
+                        pending = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.monotonic()
+        with self._stats_lock:
+            for pending in batch:
+                delay = started - pending.enqueued_at
+                self._recent_delays.append(delay)
+                self._total_delay += delay
+                self._max_delay = max(self._max_delay, delay)
+
+        # Prompts can only share a forward pass when their decoding options
+        # match; max_length is a cap, so the batch uses the largest one
+        groups = {}
+        for pending in batch:
+            params = dict(pending.params)
+            params.pop('max_length', None)
+            groups.setdefault(tuple(sorted(params.items())), []).append(pending)
+
+        for group in groups.values():
+            self._generate(group)
+
+        with self._stats_lock:
+            self._processed += len(batch)
+            for group in groups.values():
+                self._batch_sizes[len(group)] = self._batch_sizes.get(len(group), 0) + 1
+
+    def _generate(self, group):
+        params = dict(group[0].params)
+        max_lengths = [p.params['max_length'] for p in group if 'max_length' in p.params]
+        if max_lengths:
+            params['max_length'] = max(max_lengths)
+
+        try:
+            outputs = self.pipeline(
+                [pending.prompt for pending in group],
+                batch_size=len(group),
+                **params
+            )
+            for pending, output in zip(group, outputs):
+                # Batched calls may return one list of sequences per prompt
+                if isinstance(output, list):
+                    output = output[0]
+                pending.result = output['generated_text']
+        except Exception as e:
+            for pending in group:
+                pending.error = e
+        finally:
+            for pending in group:
+                pending.done.set()
+
+    def stats(self):
+        """Return batch-size distribution and queueing delay metrics"""
+        with self._stats_lock:
+            delays = sorted(self._recent_delays)
+            batches = sum(self._batch_sizes.values())
+
+            def percentile(p):
+                if not delays:
+                    return 0
+                return round(delays[min(len(delays) - 1, int(len(delays) * p))] * 1000, 2)
+
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._queue.maxsize,
+                'processed': self._processed,
+                'rejected': self._rejected,
+                'batches': batches,
+                'avg_batch_size': round(self._processed / batches, 2) if batches else 0,
+                'batch_size_distribution': dict(sorted(self._batch_sizes.items())),
+                'queue_delay_ms': {
+                    'avg': round(self._total_delay / self._processed * 1000, 2) if self._processed else 0,
+                    'p50': percentile(0.50),
+                    'p95': percentile(0.95),
+                    'max': round(self._max_delay * 1000, 2)
+                }
+            }
@@ -0,0 +1,74 @@
+import bisect
+
+from utils.analytics import COHORT_COLUMNS, METRICS
+from utils.file_manager import file_manager
+
+
+def cohort_of(user, by):
+    """A user's cohort under one of COHORT_COLUMNS from their users.csv row, as AnalyticsEngine.cohort_members groups it"""
+    if by not in COHORT_COLUMNS:
+        raise ValueError(f'Unknown cohort column: {by}')
+    value = (user or {}).get('created_at' if by == 'signup_month' else by) or ''
+    if by == 'signup_month':
+        return value[:7] if len(value) >= 7 else 'unknown'
+    if by == 'age':
+        try:
+            return str(int(float(value)))
+        except ValueError:
+            return 'unknown'
+    return value or 'unknown'
+
+
+class CohortStatsStore:
+    """Cohort metric distributions saved by `flask precompute-cohort-stats`.
+
+    Building them loads every dataset into pandas frames (AnalyticsEngine),
+    which is batch work, not a request's. /dashboard/compare only reads the
+    saved file and places one user's dashboard numbers in their cohort.
+    """
+
+    def __init__(self, path='data/analytics/cohort_stats.json'):
+        self.path = path
+
+    def configure(self, config):
+        """Apply COHORT_STATS_PATH from the app config"""
+        self.path = config.get('COHORT_STATS_PATH', self.path)
+
+    def precompute(self, engine):
+        """Save every cohort grouping's distributions; returns the saved snapshot"""
+        snapshot = {
+            'computed_at': file_manager.get_timestamp(),
+            'cohorts': {by: engine.cohort_distributions(by) for by in COHORT_COLUMNS}
+        }
+        file_manager.write_json(self.path, snapshot)
+        return snapshot
+
+    def compare(self, user, data, by='role'):
+        """A user's metrics next to their cohort's median and percentile; None until the job has run.
+
+        user is their users.csv row and data their /dashboard/data numbers.
+        Percentiles are read off the saved quantiles, so they are exact to
+        about one percent.
+        """
+        snapshot = file_manager.read_json(self.path)
+        cohort = cohort_of(user, by)
+        group = snapshot.get('cohorts', {}).get(by, {}).get(cohort)
+        if group is None:
+            return None
+
+        metrics = {}
+        for name in METRICS:
+            module, field = name.split('.')
+            value = data[module][field]
+            quantiles = group['metrics'][name]['quantiles']
+            metrics[name] = {
+                'value': value,
+                'cohort_median': group['metrics'][name]['median'],
+                'percentile': round(bisect.bisect_right(quantiles, value) / len(quantiles) * 100, 1)
+            }
+        return {'cohort': cohort, 'cohort_size': group['users'], 'computed_at': snapshot['computed_at'],
+                'metrics': metrics}
+
+
+# Global instance
+cohort_stats = CohortStatsStore()
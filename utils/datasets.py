@@ -0,0 +1,63 @@
+import os
+
+# Every CSV dataset the platform persists, with the column that identifies
+# the owning user and the columns the modules write.
+DATASETS = {
+    'users': {
+        'path': 'data/users/users.csv',
+        'key': 'id',
+        'fieldnames': ['id', 'username', 'email', 'password_hash', 'role', 'age', 'conditions', 'created_at']
+    },
+    'guardian_links': {
+        'path': 'data/users/guardian_links.csv',
+        'key': 'guardian_id',
+        'fieldnames': ['guardian_id', 'learner_id', 'created_at']
+    },
+    'dyslexia_progress': {
+        'path': 'data/dyslexia/progress.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'activity', 'original_text', 'difficulty', 'word_count', 'readability_score', 'timestamp']
+    },
+    'dyslexia_games': {
+        'path': 'data/dyslexia/games.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'game_type', 'difficulty', 'score', 'total_questions', 'accuracy', 'timestamp']
+    },
+    'dyscalculia_progress': {
+        'path': 'data/dyscalculia/progress.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'problem_type', 'difficulty', 'correct', 'user_answer', 'correct_answer', 'timestamp']
+    },
+    'dysgraphia_progress': {
+        'path': 'data/dysgraphia/progress.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'activity', 'text_sample', 'word_count', 'issues_count', 'timestamp']
+    },
+    'dysgraphia_writings': {
+        'path': 'data/dysgraphia/writings.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'prompt', 'text_sample', 'word_count', 'time_spent', 'category', 'difficulty', 'timestamp']
+    },
+    'dyspraxia_progress': {
+        'path': 'data/dyspraxia/progress.csv',
+        'key': 'user_id',
+        'fieldnames': ['user_id', 'activity', 'exercise_name', 'duration', 'stability_score', 'timestamp']
+    }
+}
+
+_PATHS = {os.path.normpath(spec['path']): name for name, spec in DATASETS.items()}
+
+
+def dataset_for_path(filepath):
+    """Return the dataset name stored at filepath, or None"""
+    return _PATHS.get(os.path.normpath(filepath))
+
+
+def resolve_dataset(dataset):
+    """Accept a dataset name or its CSV path and return (name, path)"""
+    if dataset in DATASETS:
+        return dataset, DATASETS[dataset]['path']
+    name = dataset_for_path(dataset)
+    if name is None:
+        raise KeyError(f'Unknown dataset: {dataset}')
+    return name, DATASETS[name]['path']
@@ -0,0 +1,24 @@
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, single-process dev server only
+    fcntl = None
+
+
+@contextmanager
+def locked(file, exclusive=True):
+    """Hold an advisory lock on an open file for the duration of the block.
+
+    Writers take an exclusive lock and readers a shared one, so gunicorn
+    workers never interleave partial rows or read a half-written one.
+    """
+    if fcntl is None:
+        yield file
+        return
+
+    fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    try:
+        yield file
+    finally:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
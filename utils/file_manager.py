@@ -1,40 +1,465 @@
 import csv
+import io
 import json
 import os
 from datetime import datetime
+import tempfile
 import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from utils.datasets import DATASETS, dataset_for_path, resolve_dataset
+from utils.progress_store import iter_records, progress_store, row_dict
+from utils.write_behind import DURABILITY_MODES, WriteBehindAppender
+from utils.file_locks import locked
+from utils.sqlite_store import AGGREGATES, SQLiteStore
+
+STORAGE_BACKENDS = ('csv', 'sqlite')
+
+def complete_records(text):
+    """Drop a trailing record that is still being written or was torn by a crash"""
+    if not text or text.endswith('\n'):
+        return text
+    end = text.rfind('\n') + 1
+    # A newline inside an open quote does not end a record
+    quotes = text.count('"', 0, end)
+    while end > 0 and quotes % 2:
+        start = text.rfind('\n', 0, end - 1) + 1
+        quotes -= text.count('"', start, end)
+        end = start
+    return text[:end]
 
 class FileManager:
     def __init__(self):
         self.base_path = 'data'
+        self.durability = 'none'
+        self.write_behind = None
+        self.backend = 'csv'
+        self.sqlite = None
+    
+    def configure(self, config):
+        """Apply STORAGE_* and CSV_* storage settings from the app config"""
+        if self.write_behind is not None:
+            self.write_behind.close()
+            self.write_behind = None
+        if self.sqlite is not None:
+            self.sqlite.close()
+            self.sqlite = None
+        
+        self.durability = config.get('CSV_DURABILITY', 'none')
+        if self.durability not in DURABILITY_MODES:
+            raise ValueError(f'Unknown CSV_DURABILITY: {self.durability}')
+        self.backend = config.get('STORAGE_BACKEND', 'csv')
+        if self.backend not in STORAGE_BACKENDS:
+            raise ValueError(f'Unknown STORAGE_BACKEND: {self.backend}')
+        if self.backend == 'sqlite':
+            self.sqlite = SQLiteStore(
+                config.get('SQLITE_STORAGE_PATH', 'data/storage.db'),
+                synchronous='FULL' if self.durability == 'row' else 'NORMAL'
+            )
+        if config.get('CSV_WRITE_BEHIND', False):
+            self.write_behind = WriteBehindAppender(
+                self._write_rows,
+                max_rows=config.get('CSV_FLUSH_MAX_ROWS', 64),
+                interval_ms=config.get('CSV_FLUSH_INTERVAL_MS', 50),
+                durability=self.durability
+            )
+    
+    def flush(self, filepath=None):
+        """Write any buffered appends for filepath (or every file) to disk"""
+        if self.write_behind is not None:
+            self.write_behind.flush(filepath)
+    
+    def _flush_pending(self, filepath):
+        # Readers must see rows this worker has already accepted
+        if self.write_behind is not None and self.write_behind.has_pending(filepath):
+            self.write_behind.flush(filepath)
+    
+    def _sqlite_dataset(self, filepath):
+        """Dataset name when filepath is stored in SQLite, else None"""
+        if self.sqlite is None:
+            return None
+        return dataset_for_path(filepath)
     
     def read_csv(self, filepath):
         """Read CSV file and return list of dictionaries"""
+        dataset = self._sqlite_dataset(filepath)
+        if dataset:
+            return self.sqlite.read_all(dataset)
+        self._flush_pending(filepath)
         try:
             with open(filepath, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                return list(reader)
+                with locked(file, exclusive=False):
+                    text = file.read()
         except FileNotFoundError:
             return []
+        reader = csv.DictReader(io.StringIO(complete_records(text), newline=''))
+        return list(reader)
+    
+    def iter_rows(self, dataset, columns=None, where=None, predicate=None, user_id=None):
+        """Stream rows of a dataset (name or CSV path) without loading the file.
+        
+        columns projects each row to those keys, where is a {column: value}
+        equality filter checked before a row dict is built, predicate(row)
+        is any further test on the full row, and user_id reads one user's
+        rows through the per-user index. Exhaust or close() the generator to
+        release the file's shared lock.
+        """
+        name = dataset if dataset in DATASETS else dataset_for_path(dataset)
+        filepath = DATASETS[name]['path'] if name else dataset
+        where = dict(where or {})
+        
+        if self.sqlite is not None and name:
+            # The predicate sees full rows, so only project in SQL without one
+            rows = self.sqlite.iter_rows(name, None if predicate else columns, where, user_id)
+            where = {}
+        elif user_id is not None and name:
+            self._flush_pending(filepath)
+            rows = progress_store.iter_user(filepath, user_id)
+        else:
+            if user_id is not None:
+                where['user_id'] = user_id
+            self._flush_pending(filepath)
+            rows = self._stream_csv(filepath, where)
+            where = {}
+        
+        expected = {column: '' if value is None else str(value) for column, value in where.items()}
+        for row in rows:
+            if expected and any(row.get(column) != value for column, value in expected.items()):
+                continue
+            if predicate is not None and not predicate(row):
+                continue
+            yield {column: row.get(column) for column in columns} if columns else row
+    
+    def find_first(self, dataset, columns=None, where=None, predicate=None, user_id=None):
+        """Return the first row iter_rows would yield, or None; stops reading there"""
+        rows = self.iter_rows(dataset, columns, where, predicate, user_id)
+        try:
+            return next(rows, None)
+        finally:
+            rows.close()
+    
+    def find_activity(self, dataset, user_id, timestamp):
+        """Return the user's row with exactly this timestamp, or None.
+        
+        Activity ids are "<module>_<timestamp>"; the per-user index maps
+        (user_id, timestamp) to the row's location, so this is one seek.
+        """
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.find_activity(name, user_id, timestamp)
+        self._flush_pending(filepath)
+        return progress_store.find(filepath, user_id, timestamp)
+    
+    def iter_recent(self, dataset, user_id=None):
+        """Stream rows of a dataset (name or CSV path) newest-first.
+        
+        With user_id only that user's rows are visited (via the per-user
+        index); without, the file is read backwards in blocks. Either way
+        the first n rows cost time proportional to n, not to the file size.
+        """
+        name = dataset if dataset in DATASETS else dataset_for_path(dataset)
+        filepath = DATASETS[name]['path'] if name else dataset
+        if self.sqlite is not None and name:
+            return self.sqlite.iter_recent(name, user_id)
+        self._flush_pending(filepath)
+        return progress_store.iter_recent(filepath, user_id)
+    
+    def recent(self, dataset, n, user_id=None):
+        """Return the newest n rows of a dataset, newest first"""
+        rows = self.iter_recent(dataset, user_id)
+        try:
+            return list(islice(rows, max(0, n)))
+        finally:
+            rows.close()
+    
+    def _stream_csv(self, filepath, where):
+        try:
+            file = open(filepath, 'rb')
+        except FileNotFoundError:
+            return
+        
+        with file, locked(file, exclusive=False):
+            # iter_records yields whole records (quoted newlines included) and
+            # skips a torn trailing one, like read_csv
+            reader = csv.reader(data.decode('utf-8') for _, _, data in iter_records(file))
+            fieldnames = next(reader, None)
+            if fieldnames is None:
+                return
+            checks = [
+                (fieldnames.index(column), '' if value is None else str(value))
+                for column, value in where.items() if column in fieldnames
+            ]
+            if len(checks) < len(where):
+                return  # Filtering on a column the file does not have
+            for values in reader:
+                if not values:
+                    continue
+                if any(position >= len(values) or values[position] != value for position, value in checks):
+                    continue
+                yield row_dict(fieldnames, values)
     
     def write_csv(self, filepath, data, fieldnames):
         """Write data to CSV file"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', newline='', encoding='utf-8') as file:
+        dataset = self._sqlite_dataset(filepath)
+        if dataset:
+            return self.sqlite.replace_all(dataset, data, fieldnames)
+        self._flush_pending(filepath)
+        
+        def write(file, current):
             writer = csv.DictWriter(file, fieldnames=fieldnames)
             writer.writeheader()
             writer.writerows(data)
+        
+        self._replace_atomically(filepath, write, newline='')
+        progress_store.invalidate(filepath)
     
-    def append_csv(self, filepath, data, fieldnames):
-        """Append data to CSV file"""
-        file_exists = os.path.exists(filepath)
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    def update_csv(self, filepath, update, fieldnames):
+        """Rewrite a CSV as update(rows) without losing rows appended concurrently"""
+        dataset = self._sqlite_dataset(filepath)
+        if dataset:
+            return self.sqlite.update(dataset, update, fieldnames)
+        self._flush_pending(filepath)
         
-        with open(filepath, 'a', newline='', encoding='utf-8') as file:
+        def write(file, current):
+            text = current.read().decode('utf-8') if current else ''
+            rows = list(csv.DictReader(io.StringIO(complete_records(text), newline='')))
             writer = csv.DictWriter(file, fieldnames=fieldnames)
-            if not file_exists:
-                writer.writeheader()
+            writer.writeheader()
+            writer.writerows(update(rows))
+        
+        self._replace_atomically(filepath, write, newline='')
+        progress_store.invalidate(filepath)
+    
+    def _replace_atomically(self, filepath, write, **open_kwargs):
+        """Write a temp file next to filepath and rename it into place.
+        
+        The old file stays exclusively locked throughout, so appenders queue
+        up and then reopen the new file instead of writing to the old one.
+        If write returns False the old file is left as it was.
+        """
+        directory = os.path.dirname(filepath)
+        os.makedirs(directory, exist_ok=True)
+        
+        while True:
+            try:
+                current = open(filepath, 'rb')
+            except FileNotFoundError:
+                current = None
+            
+            try:
+                with (locked(current) if current else nullcontext()):
+                    if current and self._was_replaced(current, filepath):
+                        continue
+                    
+                    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filepath), suffix='.tmp')
+                    try:
+                        with os.fdopen(fd, 'w', encoding='utf-8', **open_kwargs) as file:
+                            if write(file, current) is False:
+                                os.remove(tmp_path)
+                                return
+                            file.flush()
+                            os.fsync(file.fileno())
+                        os.chmod(tmp_path, os.fstat(current.fileno()).st_mode & 0o777 if current else 0o644)
+                        os.replace(tmp_path, filepath)
+                    except BaseException:
+                        if os.path.exists(tmp_path):
+                            os.remove(tmp_path)
+                        raise
+                    return
+            finally:
+                if current:
+                    current.close()
+    
+    def _was_replaced(self, file, filepath):
+        """True when filepath no longer names the open file"""
+        try:
+            return os.fstat(file.fileno()).st_ino != os.stat(filepath).st_ino
+        except FileNotFoundError:
+            return True
+    
+    def append_csv(self, filepath, data, fieldnames, on_written=None):
+        """Append data to CSV file; on_written() runs once the row is on disk, not just buffered"""
+        dataset = self._sqlite_dataset(filepath)
+        if dataset:
+            self.sqlite.append(dataset, data, fieldnames)
+            if on_written is not None:
+                on_written()
+            return
+        
+        # Encode now so bad rows fail in the request, not in the flusher
+        dataset = dataset_for_path(filepath)
+        row = (
+            self._encode_row(data, fieldnames),
+            self._encode_row(None, fieldnames),
+            data.get(DATASETS[dataset]['key']) if dataset else None,
+            data.get('timestamp') or ''
+        )
+        
+        if self.write_behind is not None:
+            self.write_behind.append(filepath, row, on_written)
+        else:
+            self._write_rows(filepath, [row], self.durability)
+            if on_written is not None:
+                on_written()
+    
+    def _write_rows(self, filepath, rows, durability):
+        """Append encoded (record, header, user_id, timestamp) rows in one write"""
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        locations = []
+        
+        with self._open_locked_for_append(filepath) as file:
+            offset = file.seek(0, os.SEEK_END)
+            chunks = []
+            if offset == 0:
+                chunks.append(rows[0][1])
+                offset = len(rows[0][1])
+            
+            for record, _, user_id, timestamp in rows:
+                locations.append((user_id, offset, len(record), timestamp))
+                offset += len(record)
+                if durability == 'row':
+                    file.write(b''.join(chunks) + record)
+                    file.flush()
+                    os.fsync(file.fileno())
+                    chunks = []
+                else:
+                    chunks.append(record)
+            
+            if chunks:
+                file.write(b''.join(chunks))
+            if durability == 'batch':
+                file.flush()
+                os.fsync(file.fileno())
+            else:
+                file.flush()
+            
+            # Index entries are logged under the same lock, in file order
+            if dataset_for_path(filepath):
+                progress_store.record_many(filepath, locations)
+    
+    @contextmanager
+    def _open_locked_for_append(self, filepath):
+        """Open filepath for appending under an exclusive lock"""
+        while True:
+            file = open(filepath, 'ab')
+            try:
+                with locked(file):
+                    # write_csv may have renamed a new file into place while we waited
+                    if not self._was_replaced(file, filepath):
+                        yield file
+                        return
+            finally:
+                file.close()
+    
+    def _encode_row(self, data, fieldnames):
+        """Encode one CSV row (or the header when data is None) as bytes"""
+        buffer = io.StringIO(newline='')
+        writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+        if data is None:
+            writer.writeheader()
+        else:
             writer.writerow(data)
+        return buffer.getvalue().encode('utf-8')
+    
+    def read_user(self, dataset, user_id):
+        """Return one user's rows of a dataset (name or CSV path) via the per-user index"""
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.read_user(name, user_id)
+        self._flush_pending(filepath)
+        return progress_store.read_user(filepath, user_id)
+    
+    def tail_user(self, dataset, user_id, n):
+        """Return one user's last n rows of a dataset, oldest first"""
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.tail_user(name, user_id, n)
+        self._flush_pending(filepath)
+        return progress_store.tail_user(filepath, user_id, n)
+    
+    def query(self, dataset, user_id=None, columns=None, since=None, until=None,
+              where=None, newest_first=False, limit=None):
+        """Return a dataset's rows filtered by user, timestamp range and column
+        equality, ordered by timestamp. On the sqlite backend this runs in SQL."""
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.query(name, user_id, columns, since, until, where, newest_first, limit)
+        
+        rows = self.read_user(name, user_id) if user_id is not None else self.read_csv(filepath)
+        rows = [row for row in rows if self._matches(row, since, until, where)]
+        if 'timestamp' in DATASETS[name]['fieldnames']:
+            rows.sort(key=lambda row: row.get('timestamp') or '')
+        if newest_first:
+            rows.reverse()
+        if limit is not None:
+            rows = rows[:limit]
+        if columns:
+            rows = [{column: row.get(column) or '' for column in columns} for row in rows]
+        return rows
+    
+    def aggregate(self, dataset, metrics, user_id=None, since=None, until=None, where=None):
+        """Compute {name: (function, column)} metrics (count/sum/avg/min/max)
+        over a dataset's matching rows. On the sqlite backend this is one SQL query."""
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.aggregate(name, metrics, user_id, since, until, where)
+        
+        rows = self.read_user(name, user_id) if user_id is not None else self.read_csv(filepath)
+        rows = [row for row in rows if self._matches(row, since, until, where)]
+        result = {}
+        for metric, (function, column) in metrics.items():
+            if function not in AGGREGATES:
+                raise ValueError(f'Unknown aggregate: {function}')
+            if function == 'count':
+                result[metric] = len(rows)
+                continue
+            values = [self._as_number(row.get(column)) for row in rows]
+            if not values:
+                result[metric] = None
+            elif function == 'sum':
+                result[metric] = sum(values)
+            elif function == 'avg':
+                result[metric] = sum(values) / len(values)
+            else:
+                result[metric] = min(values) if function == 'min' else max(values)
+        return result
+    
+    def active_dates(self, user_id, datasets):
+        """Distinct YYYY-MM-DD dates on which a user has rows in any of datasets"""
+        names = [resolve_dataset(dataset)[0] for dataset in datasets]
+        if self.sqlite is not None:
+            return self.sqlite.active_dates(user_id, names)
+        return {
+            row['timestamp'][:10]
+            for name in names
+            for row in self.read_user(name, user_id)
+            if row.get('timestamp')
+        }
+    
+    def count_by_user(self, dataset):
+        """Return {user_id: row count} for a dataset"""
+        name, filepath = resolve_dataset(dataset)
+        if self.sqlite is not None:
+            return self.sqlite.count_by_user(name)
+        key = DATASETS[name]['key']
+        return dict(Counter(row.get(key) for row in self.read_csv(filepath)))
+    
+    def _matches(self, row, since, until, where):
+        timestamp = row.get('timestamp') or ''
+        if since is not None and timestamp < since:
+            return False
+        if until is not None and timestamp >= until:
+            return False
+        return all((row.get(column) or '') == ('' if value is None else str(value))
+                   for column, value in (where or {}).items())
+    
+    def _as_number(self, value):
+        # Matches SQLite's CAST(... AS REAL) for the values the modules write
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
     
     def read_json(self, filepath):
         """Read JSON file"""
@@ -46,9 +471,43 @@ class FileManager:
     
     def write_json(self, filepath, data):
         """Write data to JSON file"""
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
-        with open(filepath, 'w', encoding='utf-8') as file:
-            json.dump(data, file, indent=2, ensure_ascii=False)
+        self._replace_atomically(
+            filepath,
+            lambda file, current: json.dump(data, file, indent=2, ensure_ascii=False)
+        )
+    
+    def update_json(self, filepath, update):
+        """Replace a JSON file with update(data) while holding its lock.
+        
+        update receives the current data ({} if the file is missing) and
+        returns the new data, or None to leave the file untouched.
+        """
+        def write(file, current):
+            data = json.loads(current.read().decode('utf-8') or '{}') if current else {}
+            data = update(data)
+            if data is None:
+                return False
+            json.dump(data, file, ensure_ascii=False)
+        
+        self._replace_atomically(filepath, write)
+    
+    def stored_row(self, filepath, data, fieldnames):
+        """Return data as a reader sees it once append_csv(filepath, data, fieldnames) lands.
+        
+        Values become the strings csv.DictWriter writes, mapped onto the
+        dataset's actual header (or table columns) like read_csv does.
+        """
+        values = self._values(data, fieldnames)
+        dataset = self._sqlite_dataset(filepath)
+        if dataset:
+            return {**{column: '' for column in self.sqlite.columns(dataset)}, **dict(zip(fieldnames, values))}
+        header = progress_store.header(filepath) or fieldnames
+        return row_dict(header, values)
+    
+    def _values(self, data, fieldnames):
+        buffer = io.StringIO(newline='')
+        csv.DictWriter(buffer, fieldnames=fieldnames).writerow(data)
+        return next(csv.reader(io.StringIO(buffer.getvalue(), newline='')))
     
     def generate_id(self):
         """Generate unique ID"""
@@ -57,6 +516,15 @@ class FileManager:
     def get_timestamp(self):
         """Get current timestamp"""
         return datetime.now().isoformat()
+    
+    def stats(self):
+        """Report write-behind queue depth and flush counters"""
+        return {
+            'backend': self.backend,
+            'durability': self.durability,
+            'write_behind': self.write_behind.stats() if self.write_behind else None,
+            'sqlite': self.sqlite.stats() if self.sqlite else None
+        }
 
 # Global instance
 file_manager = FileManager()
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that must only be imported on first use, not while the app starts
+HEAVY_MODULES = ('numpy', 'pandas', 'nltk', 'cv2', 'PIL', 'requests', 'transformers', 'torch')
+
+STARTUP_STATEMENT = 'import app; app.create_app()'
+
+
+def measure(statement=STARTUP_STATEMENT, cwd=None):
+    """Run statement in a fresh interpreter with -X importtime.
+
+    Returns the wall time in seconds, the heavy modules it left imported,
+    and per-module import times: (name, depth, self_us, cumulative_us) in
+    the order the imports finished.
+    """
+    code = (
+        'import json, sys, time\n'
+        'started = time.perf_counter()\n'
+        f'{statement}\n'
+        'seconds = time.perf_counter() - started\n'
+        f'print(json.dumps({{"seconds": seconds, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n'
+    )
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, env.get('PYTHONPATH')]))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=cwd or ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['modules'] = parse_importtime(result.stderr)
+    return report
+
+
+def parse_importtime(output):
+    """(name, depth, self_us, cumulative_us) for each line of -X importtime output"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return modules
+
+
+def format_report(report, budget_ms, top=15):
+    """Text report: total against the budget, heavy modules loaded, and the slowest imports"""
+    total_ms = report['seconds'] * 1000
+    verdict = 'within' if total_ms <= budget_ms else 'OVER'
+    lines = [f"Startup: {total_ms:.0f} ms ({verdict} the {budget_ms} ms budget)"]
+    if report['loaded']:
+        lines.append(f"Heavy modules imported at startup: {', '.join(report['loaded'])}")
+    else:
+        lines.append("No heavy modules imported at startup")
+
+    lines.append("\nSlowest imports one level down, e.g. what app imports (cumulative ms):")
+    direct = sorted((m for m in report['modules'] if m[1] == 1), key=lambda m: m[3], reverse=True)
+    lines.extend(f"  {cumulative / 1000:>8.1f}  {name}" for name, _, _, cumulative in direct[:top])
+    lines.append("\nSlowest modules by own time (ms):")
+    own = sorted(report['modules'], key=lambda m: m[2], reverse=True)
+    lines.extend(f"  {self_us / 1000:>8.1f}  {name}" for name, _, self_us, _ in own[:top])
+    return '\n'.join(lines)
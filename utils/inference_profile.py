@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+_thread_lock = threading.Lock()
+_interop_threads_set = False
+
+
+def apply_thread_settings(config):
+    """Set torch's intra-op and inter-op thread counts from AI_TORCH_THREADS / AI_TORCH_INTEROP_THREADS.
+
+    0 keeps torch's default (one intra-op thread per core). Torch only
+    accepts the inter-op count once per process, before any parallel work,
+    so later calls leave it alone.
+    """
+    global _interop_threads_set
+    import torch
+
+    threads = int(config.get('AI_TORCH_THREADS', 0) or 0)
+    interop_threads = int(config.get('AI_TORCH_INTEROP_THREADS', 0) or 0)
+    with _thread_lock:
+        if threads > 0 and torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+        if interop_threads > 0 and not _interop_threads_set:
+            try:
+                torch.set_num_interop_threads(interop_threads)
+            except RuntimeError as e:
+                print(f"Could not set inter-op threads: {e}")
+            _interop_threads_set = True
+
+
+def prepare_for_inference(model):
+    """Eval mode, and no autograd bookkeeping for any thread that runs the model"""
+    model.eval()
+    for parameter in model.parameters():
+        parameter.requires_grad_(False)
+    return model
+
+
+def inference_context(config):
+    """torch.inference_mode() when AI_INFERENCE_MODE is on (grad mode is per thread, so enter it where the model runs)"""
+    import torch
+
+    if config.get('AI_INFERENCE_MODE', True):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def quantize_int8(model):
+    """Dynamic int8 quantization of the model's Linear layers (weights int8, activations quantized per batch)"""
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def checkpoint_meta(model_name):
+    """What a pre-quantized checkpoint was built from; a mismatch means it must be rebuilt"""
+    import torch
+    import transformers
+
+    return {'model': model_name, 'torch': torch.__version__, 'transformers': transformers.__version__}
+
+
+def save_quantized(model, path, model_name):
+    """Persist a quantized model so later loads skip from_pretrained and quantization"""
+    import torch
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.tmp'
+    torch.save(model, temp_path)
+    os.replace(temp_path, path)
+    with open(f'{path}.json', 'w') as f:
+        json.dump(checkpoint_meta(model_name), f)
+
+
+def load_quantized(path, model_name):
+    """The pre-quantized model at path, or None when it is missing or was built for another model or library version"""
+    import torch
+
+    try:
+        with open(f'{path}.json') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta != checkpoint_meta(model_name):
+        print(f"Quantized checkpoint {path} is stale ({meta}); quantizing at load time")
+        return None
+    # A pickled module, so only load checkpoints this app wrote
+    return torch.load(path, weights_only=False)
@@ -0,0 +1,33 @@
+import importlib
+
+
+class LazyModule:
+    """A module that is imported the first time one of its attributes is used.
+
+    Heavy dependencies (pandas, numpy, nltk, requests) are bound with
+    lazy_import() at module level, so importing the app stays cheap and a
+    worker only pays for a library once a request or command needs it.
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        module = self.__dict__['_module']
+        if module is None:
+            # import_module holds the import lock, so concurrent first uses import once
+            module = self.__dict__['_module'] = importlib.import_module(self.__dict__['_name'])
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self.__dict__['_module'] is not None else 'not loaded'
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name):
+    """Stand-in for `import name` that defers the import to first attribute access"""
+    return LazyModule(name)
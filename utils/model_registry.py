@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+
+from utils import inference_profile
+from utils.batching import BatchScheduler
+
+
+class ModelRegistry:
+    """Process-wide cache of transformers pipelines.
+
+    Every worker loads each configured model once; all AIHelpers instances
+    in that worker share the same pipeline object.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pipelines = {}
+        self._key_locks = {}
+        self._failures = {}
+        self._schedulers = {}
+        self._stream_slots = {}
+        self._stats = {}
+
+    def _model_key(self, config):
+        """Build the registry key for a configuration"""
+        return (
+            config.get('AI_TASK', 'text2text-generation'),
+            config.get('AI_MODEL_NAME', 'google/flan-t5-small'),
+            config.get('MODEL_CACHE_DIR', './data/ai_models'),
+            'int8' if config.get('AI_QUANTIZE_INT8') else 'fp32',
+            (config.get('AI_QUANTIZED_CHECKPOINT') or None) if config.get('AI_QUANTIZE_INT8') else None
+        )
+
+    def get_pipeline(self, config):
+        """Return the shared pipeline for config, loading it on first use"""
+        return self._pipeline(self._model_key(config), config, count_hit=True)
+
+    def _pipeline(self, key, config, count_hit):
+        with self._lock:
+            if key in self._pipelines:
+                if count_hit:
+                    self._stats[key]['hits'] += 1
+                return self._pipelines[key]
+            if key in self._failures:
+                # Don't retry a failed load on every request
+                raise RuntimeError(self._failures[key])
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other models stay available
+        with key_lock:
+            with self._lock:
+                if key in self._pipelines:
+                    if count_hit:
+                        self._stats[key]['hits'] += 1
+                    return self._pipelines[key]
+
+            try:
+                inference_profile.apply_thread_settings(config)
+                pipe, load_time = self._load_pipeline(key)
+            except Exception as e:
+                with self._lock:
+                    self._failures[key] = f"Model {key[1]} failed to load: {e}"
+                    self._stats.setdefault(key, {'hits': 0, 'loads': 0})['error'] = str(e)
+                raise
+
+            with self._lock:
+                self._pipelines[key] = pipe
+                stats = self._stats.setdefault(key, {'hits': 0, 'loads': 0})
+                stats['loads'] += 1
+                stats['load_time'] = round(load_time, 3)
+                stats['memory_bytes'] = self._estimate_memory(pipe)
+                stats['loaded_at'] = time.time()
+            return pipe
+
+    def get_scheduler(self, config):
+        """Return the shared micro-batching scheduler for config's pipeline"""
+        key = self._model_key(config)
+        # The caller already holds the pipeline, so this is not another hit
+        pipe = self._pipeline(key, config, count_hit=False)
+
+        with self._lock:
+            scheduler = self._schedulers.get(key)
+            if scheduler is not None and scheduler.pipeline is pipe:
+                return scheduler
+            replaced = scheduler
+            scheduler = self._schedulers[key] = BatchScheduler(
+                pipe,
+                max_batch_size=config.get('AI_BATCH_MAX_SIZE', 8),
+                max_wait_ms=config.get('AI_BATCH_MAX_WAIT_MS', 10),
+                max_queue_depth=config.get('AI_BATCH_QUEUE_DEPTH', 64)
+            )
+        if replaced is not None:
+            replaced.stop()
+        return scheduler
+
+    def get_stream_slots(self, config):
+        """Semaphore limiting concurrent streamed generations of config's model in this worker"""
+        key = self._model_key(config)
+        with self._lock:
+            slots = self._stream_slots.get(key)
+            if slots is None:
+                slots = self._stream_slots[key] = threading.BoundedSemaphore(config.get('AI_STREAM_MAX_CONCURRENT', 2))
+            return slots
+
+    def _load_pipeline(self, key):
+        """Create a transformers pipeline for a registry key"""
+        task, model_name, cache_dir, precision, checkpoint = key
+
+        # Disable TensorFlow to avoid conflicts
+        os.environ['USE_TF'] = 'false'
+        os.environ['USE_TORCH'] = 'true'
+
+        from transformers import pipeline
+
+        # Ensure cache directory exists
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ['TRANSFORMERS_CACHE'] = cache_dir
+
+        print(f"Initializing local AI model: {model_name} ({precision})")
+        start_time = time.time()
+        if precision == 'int8':
+            pipe = pipeline(
+                task,
+                model=self._load_int8_model(model_name, cache_dir, checkpoint),
+                tokenizer=model_name,
+                framework="pt"
+            )
+        else:
+            pipe = pipeline(
+                task,
+                model=model_name,
+                framework="pt"  # Force PyTorch
+            )
+        inference_profile.prepare_for_inference(pipe.model)
+        load_time = time.time() - start_time
+        print(f"Local AI model initialized in {load_time:.2f}s")
+        return pipe, load_time
+
+    def _load_int8_model(self, model_name, cache_dir, checkpoint):
+        """The int8 model: from the pre-quantized checkpoint when it is current, else quantized now"""
+        if checkpoint and os.path.exists(checkpoint):
+            model = inference_profile.load_quantized(checkpoint, model_name)
+            if model is not None:
+                return model
+        from transformers import AutoModelForSeq2SeqLM
+
+        model = AutoModelForSeq2SeqLM.from_pretrained(model_name, cache_dir=cache_dir)
+        return inference_profile.quantize_int8(inference_profile.prepare_for_inference(model))
+
+    def _estimate_memory(self, pipe):
+        """Estimate the weight and buffer memory held by a pipeline's model"""
+        model = getattr(pipe, 'model', None)
+        if model is None:
+            return 0
+        try:
+            # state_dict also holds the packed int8 weights of quantized layers
+            return sum(self._tensor_bytes(value) for value in model.state_dict().values())
+        except Exception:
+            return 0
+
+    def _tensor_bytes(self, value):
+        if isinstance(value, (tuple, list)):
+            return sum(self._tensor_bytes(item) for item in value)
+        if hasattr(value, 'numel') and hasattr(value, 'element_size'):
+            return value.numel() * value.element_size()
+        return 0
+
+    def warmup(self, config):
+        """Load the configured model eagerly, e.g. at app start"""
+        if not config.get('USE_LOCAL_MODELS', True):
+            return None
+        try:
+            return self.get_pipeline(config)
+        except Exception as e:
+            print(f"Model warmup failed: {e}")
+            return None
+
+    def unload(self, config=None):
+        """Drop one model (or all models) from the registry"""
+        with self._lock:
+            if config is None:
+                schedulers = list(self._schedulers.values())
+                self._pipelines.clear()
+                self._schedulers.clear()
+                self._failures.clear()
+            else:
+                schedulers = [self._schedulers.pop(self._model_key(config), None)]
+                self._pipelines.pop(self._model_key(config), None)
+                self._failures.pop(self._model_key(config), None)
+        for scheduler in schedulers:
+            if scheduler is not None:
+                scheduler.stop()
+
+    def stats(self):
+        """Return load time, memory footprint and hit counts per model"""
+        with self._lock:
+            return [
+                {
+                    'task': key[0],
+                    'model': key[1],
+                    'precision': key[3],
+                    'loaded': key in self._pipelines,
+                    **stats,
+                    'batching': self._schedulers[key].stats() if key in self._schedulers else None
+                }
+                for key, stats in self._stats.items()
+            ]
+
+
+# Global instance
+model_registry = ModelRegistry()
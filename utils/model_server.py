@@ -0,0 +1,412 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing.connection import Client, Listener, wait
+
+from utils.batching import BatchScheduler, QueueFullError
+from utils.model_registry import model_registry
+
+# Config keys a model worker process needs
+WORKER_CONFIG_KEYS = (
+    'AI_TASK', 'AI_MODEL_NAME', 'MODEL_CACHE_DIR',
+    'AI_BATCH_MAX_SIZE', 'AI_BATCH_MAX_WAIT_MS', 'AI_BATCH_QUEUE_DEPTH',
+    'AI_QUANTIZE_INT8', 'AI_QUANTIZED_CHECKPOINT', 'AI_TORCH_THREADS', 'AI_TORCH_INTEROP_THREADS', 'AI_INFERENCE_MODE'
+)
+
+
+# Keys anyone can read in the source, never accepted as the model server's authkey
+INSECURE_KEYS = {'dev-secret-key'}
+
+
+class ModelServerError(RuntimeError):
+    """Raised when the model server fails a request, cannot be reached or has no safe authkey"""
+
+
+def load_pipeline(config):
+    """Default model loader: the registry's transformers pipeline"""
+    return model_registry.get_pipeline(config)
+
+
+def serve_model(index, config, loader, conn):
+    """Model worker process: load the model once, then run the tasks sent over conn.
+
+    The server sends at most AI_BATCH_MAX_SIZE tasks at a time; they run
+    concurrently so the worker's BatchScheduler can put them through one
+    padded forward pass.
+    """
+    pipeline = loader(config)
+    scheduler = BatchScheduler(
+        pipeline,
+        max_batch_size=config.get('AI_BATCH_MAX_SIZE', 8),
+        max_wait_ms=config.get('AI_BATCH_MAX_WAIT_MS', 10),
+        max_queue_depth=config.get('AI_BATCH_QUEUE_DEPTH', 64)
+    )
+    tasks = queue.Queue()
+    send_lock = threading.Lock()
+
+    def reply(*message):
+        with send_lock:
+            conn.send(message)
+
+    def run():
+        while True:
+            key, prompt, params, deadline = tasks.get()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                reply('timeout', key, 'Request expired before a model worker was free')
+                continue
+            try:
+                reply('ok', key, scheduler.submit(prompt, timeout=remaining, **params))
+            except TimeoutError as e:
+                reply('timeout', key, str(e))
+            except Exception as e:
+                reply('error', key, f'{type(e).__name__}: {e}')
+
+    for _ in range(scheduler.max_batch_size):
+        threading.Thread(target=run, daemon=True).start()
+    reply('ready', None, None)
+    while True:
+        try:
+            tasks.put(conn.recv())
+        except EOFError:
+            # The server went away
+            return
+
+
+class ModelServer:
+    """Local model-serving process shared by every web worker on the host.
+
+    It owns AI_MODEL_WORKERS model processes, each loading the model once,
+    so model memory scales with model workers instead of web workers.
+    Web workers connect over the Unix socket at AI_MODEL_SERVER_SOCKET
+    (see ModelServerClient). Requests wait in one bounded backlog; when it
+    is full a request is refused at once ('busy') rather than piling up.
+    The server hands each model worker at most AI_BATCH_MAX_SIZE requests
+    over its own pipe, so it always knows which requests a worker holds.
+    Requests that pass their deadline are answered 'timeout'. A model
+    worker that dies is restarted and its requests fail ('crashed').
+    """
+
+    def __init__(self, config, loader=load_pipeline):
+        self.address = config.get('AI_MODEL_SERVER_SOCKET', 'data/model_server.sock')
+        self.authkey = model_server_authkey(config)
+        self.workers = max(1, config.get('AI_MODEL_WORKERS', 1))
+        self.capacity = max(1, int(config.get('AI_BATCH_MAX_SIZE', 8)))
+        self.loader = loader
+        self.worker_config = {key: config[key] for key in WORKER_CONFIG_KEYS if key in config}
+        self._context = multiprocessing.get_context('spawn')
+        self._backlog = queue.Queue(maxsize=max(1, config.get('AI_MODEL_SERVER_QUEUE_DEPTH', 64)))
+        self._lock = threading.Lock()
+        self._worker_free = threading.Condition(self._lock)
+        self._processes = [None] * self.workers
+        self._conns = [None] * self.workers
+        self._in_flight = [set() for _ in range(self.workers)]
+        self._ready = [False] * self.workers
+        self._pending = {}
+        self._connection_ids = itertools.count()
+        self._listener = None
+        self._stopping = threading.Event()
+        self._stats = {'requests': 0, 'completed': 0, 'failed': 0, 'busy': 0, 'timeouts': 0,
+                       'crashed': 0, 'restarts': 0}
+
+    def start(self):
+        """Start the model workers and listen on the socket; returns once accepting"""
+        for index in range(self.workers):
+            self._spawn(index)
+        if os.path.exists(self.address):
+            # Left behind by a server that did not shut down cleanly
+            os.remove(self.address)
+        os.makedirs(os.path.dirname(self.address) or '.', exist_ok=True)
+        # Only this user may connect: messages are pickled, so the socket and authkey are the only guard
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        for target in (self._accept, self._assign, self._collect):
+            threading.Thread(target=target, daemon=True).start()
+
+    def serve_forever(self):
+        self.start()
+        print(f"Model server listening on {self.address} with {self.workers} model worker(s)")
+        try:
+            self._stopping.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        self._stopping.set()
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        with self._worker_free:
+            self._worker_free.notify_all()
+        for process in self._processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+                process.join(5)
+        if os.path.exists(self.address):
+            os.remove(self.address)
+
+    def _spawn(self, index):
+        conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=serve_model,
+            args=(index, self.worker_config, self.loader, child_conn),
+            name=f'model-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        with self._lock:
+            self._processes[index] = process
+            self._conns[index] = conn
+            self._ready[index] = False
+
+    def _accept(self):
+        while not self._stopping.is_set():
+            try:
+                conn = self._listener.accept()
+            except Exception:
+                if self._stopping.is_set():
+                    return
+                # A client that failed authentication
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        connection_id = next(self._connection_ids)
+        send_lock = threading.Lock()
+        try:
+            while True:
+                message = conn.recv()
+                if message[0] == 'stats':
+                    with send_lock:
+                        conn.send(('stats', message[1], self.stats()))
+                    continue
+                _, request_id, prompt, params, timeout = message
+                key = (connection_id, request_id)
+                deadline = time.time() + timeout
+                with self._lock:
+                    self._stats['requests'] += 1
+                    self._pending[key] = (conn, send_lock, deadline)
+                try:
+                    self._backlog.put_nowait((key, prompt, params, deadline))
+                except queue.Full:
+                    self._reply(key, 'busy', 'Model server queue is full', stat='busy')
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                for key in [key for key in self._pending if key[0] == connection_id]:
+                    del self._pending[key]
+            conn.close()
+
+    def _reply(self, key, status, value, stat=None):
+        with self._lock:
+            target = self._pending.pop(key, None)
+            if stat:
+                self._stats[stat] += 1
+        if target is None:
+            # Already answered (e.g. timed out) or the client went away
+            return
+        conn, send_lock, _ = target
+        try:
+            with send_lock:
+                conn.send((status, key[1], value))
+        except OSError:
+            pass
+
+    def _free_worker(self):
+        """Index of the least busy ready worker with room for another request, or None"""
+        free = [index for index in range(self.workers)
+                if self._ready[index] and len(self._in_flight[index]) < self.capacity]
+        return min(free, key=lambda index: len(self._in_flight[index])) if free else None
+
+    def _assign(self):
+        """Hand backlog requests to model workers as they have room"""
+        while not self._stopping.is_set():
+            task = self._backlog.get()
+            key = task[0]
+            with self._worker_free:
+                if key not in self._pending:
+                    # Timed out or disconnected while waiting
+                    continue
+                index = self._free_worker()
+                while index is None and key in self._pending and not self._stopping.is_set():
+                    self._worker_free.wait(0.5)
+                    index = self._free_worker()
+                if index is None:
+                    continue
+                self._in_flight[index].add(key)
+                conn = self._conns[index]
+            try:
+                conn.send(task)
+            except OSError:
+                # The worker died; _collect fails its requests
+                pass
+
+    def _collect(self):
+        """Route model worker results to clients; restart dead workers; expire late requests"""
+        while not self._stopping.is_set():
+            with self._lock:
+                conns = {conn: index for index, conn in enumerate(self._conns)}
+            for conn in wait(list(conns), timeout=0.5):
+                index = conns[conn]
+                try:
+                    kind, key, value = conn.recv()
+                except (EOFError, OSError):
+                    self._restart(index)
+                    continue
+                with self._worker_free:
+                    if kind == 'ready':
+                        self._ready[index] = True
+                    else:
+                        self._in_flight[index].discard(key)
+                    self._worker_free.notify_all()
+                if kind == 'ok':
+                    self._reply(key, 'ok', value, stat='completed')
+                elif kind == 'timeout':
+                    self._reply(key, 'timeout', value, stat='timeouts')
+                elif kind == 'error':
+                    self._reply(key, 'error', value, stat='failed')
+
+            now = time.time()
+            with self._lock:
+                expired = [key for key, (_, _, deadline) in self._pending.items() if deadline < now]
+            for key in expired:
+                self._reply(key, 'timeout', 'Timed out waiting for the model', stat='timeouts')
+
+    def _restart(self, index):
+        if self._stopping.is_set():
+            return
+        process = self._processes[index]
+        process.join(5)
+        with self._lock:
+            # Nothing more is assigned to this worker until its replacement is ready
+            self._ready[index] = False
+            lost = list(self._in_flight[index])
+            self._in_flight[index].clear()
+            self._stats['restarts'] += 1
+        self._conns[index].close()
+        print(f"Model worker {index} exited with code {process.exitcode}; restarting")
+        self._spawn(index)
+        for key in lost:
+            self._reply(key, 'crashed', f'Model worker {index} crashed', stat='crashed')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+            stats['backlog'] = self._backlog.qsize()
+            stats['workers'] = [
+                {'pid': process.pid if process else None, 'alive': bool(process and process.is_alive()),
+                 'ready': self._ready[index], 'in_flight': len(self._in_flight[index])}
+                for index, process in enumerate(self._processes)
+            ]
+        return stats
+
+
+class ModelServerClient:
+    """A web worker's connection to the model server; one socket per thread"""
+
+    def __init__(self):
+        self.address = None
+        self.authkey = None
+        self.timeout = 60
+        self._local = threading.local()
+        self._request_ids = itertools.count()
+
+    def configure(self, config):
+        """Use the model server when AI_MODEL_SERVER_SOCKET is set"""
+        self.address = config.get('AI_MODEL_SERVER_SOCKET') or None
+        self.authkey = None
+        if self.address is not None:
+            try:
+                self.authkey = model_server_authkey(config)
+            except ModelServerError as e:
+                print(f"Not using the model server: {e}")
+                self.address = None
+        self.timeout = config.get('AI_BATCH_TIMEOUT', 60)
+        self._local = threading.local()
+
+    @property
+    def enabled(self):
+        return self.address is not None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not share its parent's socket
+        if conn is None or self._local.pid != os.getpid():
+            try:
+                conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            except (OSError, EOFError) as e:
+                raise ModelServerError(f'Model server unavailable at {self.address}: {e}')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _call(self, message, request_id, timeout):
+        conn = self._connection()
+        try:
+            conn.send(message)
+            deadline = time.monotonic() + timeout
+            while True:
+                if not conn.poll(max(0, deadline - time.monotonic())):
+                    # A late reply would be read by the next request; start over
+                    self._drop_connection()
+                    raise TimeoutError('Timed out waiting for the model server')
+                reply = conn.recv()
+                if reply[1] == request_id:
+                    return reply
+        except (OSError, EOFError) as e:
+            self._drop_connection()
+            raise ModelServerError(f'Lost connection to the model server: {e}')
+
+    def generate(self, prompt, timeout=None, **params):
+        """Generated text for prompt, run by a model worker"""
+        timeout = self.timeout if timeout is None else timeout
+        request_id = next(self._request_ids)
+        status, _, value = self._call(('generate', request_id, prompt, params, timeout), request_id, timeout + 1)
+        if status == 'ok':
+            return value
+        if status == 'busy':
+            raise QueueFullError(value)
+        if status == 'timeout':
+            raise TimeoutError(value)
+        raise ModelServerError(value)
+
+    def stats(self):
+        request_id = next(self._request_ids)
+        try:
+            return self._call(('stats', request_id), request_id, 5)[2]
+        except (ModelServerError, TimeoutError) as e:
+            return {'error': str(e)}
+
+
+def model_server_authkey(config):
+    """AI_MODEL_SERVER_AUTHKEY, else SECRET_KEY; refuses the public default key.
+
+    Connections exchange pickles, so anyone holding the key can run code
+    in the model server.
+    """
+    key = config.get('AI_MODEL_SERVER_AUTHKEY') or config.get('SECRET_KEY')
+    if not key or key in INSECURE_KEYS:
+        raise ModelServerError('Set AI_MODEL_SERVER_AUTHKEY (or a SECRET_KEY other than the default) '
+                               'to use the model server')
+    return key.encode('utf-8')
+
+
+# Global instance
+model_server_client = ModelServerClient()
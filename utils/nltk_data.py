@@ -0,0 +1,58 @@
+import threading
+
+from utils.lazy import lazy_import
+
+nltk = lazy_import('nltk')
+
+
+class NLTKData:
+    """NLTK tokenizers whose data is checked on first use rather than at import.
+
+    The punkt lookup (and download, unless NLTK_AUTO_DOWNLOAD is off) runs
+    once per process, when text is first tokenized. A box without network
+    access then only waits on the download if it actually tokenizes text.
+    """
+
+    def __init__(self, auto_download=True):
+        self.auto_download = auto_download
+        self._lock = threading.Lock()
+        self._checked = False
+
+    def configure(self, config):
+        """Apply NLTK_AUTO_DOWNLOAD from the app config"""
+        self.auto_download = config.get('NLTK_AUTO_DOWNLOAD', True)
+
+    def ensure(self):
+        if self._checked:
+            return
+        with self._lock:
+            if self._checked:
+                return
+            try:
+                nltk.data.find('tokenizers/punkt')
+            except LookupError:
+                if self.auto_download:
+                    nltk.download('punkt')
+                else:
+                    print("NLTK punkt data is missing and NLTK_AUTO_DOWNLOAD is off")
+            self._checked = True
+
+    def sent_tokenize(self, text):
+        self.ensure()
+        return nltk.tokenize.sent_tokenize(text)
+
+    def word_tokenize(self, text):
+        self.ensure()
+        return nltk.tokenize.word_tokenize(text)
+
+
+# Global instance
+nltk_data = NLTKData()
+
+
+def sent_tokenize(text):
+    return nltk_data.sent_tokenize(text)
+
+
+def word_tokenize(text):
+    return nltk_data.word_tokenize(text)
@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class StreamLimitError(RuntimeError):
+    """Raised when a worker already holds its configured number of event streams"""
+
+
+class ProgressEventHub:
+    """Wakes this worker's dashboard event streams when their user's progress changes.
+
+    Writers call notify(user_id) after updating the user's summary. A
+    stream waits on its user's change counter, and also wakes every
+    poll_interval seconds to catch writes made by other worker processes.
+    The hub caps how many streams a worker holds open. It also remembers
+    recent per-version stream states so a reconnect with Last-Event-ID can
+    be answered with a delta instead of a full snapshot.
+    """
+
+    def __init__(self, max_streams=50, heartbeat_seconds=15, poll_interval=2.0, max_stream_seconds=300,
+                 max_states=1024):
+        self.max_streams = max_streams
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_interval = poll_interval
+        self.max_stream_seconds = max_stream_seconds
+        self.max_states = max_states
+        self._changed = threading.Condition()
+        self._streams = {}
+        self._changes = {}
+        self._states = OrderedDict()
+        self._stats = {'opened': 0, 'rejected': 0, 'notifications': 0, 'events': 0, 'resumed': 0, 'snapshots': 0}
+
+    def configure(self, config):
+        """Apply DASHBOARD_STREAM_* settings from the app config"""
+        self.max_streams = config.get('DASHBOARD_STREAM_MAX_PER_WORKER', 50)
+        self.heartbeat_seconds = config.get('DASHBOARD_STREAM_HEARTBEAT_SECONDS', 15)
+        self.poll_interval = config.get('DASHBOARD_STREAM_POLL_SECONDS', 2.0)
+        self.max_stream_seconds = config.get('DASHBOARD_STREAM_MAX_SECONDS', 300)
+
+    def open(self, user_id):
+        """Reserve a stream slot for user_id; pair with close(user_id)"""
+        with self._changed:
+            if sum(self._streams.values()) >= self.max_streams:
+                self._stats['rejected'] += 1
+                raise StreamLimitError('Too many open progress streams')
+            self._streams[user_id] = self._streams.get(user_id, 0) + 1
+            self._changes.setdefault(user_id, 0)
+            self._stats['opened'] += 1
+
+    def close(self, user_id):
+        with self._changed:
+            remaining = self._streams.get(user_id, 0) - 1
+            if remaining > 0:
+                self._streams[user_id] = remaining
+            else:
+                self._streams.pop(user_id, None)
+                self._changes.pop(user_id, None)
+
+    def notify(self, user_id):
+        """Wake the user's streams in this worker (no-op when there are none)"""
+        with self._changed:
+            if user_id not in self._streams:
+                return
+            self._changes[user_id] += 1
+            self._stats['notifications'] += 1
+            self._changed.notify_all()
+
+    def changes(self, user_id):
+        """The user's change counter, to pass to wait()"""
+        with self._changed:
+            return self._changes.get(user_id, 0)
+
+    def wait(self, user_id, seen, timeout):
+        """Block until the user's change counter moves past seen or timeout; returns the counter"""
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while self._changes.get(user_id, 0) == seen:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._changed.wait(remaining)
+            return self._changes.get(user_id, 0)
+
+    def remember(self, user_id, version, state):
+        """Keep what a stream last sent at version, for reconnects"""
+        with self._changed:
+            self._states[(user_id, version)] = state
+            self._states.move_to_end((user_id, version))
+            while len(self._states) > self.max_states:
+                self._states.popitem(last=False)
+
+    def recall(self, user_id, version):
+        with self._changed:
+            return self._states.get((user_id, version))
+
+    def count(self, stat, n=1):
+        with self._changed:
+            self._stats[stat] += n
+
+    def stats(self):
+        with self._changed:
+            stats = dict(self._stats)
+            stats['open_streams'] = sum(self._streams.values())
+        stats['max_streams'] = self.max_streams
+        return stats
+
+
+# Global instance
+progress_events = ProgressEventHub()
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+from utils.datasets import DATASETS
+from utils.file_locks import locked
+from utils.file_manager import file_manager
+from utils.user_records import UserRecordStore
+
+BUCKET_SIZES = ('day', 'week', 'month')
+
+
+def number(value):
+    """float(value), or None for blanks and text"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flag(value):
+    return 1.0 if value == 'True' else 0.0
+
+
+# Columns rolled up per dataset, with how to read each stored value
+ROLLUP_DATASETS = {
+    'dyslexia_progress': {'word_count': number},
+    'dyslexia_games': {'score': number, 'accuracy': number},
+    'dyscalculia_progress': {'correct': flag},
+    'dysgraphia_progress': {'word_count': number, 'issues_count': number},
+    'dysgraphia_writings': {'word_count': number, 'time_spent': number},
+    'dyspraxia_progress': {'duration': number, 'stability_score': number},
+}
+
+
+def bucket_start(day, size):
+    """First day of the day/week (Monday)/month bucket holding day"""
+    if size == 'week':
+        return day - timedelta(days=day.weekday())
+    if size == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def row_day(row):
+    try:
+        return date.fromisoformat((row.get('timestamp') or '')[:10])
+    except ValueError:
+        return None
+
+
+def empty_rollup():
+    return {
+        'buckets': {size: {} for size in BUCKET_SIZES},
+        # Buckets before these days were compacted away
+        'retained_from': {size: None for size in BUCKET_SIZES}
+    }
+
+
+def add_row(rollup, dataset, row):
+    """Count a row, and its rolled-up columns, in its day, week and month buckets"""
+    day = row_day(row)
+    if day is None:
+        return
+    values = {column: parse(row.get(column)) for column, parse in ROLLUP_DATASETS[dataset].items()}
+    for size in BUCKET_SIZES:
+        start = bucket_start(day, size).isoformat()
+        retained_from = rollup['retained_from'][size]
+        if retained_from and start < retained_from:
+            continue
+        totals = rollup['buckets'][size].setdefault(start, {}).setdefault(dataset, {'count': 0, 'metrics': {}})
+        totals['count'] += 1
+        for column, value in values.items():
+            if value is None:
+                continue
+            metric = totals['metrics'].get(column)
+            if metric is None:
+                totals['metrics'][column] = [value, value, value, 1]
+            else:
+                # [sum, min, max, values counted]
+                metric[0] += value
+                metric[1] = min(metric[1], value)
+                metric[2] = max(metric[2], value)
+                metric[3] += 1
+
+
+def compact(rollup, today, retention):
+    """Drop day and week buckets older than their retention; returns how many were removed.
+
+    retention is {size: days}, None meaning keep forever. Monthly buckets
+    still cover the dropped range.
+    """
+    removed = 0
+    for size, days in retention.items():
+        if days is None:
+            continue
+        cutoff = bucket_start(today - timedelta(days=days), size).isoformat()
+        buckets = rollup['buckets'][size]
+        for start in [start for start in buckets if start < cutoff]:
+            del buckets[start]
+            removed += 1
+        retained_from = rollup['retained_from'][size]
+        rollup['retained_from'][size] = max(retained_from or cutoff, cutoff)
+    return removed
+
+
+def bucket_view(totals):
+    """A stored bucket as {dataset: {'count', column: {'sum', 'min', 'max', 'avg'}}}"""
+    view = {}
+    for dataset, data in totals.items():
+        entry = {'count': data['count']}
+        for column, (total, low, high, counted) in data['metrics'].items():
+            entry[column] = {'sum': total, 'min': low, 'max': high, 'avg': total / counted}
+        view[dataset] = entry
+    return view
+
+
+def auto_bucket(start, end):
+    days = (end - start).days + 1
+    if days <= 92:
+        return 'day'
+    if days <= 730:
+        return 'week'
+    return 'month'
+
+
+class ProgressRollupStore(UserRecordStore):
+    """Daily, weekly and monthly totals per user and dataset for trend charts.
+
+    Every progress write adds its row to three buckets: count, plus sum,
+    min, max and the number of values for each rolled-up column. A trend
+    over months reads a few hundred buckets instead of raw rows. Rows may
+    arrive in any order. A background job (and the compact-progress-rollups
+    command) drops day and week buckets past their retention; month buckets
+    are kept. Every worker runs the job's timer, but only the one that
+    claims the directory's compaction file runs each interval's pass.
+    """
+
+    kind = 'rollup'
+    datasets = ROLLUP_DATASETS
+
+    def __init__(self, directory='data/rollups'):
+        super().__init__(directory)
+        self.retention = {'day': 120, 'week': 7 * 156, 'month': None}
+        self.compact_interval = 0
+        self._compactor = None
+        self._stats = {'compactions': 0, 'buckets_removed': 0, 'last_compaction': None}
+
+    def configure(self, config):
+        """Apply ROLLUP_* settings and start the background compactor"""
+        self.retention = {
+            'day': config.get('ROLLUP_DAY_RETENTION_DAYS', 120),
+            'week': 7 * config.get('ROLLUP_WEEK_RETENTION_WEEKS', 156),
+            'month': None
+        }
+        self.compact_interval = config.get('ROLLUP_COMPACT_INTERVAL_SECONDS', 0)
+        if self.compact_interval > 0 and self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_forever, name='rollup-compactor', daemon=True)
+            self._compactor.start()
+
+    def record(self, filepath, data, fieldnames):
+        """Add a row just passed to append_csv(filepath, data, fieldnames) to its user's buckets"""
+        found = self.row_user(filepath, data, fieldnames)
+        if found is None:
+            return
+        dataset, row, user_id = found
+        self.update(user_id, lambda rollup: add_row(rollup, dataset, row))
+
+    def compute(self, user_id):
+        """Fresh rollups from the user's raw rows"""
+        rollup = empty_rollup()
+        for dataset in ROLLUP_DATASETS:
+            for row in file_manager.iter_rows(dataset, user_id=user_id):
+                add_row(rollup, dataset, row)
+        compact(rollup, date.today(), self.retention)
+        return rollup
+
+    def series(self, user_id, start, end, bucket='day', datasets=None):
+        """Buckets of one size overlapping start..end (dates), oldest first; empty buckets are omitted"""
+        rollup = self.get(user_id)
+        first = bucket_start(start, bucket).isoformat()
+        last = end.isoformat()
+        wanted = set(datasets) if datasets else None
+        buckets = []
+        for key in sorted(rollup['buckets'][bucket]):
+            if key < first or key > last:
+                continue
+            totals = rollup['buckets'][bucket][key]
+            if wanted is not None:
+                totals = {dataset: data for dataset, data in totals.items() if dataset in wanted}
+                if not totals:
+                    continue
+            buckets.append({'start': key, 'datasets': bucket_view(totals)})
+        return {'bucket': bucket, 'retained_from': rollup['retained_from'][bucket], 'buckets': buckets}
+
+    def compact_all(self, today=None):
+        """Apply retention to every stored rollup; returns (files, buckets removed)"""
+        today = today or date.today()
+        removed = []
+
+        def update(rollup):
+            if not self.usable(rollup):
+                return None
+            count = compact(rollup, today, self.retention)
+            if not count:
+                return None
+            removed.append(count)
+            return rollup
+
+        files = 0
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                files += 1
+                try:
+                    file_manager.update_json(os.path.join(self.directory, name), update)
+                except Exception as e:
+                    print(f"Error compacting rollup {name}: {e}")
+        self._stats['compactions'] += 1
+        self._stats['buckets_removed'] += sum(removed)
+        self._stats['last_compaction'] = file_manager.get_timestamp()
+        return files, sum(removed)
+
+    def _compact_forever(self):
+        while True:
+            time.sleep(self.compact_interval)
+            try:
+                if self._claim_compaction():
+                    self.compact_all()
+            except Exception as e:
+                print(f"Rollup compaction failed: {e}")
+
+    def _claim_compaction(self):
+        """True in one process per interval: the first to stamp the compaction file under its lock"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.last-compaction'), 'a+', encoding='utf-8') as file:
+            with locked(file):
+                file.seek(0)
+                try:
+                    last = float(file.read() or 0)
+                except ValueError:
+                    last = 0
+                now = time.time()
+                # Workers' timers drift apart a little, so a pass within half an interval counts
+                if now - last < self.compact_interval / 2:
+                    return False
+                file.seek(0)
+                file.truncate()
+                file.write(str(now))
+                return True
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['retention_days'] = dict(self.retention)
+        stats['compact_interval'] = self.compact_interval
+        return stats
+
+
+# Global instance
+progress_rollups = ProgressRollupStore()
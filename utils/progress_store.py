@@ -0,0 +1,351 @@
+import csv
+import io
+import os
+import threading
+from array import array
+from contextlib import contextmanager
+
+from utils.datasets import DATASETS, dataset_for_path
+from utils.file_locks import locked
+
+
+def parse_record(data):
+    """Parse one encoded CSV record into a list of values"""
+    return next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')), [])
+
+
+def row_dict(fieldnames, values):
+    """Map values onto fieldnames the way csv.DictReader does"""
+    row = dict(zip(fieldnames, values))
+    if len(values) > len(fieldnames):
+        row[None] = values[len(fieldnames):]
+    elif len(values) < len(fieldnames):
+        for field in fieldnames[len(values):]:
+            row[field] = None
+    return row
+
+
+def iter_records(file, start=0):
+    """Yield (offset, length, data) for each complete record of a binary CSV file.
+
+    A record ends at a newline outside quotes, so quoted newlines (e.g. in
+    text_sample) stay inside their record. A trailing record without its
+    newline is still being written (or was torn by a crash) and is skipped.
+    """
+    file.seek(start)
+    offset = start
+    record_start = start
+    parts = []
+    quotes = 0
+
+    for line in iter(file.readline, b''):
+        if not parts:
+            record_start = offset
+        parts.append(line)
+        quotes += line.count(b'"')
+        offset += len(line)
+
+        if quotes % 2 == 0:
+            if not line.endswith(b'\n'):
+                return
+            data = b''.join(parts)
+            parts = []
+            quotes = 0
+            yield record_start, len(data), data
+
+
+def iter_records_reverse(file, start, end, block_size=1 << 16):
+    """Yield (offset, length, data) for the records in [start, end), newest first.
+
+    start and end must be record boundaries. Blocks are read backwards from
+    end, so the last n records cost time proportional to n. A newline ends
+    the record before it when the bytes after it, up to that record's end,
+    hold an even number of quotes; a newline inside a quoted field always
+    has an odd number after it.
+    """
+    if end <= start:
+        return
+    pos = max(start, end - block_size)
+    file.seek(pos)
+    buffer = file.read(end - pos)
+    record_end = len(buffer)      # buffer[:record_end] is still unyielded
+    search = record_end - 1       # skip the record's own terminating newline
+    quotes = 0                    # quotes in buffer[search:record_end]
+
+    while True:
+        i = buffer.rfind(b'\n', 0, search)
+        if i < 0:
+            if pos <= start:
+                if record_end:
+                    yield pos, record_end, buffer[:record_end]
+                return
+            read_from = max(start, pos - block_size)
+            file.seek(read_from)
+            block = file.read(pos - read_from)
+            buffer = block + buffer[:record_end]
+            search += len(block)
+            record_end += len(block)
+            pos = read_from
+            continue
+
+        quotes += buffer.count(b'"', i + 1, search)
+        search = i
+        if quotes % 2 == 0:
+            yield pos + i + 1, record_end - i - 1, buffer[i + 1:record_end]
+            record_end = i + 1
+            quotes = 0
+
+
+class _UserIndex:
+    def __init__(self):
+        self.users = {}
+        self.activities = {}
+        self.fieldnames = None
+        self.header_end = 0
+        self.covered = 0
+        self.log_size = 0
+        self.inode = None
+
+
+class ProgressStore:
+    """Per-user byte-offset index over the append-only CSV datasets.
+
+    Each dataset gets an append-only sidecar log (data/<module>/.index/
+    <file>.idx) of (user_id, offset, length, timestamp) entries, written as
+    rows are appended. A user's rows are then read with one seek per row
+    instead of parsing the whole shared file, and an activity (a user's
+    row with a given timestamp) is found with a single seek. Rows appended
+    by anything that bypasses the index are picked up by scanning from the
+    last indexed byte.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._indexes = {}
+
+    def index_path(self, filepath):
+        directory, name = os.path.split(filepath)
+        return os.path.join(directory, '.index', name + '.idx')
+
+    def _key_column(self, filepath):
+        name = dataset_for_path(filepath)
+        return DATASETS[name]['key'] if name else 'user_id'
+
+    def record(self, filepath, user_id, offset, length, timestamp=''):
+        """Log a freshly appended row; call in file order"""
+        self.record_many(filepath, [(user_id, offset, length, timestamp)])
+
+    def record_many(self, filepath, entries):
+        """Log (user_id, offset, length, timestamp) entries for appended rows, in file order"""
+        idx_path = self.index_path(filepath)
+        os.makedirs(os.path.dirname(idx_path), exist_ok=True)
+        with open(idx_path, 'ab') as file:
+            file.write(b''.join(self._encode_entry(*entry) for entry in entries))
+
+    def _encode_entry(self, user_id, offset, length, timestamp=''):
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator='\n').writerow([user_id, offset, length, timestamp or ''])
+        return buffer.getvalue().encode('utf-8')
+
+    def invalidate(self, filepath):
+        """Forget the index of a dataset that was rewritten in place"""
+        with self._lock:
+            self._indexes.pop(os.path.abspath(filepath), None)
+            try:
+                os.remove(self.index_path(filepath))
+            except FileNotFoundError:
+                pass
+
+    def rebuild(self, filepath):
+        """Re-index a dataset from scratch; returns (rows, users, activities)"""
+        self.invalidate(filepath)
+        with self._open_index(filepath) as (_, index):
+            rows = sum(len(entries) // 2 for entries in index.users.values())
+            return rows, len(index.users), len(index.activities)
+
+    @contextmanager
+    def _open_index(self, filepath):
+        """Yield (file, index) with a shared lock held on the dataset"""
+        try:
+            file = open(filepath, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._indexes.pop(os.path.abspath(filepath), None)
+            yield None, _UserIndex()
+            return
+
+        with file, locked(file, exclusive=False):
+            yield file, self._sync(filepath, file)
+
+    def _sync(self, filepath, file):
+        """Bring the in-memory index up to date with the CSV and its log"""
+        key = os.path.abspath(filepath)
+        with self._lock:
+            stat = os.fstat(file.fileno())
+            idx_path = self.index_path(filepath)
+            try:
+                log_size = os.path.getsize(idx_path)
+            except FileNotFoundError:
+                log_size = 0
+
+            index = self._indexes.get(key)
+            if (index is None or index.inode != stat.st_ino or stat.st_size < index.covered
+                    or log_size < index.log_size):
+                index = _UserIndex()
+                index.inode = stat.st_ino
+                self._indexes[key] = index
+
+            if index.fieldnames is None:
+                for offset, length, data in iter_records(file):
+                    index.fieldnames = parse_record(data)
+                    index.header_end = index.covered = offset + length
+                    break
+                if index.fieldnames is None:
+                    return index
+
+            if log_size > index.log_size and not self._load_log(index, idx_path):
+                # A log from before activity timestamps were indexed: start over
+                os.remove(idx_path)
+                fieldnames, header_end = index.fieldnames, index.header_end
+                index = self._indexes[key] = _UserIndex()
+                index.inode = stat.st_ino
+                index.fieldnames, index.header_end, index.covered = fieldnames, header_end, header_end
+
+            if stat.st_size > index.covered:
+                self._scan_tail(index, file, filepath)
+
+            return index
+
+    def _load_log(self, index, idx_path):
+        """Apply new log entries; False if the log predates the current format"""
+        with open(idx_path, 'rb') as log:
+            log.seek(index.log_size)
+            for line in iter(log.readline, b''):
+                if not line.endswith(b'\n'):
+                    break
+                entry = parse_record(line)
+                if len(entry) == 3:
+                    return False
+                index.log_size += len(line)
+                try:
+                    user_id, offset, length, timestamp = entry
+                    offset, length = int(offset), int(length)
+                except ValueError:
+                    continue
+                # Entries below the covered mark were already indexed by a scan
+                if offset >= index.covered:
+                    self._add(index, user_id, offset, length, timestamp)
+        return True
+
+    def _scan_tail(self, index, file, filepath):
+        key_position = None
+        key_column = self._key_column(filepath)
+        if key_column in index.fieldnames:
+            key_position = index.fieldnames.index(key_column)
+        timestamp_position = index.fieldnames.index('timestamp') if 'timestamp' in index.fieldnames else None
+
+        entries = []
+        for offset, length, data in iter_records(file, index.covered):
+            index.covered = offset + length
+            values = parse_record(data)
+            if not values or key_position is None or key_position >= len(values):
+                continue
+            timestamp = ''
+            if timestamp_position is not None and timestamp_position < len(values):
+                timestamp = values[timestamp_position]
+            self._add(index, values[key_position], offset, length, timestamp)
+            entries.append(self._encode_entry(values[key_position], offset, length, timestamp))
+
+        if entries:
+            idx_path = self.index_path(filepath)
+            os.makedirs(os.path.dirname(idx_path), exist_ok=True)
+            with open(idx_path, 'ab') as log:
+                log.write(b''.join(entries))
+            # Appenders hold the exclusive lock, so while we hold the shared one
+            # the log can only have gained entries for rows already covered
+            index.log_size = os.path.getsize(idx_path)
+
+    def _add(self, index, user_id, offset, length, timestamp=''):
+        entries = index.users.get(user_id)
+        if entries is None:
+            entries = index.users[user_id] = array('q')
+        entries.append(offset)
+        entries.append(length)
+        # The first row with a timestamp owns the activity id, as a forward scan would find
+        if timestamp and (user_id, timestamp) not in index.activities:
+            index.activities[(user_id, timestamp)] = (offset, length)
+        index.covered = max(index.covered, offset + length)
+
+    def _read_entries(self, file, index, entries):
+        rows = []
+        for i in range(0, len(entries), 2):
+            file.seek(entries[i])
+            rows.append(row_dict(index.fieldnames, parse_record(file.read(entries[i + 1]))))
+        return rows
+
+    def read_user(self, filepath, user_id):
+        """Return all of a user's rows in file order"""
+        with self._open_index(filepath) as (file, index):
+            entries = index.users.get(user_id)
+            if not entries:
+                return []
+            return self._read_entries(file, index, entries)
+
+    def iter_user(self, filepath, user_id):
+        """Yield a user's rows in file order, one seek per row"""
+        with self._open_index(filepath) as (file, index):
+            entries = index.users.get(user_id)
+            if not entries:
+                return
+            # Copy: the shared array may grow while we are suspended
+            entries = entries[:]
+            for i in range(0, len(entries), 2):
+                file.seek(entries[i])
+                yield row_dict(index.fieldnames, parse_record(file.read(entries[i + 1])))
+
+    def header(self, filepath):
+        """The dataset's header fields, or None while the file is empty or missing"""
+        with self._open_index(filepath) as (_, index):
+            return index.fieldnames
+
+    def find(self, filepath, user_id, timestamp):
+        """Return the user's row with exactly this timestamp, or None"""
+        with self._open_index(filepath) as (file, index):
+            location = index.activities.get((user_id, timestamp))
+            if location is None:
+                return None
+            file.seek(location[0])
+            return row_dict(index.fieldnames, parse_record(file.read(location[1])))
+
+    def iter_recent(self, filepath, user_id=None):
+        """Yield rows newest-first: one user's via the index, or every row by
+        reading the file backwards from its last complete record"""
+        with self._open_index(filepath) as (file, index):
+            if index.fieldnames is None:
+                return
+            if user_id is None:
+                for _, _, data in iter_records_reverse(file, index.header_end, index.covered):
+                    values = parse_record(data)
+                    if values:
+                        yield row_dict(index.fieldnames, values)
+                return
+
+            entries = index.users.get(user_id)
+            if not entries:
+                return
+            entries = entries[:]
+            for i in range(len(entries) - 2, -1, -2):
+                file.seek(entries[i])
+                yield row_dict(index.fieldnames, parse_record(file.read(entries[i + 1])))
+
+    def tail_user(self, filepath, user_id, n):
+        """Return a user's last n rows in file order"""
+        with self._open_index(filepath) as (file, index):
+            entries = index.users.get(user_id)
+            if not entries or n <= 0:
+                return []
+            return self._read_entries(file, index, entries[-2 * n:])
+
+
+# Global instance
+progress_store = ProgressStore()
@@ -0,0 +1,38 @@
+import threading
+
+from utils.file_manager import file_manager
+from utils.progress_rollups import progress_rollups
+from utils.user_summaries import user_summaries
+
+# Per-user records kept up to date from progress rows; each skips the
+# datasets it does not fold
+PROGRESS_STORES = (user_summaries, progress_rollups)
+
+
+def record_progress(filepath, data, fieldnames):
+    """Append a progress row and fold it into its user's summary and rollups.
+
+    Every progress write goes through here, so each store is reserved
+    before the row is appended, updated after it, and released once the
+    row is both folded in and written (see UserRecordStore). If the append
+    fails, the reservations are abandoned and the records rebuilt on read.
+    """
+    for store in PROGRESS_STORES:
+        store.reserve(filepath, data, fieldnames)
+
+    # The write-behind flush may land before or after the folds; release after both
+    lock = threading.Lock()
+    remaining = [2]
+
+    def step_done():
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        for store in PROGRESS_STORES:
+            store.release(filepath, data, fieldnames)
+
+    file_manager.append_csv(filepath, data, fieldnames, on_written=step_done)
+    for store in PROGRESS_STORES:
+        store.record(filepath, data, fieldnames)
+    step_done()
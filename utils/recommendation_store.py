@@ -0,0 +1,118 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from utils.file_manager import file_manager
+from utils.user_records import UserRecordStore
+from utils.user_summaries import usable, user_summaries
+
+
+class RecommendationStore(UserRecordStore):
+    """Precomputed dashboard recommendations and learning patterns per user.
+
+    A record holds what evaluate(summary) returned for the user, the
+    summary version it was built from and a generated_at stamp. It is
+    current while the user's summary keeps that version; the next progress
+    write bumps the version and the next read recomputes just that user.
+    precompute() sweeps every user in chunks on a process pool, e.g. from
+    a nightly job, evaluating each chunk as one batch.
+    """
+
+    kind = 'recommendations'
+
+    def __init__(self, directory='data/recommendations'):
+        super().__init__(directory)
+        self.enabled = True
+        self.workers = os.cpu_count() or 1
+        self.chunk_size = 500
+        self._stats = {'served': 0, 'recomputed': 0, 'batch_users': 0, 'last_batch': None}
+
+    def configure(self, config):
+        """Apply RECOMMENDATIONS_* settings from the app config"""
+        self.enabled = config.get('RECOMMENDATIONS_PRECOMPUTED', True)
+        self.workers = config.get('RECOMMENDATIONS_BATCH_WORKERS', os.cpu_count() or 1)
+        self.chunk_size = config.get('RECOMMENDATIONS_BATCH_CHUNK_SIZE', 500)
+
+    def current(self, record, summary):
+        return bool(record) and usable(summary) and record.get('summary_version') == summary.get('version')
+
+    def get_for(self, user_id, summary, evaluate):
+        """The user's stored results if built from this summary, else evaluate(summary) saved for next time"""
+        if not self.enabled:
+            return self._build(summary, evaluate)
+        stored = file_manager.read_json(self.path(user_id))
+        if self.current(stored, summary):
+            self._stats['served'] += 1
+            return stored
+        self._stats['recomputed'] += 1
+        return self.refresh(user_id, summary, evaluate)
+
+    def refresh(self, user_id, summary, evaluate):
+        """Evaluate one user's summary and store the result"""
+        record = self._build(summary, evaluate)
+        # A summary from a rebuild that lost a race has no version of its own
+        if usable(summary):
+            self._save_record(user_id, record)
+        return record
+
+    def precompute(self, user_ids, evaluate_many, workers=None):
+        """Evaluate and store every user's results; returns how many were stored.
+
+        evaluate_many(summaries) returns evaluate(summary) for each summary.
+        It must be a module-level function so worker processes can receive it.
+        """
+        user_ids = list(user_ids)
+        workers = workers or self.workers
+        chunks = [user_ids[i:i + self.chunk_size] for i in range(0, len(user_ids), self.chunk_size)]
+        # Workers read the datasets from disk
+        file_manager.flush()
+        if workers > 1 and len(chunks) > 1:
+            methods = multiprocessing.get_all_start_methods()
+            # Forked workers inherit the configured storage settings
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+                stored = sum(pool.map(self._precompute_chunk, chunks, repeat(evaluate_many)))
+        else:
+            stored = sum(self._precompute_chunk(chunk, evaluate_many) for chunk in chunks)
+        self._stats['batch_users'] += stored
+        self._stats['last_batch'] = file_manager.get_timestamp()
+        return stored
+
+    def _precompute_chunk(self, user_ids, evaluate_many):
+        summaries = [(user_id, summary) for user_id, summary in user_summaries.get_many(user_ids).items()
+                     if usable(summary)]
+        results = evaluate_many([summary for _, summary in summaries])
+        for (user_id, summary), record in zip(summaries, results):
+            self._save_record(user_id, self._stamp(record, summary))
+        return len(summaries)
+
+    def _build(self, summary, evaluate):
+        return self._stamp(evaluate(summary), summary)
+
+    def _stamp(self, record, summary):
+        record['summary_version'] = summary.get('version', 0)
+        record['generated_at'] = file_manager.get_timestamp()
+        return record
+
+    def _save_record(self, user_id, record):
+        def save(current):
+            # Keep results built from a newer summary
+            if current.get('summary_version', 0) > record['summary_version']:
+                return None
+            return record
+
+        try:
+            file_manager.update_json(self.path(user_id), save)
+        except Exception as e:
+            print(f"Error saving {self.kind} for {user_id}: {e}")
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['enabled'] = self.enabled
+        stats['workers'] = self.workers
+        return stats
+
+
+# Global instance
+recommendation_store = RecommendationStore()
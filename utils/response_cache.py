@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class VersionedResponseCache:
+    """Per-user response cache keyed by a data version.
+
+    Each entry holds the version it was built from. A lookup with any other
+    version is a miss and drops the entry, so invalidation is exact: the
+    next progress write bumps the version and the old response is never
+    served again. No TTL is needed. Entries live in memory per worker, and
+    the version comes from shared storage, so workers never disagree.
+    """
+
+    def __init__(self, max_entries=1024, enabled=True):
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'not_modified': 0,
+            'invalidations': 0,
+            'evictions': 0
+        }
+
+    def configure(self, config):
+        """Apply DASHBOARD_CACHE_* settings from the app config"""
+        self.enabled = config.get('DASHBOARD_CACHE_ENABLED', True)
+        self.max_entries = config.get('DASHBOARD_CACHE_MAX_ENTRIES', 1024)
+        with self._lock:
+            if not self.enabled:
+                self._entries.clear()
+            self._evict_overflow()
+
+    @staticmethod
+    def etag(key, version):
+        """Opaque validator for one key at one data version"""
+        return hashlib.sha256(f'{key}:{version}'.encode('utf-8')).hexdigest()[:32]
+
+    def not_modified(self):
+        """Count a conditional request answered with 304"""
+        with self._lock:
+            self._stats['not_modified'] += 1
+
+    def get(self, key, version):
+        """Return the value cached for key at this version, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] != version:
+                del self._entries[key]
+                self._stats['invalidations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            self._evict_overflow()
+
+    def _evict_overflow(self):
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss/304 counters and the entry count"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0
+        stats['max_entries'] = self.max_entries
+        stats['enabled'] = self.enabled
+        return stats
+
+
+# Global instance
+dashboard_cache = VersionedResponseCache()
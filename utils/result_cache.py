@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+# Temp files are renamed into place within milliseconds; older ones were left by a crashed writer
+ORPHAN_TMP_SECONDS = 3600
+
+
+class ResultCache:
+    """Content-addressed cache for simplification results.
+
+    Entries are keyed by a hash of the normalized input text, the model name
+    and the generation parameters. A bounded in-memory LRU sits in front of
+    an on-disk tier (one small JSON file per entry) that survives restarts
+    and is shared by every worker pointed at the same directory.
+    """
+
+    def __init__(self, cache_dir='data/ai_models/simplification_cache', max_entries=1024, enabled=True):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+    def configure(self, config):
+        """Apply AI_CACHE_* settings from the app config"""
+        self.enabled = config.get('AI_CACHE_ENABLED', True)
+        self.max_entries = config.get('AI_CACHE_MAX_ENTRIES', 1024)
+        self.cache_dir = config.get(
+            'AI_CACHE_DIR',
+            os.path.join(config.get('MODEL_CACHE_DIR', 'data/ai_models'), 'simplification_cache')
+        )
+        with self._lock:
+            self._evict_overflow()
+
+    @staticmethod
+    def make_key(text, model_name, params=None):
+        """Hash normalized text, model name and generation parameters"""
+        normalized = ' '.join(text.split())
+        payload = json.dumps(
+            {'text': normalized, 'model': model_name, 'params': params or {}},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return self._memory[key]
+
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as file:
+                value = json.load(file)['value']
+        except (FileNotFoundError, ValueError, KeyError):
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        with self._lock:
+            self._stats['disk_hits'] += 1
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value, model_name=None):
+        """Store value in both tiers"""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._remember(key, value)
+            self._stats['writes'] += 1
+
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so other workers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'value': value, 'model': model_name, 'created_at': time.time()}, file, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing simplification cache entry: {e}")
+
+    def get_or_compute(self, text, model_name, params, compute):
+        """Return a cached result or compute, store and return it"""
+        key = self.make_key(text, model_name, params)
+        value = self.get(key)
+        if value is None:
+            value = compute(text)
+            self.put(key, value, model_name)
+        return value
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        self._evict_overflow()
+
+    def _evict_overflow(self):
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def evict(self, key):
+        """Remove one entry from both tiers"""
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._disk_path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self, disk=False):
+        """Empty the memory tier, and the disk tier when disk=True"""
+        with self._lock:
+            self._memory.clear()
+        if disk:
+            self.prune_disk(max_entries=0)
+
+    def prune_disk(self, max_entries=None, max_age_seconds=None):
+        """Trim the disk tier to the newest max_entries and/or drop old entries.
+
+        Only finished entry files count; a put's temp file is left alone
+        unless it is old enough to be orphaned.
+        """
+        entries = []
+        orphans = []
+        now = time.time()
+        if os.path.isdir(self.cache_dir):
+            for root, _, files in os.walk(self.cache_dir):
+                for name in files:
+                    path = os.path.join(root, name)
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except OSError:
+                        continue
+                    if name.endswith('.json'):
+                        entries.append((mtime, path))
+                    elif name.endswith('.tmp') and now - mtime > ORPHAN_TMP_SECONDS:
+                        orphans.append(path)
+
+        for path in orphans:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+        entries.sort(reverse=True)
+        removed = 0
+        for index, (mtime, path) in enumerate(entries):
+            too_many = max_entries is not None and index >= max_entries
+            too_old = max_age_seconds is not None and now - mtime > max_age_seconds
+            if too_many or too_old:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+    def stats(self):
+        """Return hit/miss counters and tier sizes"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0
+        stats['max_entries'] = self.max_entries
+        stats['enabled'] = self.enabled
+        stats['cache_dir'] = self.cache_dir
+        return stats
+
+
+# Global instance
+simplification_cache = ResultCache()
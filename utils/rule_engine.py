@@ -0,0 +1,110 @@
+import operator
+
+from utils.lazy import lazy_import
+
+np = lazy_import('numpy')
+
+OPERATORS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+}
+
+EMPTY = {}
+
+
+class RuleEvaluator:
+    """Rules compiled from a declarative table.
+
+    Each rule is a dict with 'when', a list of (metric, op, threshold)
+    conditions that must all hold, and any payload the caller reads back
+    (e.g. 'recommendation'). Metrics are 'module.field' names as in
+    /dashboard/data; a threshold may name an entry of thresholds. Rules
+    sharing a 'group' are exclusive: only the first that holds fires,
+    like an if/elif chain.
+
+    Compiling assigns every metric a column and every distinct condition
+    an index. evaluate() reads a user's metrics once, tests each condition
+    at most once and stops at the first failing condition of a rule.
+    evaluate_many() tests each condition once over a (users x metrics)
+    array, so the cost per rule is one vectorized comparison per batch.
+    """
+
+    def __init__(self, rules, thresholds=None):
+        thresholds = thresholds or {}
+        self.rules = list(rules)
+        self.metrics = []
+        self._paths = []
+        self._columns = {}
+        self._conditions = []
+        condition_ids = {}
+        self._compiled = []
+        for rule in self.rules:
+            conditions = []
+            for metric, op, threshold in rule['when']:
+                if op not in OPERATORS:
+                    raise ValueError(f'Unknown rule operator: {op}')
+                if metric not in self._columns:
+                    self._columns[metric] = len(self.metrics)
+                    self.metrics.append(metric)
+                    self._paths.append(tuple(metric.split('.', 1)))
+                value = float(thresholds[threshold] if isinstance(threshold, str) else threshold)
+                key = (self._columns[metric], op, value)
+                if key not in condition_ids:
+                    condition_ids[key] = len(self._conditions)
+                    self._conditions.append(key)
+                conditions.append(condition_ids[key])
+            self._compiled.append((tuple(conditions), rule.get('group')))
+
+    def vector(self, data):
+        """The rules' metrics from one user's dashboard data, in column order (0 when missing)"""
+        return [data.get(module, EMPTY).get(field, 0) for module, field in self._paths]
+
+    def evaluate(self, data):
+        """Indexes of the rules that fire for one user's dashboard data, in table order"""
+        values = self.vector(data)
+        results = [None] * len(self._conditions)
+        fired = []
+        done = set()
+        for index, (conditions, group) in enumerate(self._compiled):
+            if group is not None and group in done:
+                continue
+            for condition in conditions:
+                result = results[condition]
+                if result is None:
+                    column, op, threshold = self._conditions[condition]
+                    result = results[condition] = OPERATORS[op](values[column], threshold)
+                if not result:
+                    break
+            else:
+                fired.append(index)
+                if group is not None:
+                    done.add(group)
+        return fired
+
+    def evaluate_many(self, values):
+        """Boolean (users x rules) array of the rules that fire.
+
+        values is a (users x len(self.metrics)) array, e.g. from vector()
+        per user or from AnalyticsEngine.user_metrics()[evaluator.metrics].
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.metrics):
+            raise ValueError(f'Expected a (users, {len(self.metrics)}) array, got {values.shape}')
+        tested = [OPERATORS[op](values[:, column], threshold) for column, op, threshold in self._conditions]
+        fired = np.zeros((values.shape[0], len(self._compiled)), dtype=bool)
+        taken = {}
+        for index, (conditions, group) in enumerate(self._compiled):
+            mask = np.ones(values.shape[0], dtype=bool)
+            for condition in conditions:
+                mask &= tested[condition]
+            if group is not None:
+                if group in taken:
+                    mask &= ~taken[group]
+                    taken[group] |= mask
+                else:
+                    taken[group] = mask.copy()
+            fired[:, index] = mask
+        return fired
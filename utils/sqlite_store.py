@@ -0,0 +1,292 @@
+import csv
+import os
+import sqlite3
+import threading
+
+from utils.datasets import DATASETS
+
+AGGREGATES = ('count', 'sum', 'avg', 'min', 'max')
+
+
+def encode_value(value):
+    """Store values the way csv.DictWriter writes them, so reads match read_csv"""
+    return '' if value is None else str(value)
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLiteStore:
+    """SQLite backend for the CSV datasets.
+
+    One table per dataset (see utils/datasets.py), every column stored as
+    TEXT so rows come back exactly as read_csv returns them. The database
+    runs in WAL mode, so gunicorn workers read while another one writes,
+    and each table is indexed on (user key, timestamp) for per-user
+    queries. Numeric aggregates CAST in SQL.
+    """
+
+    def __init__(self, path='data/storage.db', synchronous='NORMAL'):
+        self.path = path
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._columns = {}
+
+    def connection(self):
+        """Return this thread's connection, opening it (and the schema) on first use"""
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not reuse its parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute('PRAGMA cache_size=-32000')  # 32 MB page cache
+            conn.execute('PRAGMA mmap_size=268435456')
+            conn.execute('PRAGMA busy_timeout=30000')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._ensure_schema(conn)
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _ensure_schema(self, conn):
+        with self._schema_lock:
+            for name, spec in DATASETS.items():
+                columns = ', '.join(f'{quote(field)} TEXT' for field in spec['fieldnames'])
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {quote(name)} ({columns})')
+                order = ['timestamp'] if 'timestamp' in spec['fieldnames'] else []
+                index_columns = ', '.join(quote(c) for c in [spec['key']] + order)
+                conn.execute(
+                    f'CREATE INDEX IF NOT EXISTS {quote("idx_" + name + "_user")} '
+                    f'ON {quote(name)} ({index_columns})'
+                )
+                self._columns[name] = self._table_columns(conn, name)
+
+    def columns(self, dataset):
+        """The dataset table's columns, in order"""
+        self.connection()
+        return list(self._columns[dataset])
+
+    def _table_columns(self, conn, dataset):
+        return [row[1] for row in conn.execute(f'PRAGMA table_info({quote(dataset)})')]
+
+    def _add_columns(self, conn, dataset, fieldnames):
+        # A writer may pass fields the table predates; grow it like a CSV header would
+        missing = [f for f in fieldnames if f not in self._columns[dataset]]
+        if not missing:
+            return
+        with self._schema_lock:
+            existing = self._table_columns(conn, dataset)
+            for field in missing:
+                if field not in existing:
+                    conn.execute(f'ALTER TABLE {quote(dataset)} ADD COLUMN {quote(field)} TEXT')
+            self._columns[dataset] = self._table_columns(conn, dataset)
+
+    def _values(self, row, fieldnames):
+        extra = [key for key in row if key not in fieldnames]
+        if extra:
+            # Same contract as csv.DictWriter
+            raise ValueError(f"dict contains fields not in fieldnames: {', '.join(map(repr, extra))}")
+        return [encode_value(row.get(field)) for field in fieldnames]
+
+    def _insert(self, conn, dataset, rows, fieldnames):
+        placeholders = ', '.join('?' for _ in fieldnames)
+        columns = ', '.join(quote(f) for f in fieldnames)
+        conn.executemany(
+            f'INSERT INTO {quote(dataset)} ({columns}) VALUES ({placeholders})',
+            (self._values(row, fieldnames) for row in rows)
+        )
+
+    def _rows(self, cursor):
+        names = [d[0] for d in cursor.description]
+        return [{name: ('' if value is None else value) for name, value in zip(names, row)} for row in cursor]
+
+    def append(self, dataset, row, fieldnames):
+        """Insert one row"""
+        self.append_many(dataset, [row], fieldnames)
+
+    def append_many(self, dataset, rows, fieldnames):
+        """Insert rows in one transaction"""
+        conn = self.connection()
+        self._add_columns(conn, dataset, fieldnames)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            self._insert(conn, dataset, rows, fieldnames)
+
+    def read_all(self, dataset):
+        """Return every row of a dataset in insertion order"""
+        conn = self.connection()
+        return self._rows(conn.execute(f'SELECT * FROM {quote(dataset)} ORDER BY rowid'))
+
+    def replace_all(self, dataset, rows, fieldnames):
+        """Replace a dataset's contents (the write_csv equivalent)"""
+        self.update(dataset, lambda _: rows, fieldnames)
+
+    def update(self, dataset, update, fieldnames):
+        """Replace a dataset's contents with update(rows), atomically"""
+        conn = self.connection()
+        self._add_columns(conn, dataset, fieldnames)
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = self._rows(conn.execute(f'SELECT * FROM {quote(dataset)} ORDER BY rowid'))
+            new_rows = update(rows)
+            conn.execute(f'DELETE FROM {quote(dataset)}')
+            self._insert(conn, dataset, new_rows, fieldnames)
+
+    def _where(self, dataset, user_id=None, since=None, until=None, where=None):
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append(f"{quote(DATASETS[dataset]['key'])} = ?")
+            params.append(user_id)
+        if since is not None:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        for column, value in (where or {}).items():
+            clauses.append(f'{quote(column)} = ?')
+            params.append(encode_value(value))
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def query(self, dataset, user_id=None, columns=None, since=None, until=None,
+              where=None, newest_first=False, limit=None):
+        """Select rows with the filtering, ordering and limit done in SQL"""
+        conn = self.connection()
+        selected = ', '.join(quote(c) for c in columns) if columns else '*'
+        clause, params = self._where(dataset, user_id, since, until, where)
+        order = 'timestamp' if 'timestamp' in self._columns[dataset] else 'rowid'
+        sql = f'SELECT {selected} FROM {quote(dataset)}{clause} ORDER BY {order} {"DESC" if newest_first else "ASC"}, rowid {"DESC" if newest_first else "ASC"}'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return self._rows(conn.execute(sql, params))
+
+    def iter_rows(self, dataset, columns=None, where=None, user_id=None):
+        """Yield rows lazily from a cursor, with projection and equality filters in SQL"""
+        conn = self.connection()
+        selected = ', '.join(quote(c) for c in columns) if columns else '*'
+        clause, params = self._where(dataset, user_id, where=where)
+        cursor = conn.execute(f'SELECT {selected} FROM {quote(dataset)}{clause} ORDER BY rowid', params)
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield {name: ('' if value is None else value) for name, value in zip(names, row)}
+
+    def find_activity(self, dataset, user_id, timestamp):
+        """The user's first row with this exact timestamp, via the (user, timestamp) index"""
+        conn = self.connection()
+        key = quote(DATASETS[dataset]['key'])
+        rows = self._rows(conn.execute(
+            f'SELECT * FROM {quote(dataset)} WHERE {key} = ? AND timestamp = ? ORDER BY rowid LIMIT 1',
+            (user_id, timestamp)))
+        return rows[0] if rows else None
+
+    def iter_recent(self, dataset, user_id=None):
+        """Yield rows newest-first (by insertion order)"""
+        conn = self.connection()
+        clause, params = self._where(dataset, user_id)
+        cursor = conn.execute(f'SELECT * FROM {quote(dataset)}{clause} ORDER BY rowid DESC', params)
+        names = [d[0] for d in cursor.description]
+        for row in cursor:
+            yield {name: ('' if value is None else value) for name, value in zip(names, row)}
+
+    def read_user(self, dataset, user_id):
+        """Return a user's rows in insertion order"""
+        conn = self.connection()
+        key = quote(DATASETS[dataset]['key'])
+        return self._rows(conn.execute(
+            f'SELECT * FROM {quote(dataset)} WHERE {key} = ? ORDER BY rowid', (user_id,)))
+
+    def tail_user(self, dataset, user_id, n):
+        """Return a user's last n rows, oldest first"""
+        if n <= 0:
+            return []
+        conn = self.connection()
+        key = quote(DATASETS[dataset]['key'])
+        rows = self._rows(conn.execute(
+            f'SELECT * FROM {quote(dataset)} WHERE {key} = ? ORDER BY rowid DESC LIMIT ?', (user_id, n)))
+        rows.reverse()
+        return rows
+
+    def aggregate(self, dataset, metrics, user_id=None, since=None, until=None, where=None):
+        """Compute {name: (function, column)} metrics in one SQL statement.
+
+        function is one of AGGREGATES; column may be None for count. Numeric
+        columns are CAST to REAL, so blank or non-numeric values count as 0
+        for sum/avg the way SQLite casts them.
+        """
+        expressions = []
+        for name, (function, column) in metrics.items():
+            if function not in AGGREGATES:
+                raise ValueError(f'Unknown aggregate: {function}')
+            if function == 'count':
+                expressions.append('COUNT(*)' if column is None else f'COUNT({quote(column)})')
+            else:
+                expressions.append(f'{function.upper()}(CAST({quote(column)} AS REAL))')
+        conn = self.connection()
+        clause, params = self._where(dataset, user_id, since, until, where)
+        row = conn.execute(f'SELECT {", ".join(expressions)} FROM {quote(dataset)}{clause}', params).fetchone()
+        return dict(zip(metrics, row))
+
+    def active_dates(self, user_id, datasets):
+        """Distinct YYYY-MM-DD dates on which a user has rows in any of datasets"""
+        conn = self.connection()
+        dates = set()
+        for dataset in datasets:
+            key = quote(DATASETS[dataset]['key'])
+            for (date,) in conn.execute(
+                    f"SELECT DISTINCT substr(timestamp, 1, 10) FROM {quote(dataset)} "
+                    f"WHERE {key} = ? AND timestamp != ''", (user_id,)):
+                dates.add(date)
+        return dates
+
+    def count_by_user(self, dataset):
+        """Return {user_id: row count} for a dataset"""
+        conn = self.connection()
+        key = quote(DATASETS[dataset]['key'])
+        return dict(conn.execute(f'SELECT {key}, COUNT(*) FROM {quote(dataset)} GROUP BY {key}'))
+
+    def import_csv(self, dataset, filepath, batch_size=10000):
+        """Replace a dataset's table with the rows of a CSV file; returns the row count"""
+        conn = self.connection()
+        with open(filepath, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            fieldnames = [f for f in (reader.fieldnames or []) if f]
+            self._add_columns(conn, dataset, fieldnames)
+            count = 0
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(f'DELETE FROM {quote(dataset)}')
+                batch = []
+                for row in reader:
+                    # Rows longer than the header keep their overflow under None; drop it
+                    row.pop(None, None)
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        self._insert(conn, dataset, batch, fieldnames)
+                        count += len(batch)
+                        batch = []
+                if batch:
+                    self._insert(conn, dataset, batch, fieldnames)
+                    count += len(batch)
+        conn.execute('ANALYZE')
+        return count
+
+    def stats(self):
+        conn = self.connection()
+        return {
+            'path': self.path,
+            'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0],
+            'rows': {name: conn.execute(f'SELECT COUNT(*) FROM {quote(name)}').fetchone()[0] for name in DATASETS}
+        }
@@ -0,0 +1,64 @@
+import re
+
+PARAGRAPH_BREAK = re.compile(r'(\n\s*\n)')
+
+
+def sentence_pieces(text):
+    """Split text after each sentence end, keeping the whitespace, so the pieces join back to text"""
+    return [piece for piece in re.split(r'(?<=[.!?])(?=\s)', text) if piece]
+
+
+def estimate_tokens(text):
+    """Rough subword count for when no tokenizer is at hand (about 4 tokens per 3 words)"""
+    return (len(text.split()) * 4 + 2) // 3
+
+
+def split_chunks(text, max_tokens, count_tokens=estimate_tokens):
+    """Split text into chunks of at most max_tokens, on sentence boundaries.
+
+    Returns a list of {'text', 'separator'} dicts; joining each chunk's
+    text and separator gives back text with its whitespace normalized.
+    Chunks never span paragraphs, and a paragraph is packed from its
+    start, so editing one paragraph leaves every other paragraph's chunks
+    (and their cached results) unchanged. A sentence longer than
+    max_tokens is split between words.
+    """
+    parts = PARAGRAPH_BREAK.split(text.strip())
+    chunks = []
+    for paragraph, separator in zip(parts[::2], parts[1::2] + ['']):
+        paragraph_chunks = []
+        current, current_tokens = [], 0
+        for sentence in sentence_pieces(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            tokens = count_tokens(sentence)
+            if current and current_tokens + tokens > max_tokens:
+                paragraph_chunks.append(' '.join(current))
+                current, current_tokens = [], 0
+            if tokens > max_tokens:
+                paragraph_chunks.extend(_split_words(sentence, max_tokens, count_tokens))
+                continue
+            current.append(sentence)
+            current_tokens += tokens
+        if current:
+            paragraph_chunks.append(' '.join(current))
+        if not paragraph_chunks:
+            continue
+        chunks.extend({'text': chunk, 'separator': ' '} for chunk in paragraph_chunks)
+        chunks[-1]['separator'] = '\n\n' if separator else ''
+    if chunks:
+        chunks[-1]['separator'] = ''
+    return chunks
+
+
+def _split_words(sentence, max_tokens, count_tokens):
+    pieces, current = [], []
+    for word in sentence.split():
+        if current and count_tokens(' '.join(current + [word])) > max_tokens:
+            pieces.append(' '.join(current))
+            current = []
+        current.append(word)
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
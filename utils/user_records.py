@@ -0,0 +1,172 @@
+import hashlib
+import os
+import re
+import time
+
+from utils.datasets import DATASETS, dataset_for_path
+from utils.file_manager import file_manager
+
+# How long a reserved write may take to fold its row before it is presumed
+# lost (its process died after reserving) and the record is rebuilt
+PENDING_SECONDS = 60
+
+
+class UserRecordStore:
+    """Per-user JSON records derived from raw progress rows.
+
+    Writes fold each new row into the user's record, so reads open one
+    small file instead of the user's history. A write reserves the record
+    before it appends the raw row (bumping its version and noting the
+    write as pending), folds the row in afterwards, and releases the
+    reservation once the row is on disk (appends may sit in a write-behind
+    buffer other workers cannot read). A record that is
+    missing, unusable or marked stale is rebuilt from raw rows on read, and
+    the rebuild is only saved if no write was reserved since the record was
+    read and none is still pending, so a rebuild that already scanned a
+    row never has it folded in again. Subclasses set datasets (the ones
+    they fold), define compute(user_id) and may tighten usable(record).
+    """
+
+    kind = 'record'
+    datasets = {}
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, user_id):
+        name = str(user_id)
+        if not re.fullmatch(r'[A-Za-z0-9_.-]{1,64}', name) or name.startswith('.'):
+            name = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def usable(self, record):
+        return bool(record) and not record.get('stale', True)
+
+    def compute(self, user_id):
+        """A fresh record from the user's raw rows"""
+        raise NotImplementedError
+
+    def row_user(self, filepath, data, fieldnames):
+        """(dataset, stored row, user_id) for a row passed to append_csv, or None if this store skips it"""
+        dataset = dataset_for_path(filepath)
+        if dataset not in self.datasets:
+            return None
+        row = file_manager.stored_row(filepath, data, fieldnames)
+        return dataset, row, row.get(DATASETS[dataset]['key'])
+
+    def reserve(self, filepath, data, fieldnames):
+        """Call before append_csv(filepath, data, fieldnames); record() then folds the row in and release() ends the write"""
+        found = self.row_user(filepath, data, fieldnames)
+        if found is None:
+            return
+
+        def reserve(record):
+            record = self._expire(found[2], record)
+            record['version'] = record.get('version', 0) + 1
+            record.setdefault('pending', []).append(time.time())
+            return record
+
+        try:
+            file_manager.update_json(self.path(found[2]), reserve)
+        except Exception as e:
+            print(f"Error reserving {self.kind} for {found[2]}: {e}")
+
+    def release(self, filepath, data, fieldnames):
+        """End a reserved write once its row is folded in and on disk"""
+        found = self.row_user(filepath, data, fieldnames)
+        if found is None:
+            return
+
+        def release(record):
+            record = self._expire(found[2], record)
+            # A rebuild that read the record before the row reached disk is discarded
+            record['version'] = record.get('version', 0) + 1
+            record['pending'] = record.get('pending', [])[1:]
+            return record
+
+        try:
+            file_manager.update_json(self.path(found[2]), release)
+        except Exception as e:
+            print(f"Error releasing {self.kind} for {found[2]}: {e}")
+
+    def update(self, user_id, fold):
+        """Apply fold(record) to the user's stored record under its lock.
+
+        fold mutates the record in place. If there is no usable record, or fold raises
+        ValueError/TypeError, the record becomes a stale marker and the next
+        read rebuilds it.
+        """
+        def update(record):
+            record = self._expire(user_id, record)
+            pending = record.get('pending', [])
+            version = record.get('version', 0) + 1
+            if not self.usable(record):
+                # Nothing to fold into: just note the write so an in-flight rebuild is discarded
+                return {'version': version, 'stale': True, 'pending': pending}
+            try:
+                fold(record)
+            except (ValueError, TypeError) as e:
+                print(f"{self.kind.capitalize()} for {user_id} marked stale: {e}")
+                return {'version': version, 'stale': True, 'pending': pending}
+            record['version'] = version
+            record['pending'] = pending
+            record['updated_at'] = file_manager.get_timestamp()
+            return record
+
+        try:
+            file_manager.update_json(self.path(user_id), update)
+        except Exception as e:
+            # The raw row is already saved; a stale record is rebuilt on read
+            print(f"Error updating {self.kind} for {user_id}: {e}")
+
+    def get(self, user_id):
+        """Return the user's record, rebuilding it from raw rows if needed"""
+        stored = file_manager.read_json(self.path(user_id))
+        if self.usable(stored) and not self.abandoned(stored):
+            return stored
+        record, _ = self._recompute(user_id, stored)
+        return record
+
+    def abandoned(self, record):
+        """True if a reserved write never folded its row in, so the record may be missing it"""
+        return any(started < time.time() - PENDING_SECONDS for started in record.get('pending', []))
+
+    def _expire(self, user_id, record):
+        """The record to fold into, or a stale marker if a reserved write was abandoned"""
+        if not self.abandoned(record):
+            return record
+        print(f"{self.kind.capitalize()} for {user_id} marked stale: a write never completed")
+        cutoff = time.time() - PENDING_SECONDS
+        return {'version': record.get('version', 0), 'stale': True,
+                'pending': [started for started in record['pending'] if started >= cutoff]}
+
+    def _recompute(self, user_id, stored):
+        """Build a record from raw rows and save it unless a write raced it.
+
+        Returns (record, saved).
+        """
+        record = self.compute(user_id)
+        return record, self._save(user_id, stored, record)
+
+    def _save(self, user_id, stored, record):
+        """Version and save a rebuilt record unless a write was reserved since stored was read or is still pending"""
+        version = stored.get('version', 0)
+        record['version'] = version + 1
+        record['updated_at'] = file_manager.get_timestamp()
+        record['stale'] = False
+        saved = []
+
+        def save(current):
+            # A write reserved during the rebuild may or may not be in it, and a
+            # pending one would be folded in again; leave the record to the writes
+            cutoff = time.time() - PENDING_SECONDS
+            if current.get('version', 0) != version or any(started >= cutoff for started in current.get('pending', [])):
+                return None
+            saved.append(True)
+            return record
+
+        file_manager.update_json(self.path(user_id), save)
+        if not saved:
+            # Its version may belong to another write; keep it out of versioned caches
+            record['stale'] = True
+        return bool(saved)
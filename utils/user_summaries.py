@@ -0,0 +1,265 @@
+import math
+from datetime import datetime
+
+from utils.activity_calendar import ActivityCalendar
+from utils.datasets import DATASETS
+from utils.file_manager import file_manager
+from utils.progress_events import progress_events
+from utils.user_records import UserRecordStore
+
+RECENT_LIMIT = 5
+
+# What each progress dataset contributes to a user's summary: running sums
+# of numeric columns, counts of rows where a column equals a value, whether
+# the last few rows are kept, and whether rows count towards overall stats.
+SUMMARY_DATASETS = {
+    'dyslexia_progress': {'sums': {}, 'matches': {}, 'recent': True, 'overall': True},
+    'dyslexia_games': {'sums': {'accuracy': float}, 'matches': {}, 'recent': False, 'overall': False},
+    'dyscalculia_progress': {'sums': {}, 'matches': {'correct': 'True'}, 'recent': True, 'overall': True},
+    'dysgraphia_progress': {'sums': {'word_count': int}, 'matches': {}, 'recent': True, 'overall': True},
+    'dyspraxia_progress': {'sums': {'stability_score': float, 'duration': float}, 'matches': {}, 'recent': True, 'overall': True},
+}
+
+
+def streak_from_dates(dates):
+    """Count consecutive days ending at the most recent active date"""
+    # Sort dates and find consecutive days
+    unique_dates = sorted(set(dates), reverse=True)
+
+    if not unique_dates:
+        return 0
+
+    streak = 1
+    current_date = datetime.strptime(unique_dates[0], '%Y-%m-%d').date()
+
+    for i in range(1, len(unique_dates)):
+        prev_date = datetime.strptime(unique_dates[i], '%Y-%m-%d').date()
+        if (current_date - prev_date).days == 1:
+            streak += 1
+            current_date = prev_date
+        else:
+            break
+
+    return streak
+
+
+def empty_summary():
+    return {
+        'datasets': {
+            name: {
+                'count': 0,
+                'sums': {column: 0 for column in spec['sums']},
+                'matches': {column: 0 for column in spec['matches']},
+                'recent': []
+            }
+            for name, spec in SUMMARY_DATASETS.items()
+        },
+        'total_activities': 0,
+        'active_days': 0,
+        'streak': 0,
+        'last_day': None,
+        'calendar': ActivityCalendar().to_dict()
+    }
+
+
+def usable(summary):
+    """False for missing, stale or older-format summaries, which get rebuilt"""
+    return bool(summary) and not summary.get('stale', True) and 'calendar' in summary
+
+
+def add_row(summary, dataset, row):
+    """Fold one row into a dataset's running counts and sums (not the day stats)"""
+    spec = SUMMARY_DATASETS[dataset]
+    totals = summary['datasets'][dataset]
+    # Parse before changing anything, so a bad value leaves the summary intact
+    sums = {column: parse(row.get(column, 0)) for column, parse in spec['sums'].items()}
+    totals['count'] += 1
+    for column, value in sums.items():
+        totals['sums'][column] += value
+    for column, value in spec['matches'].items():
+        if row.get(column) == value:
+            totals['matches'][column] += 1
+    if spec['recent']:
+        totals['recent'].append(row)
+        del totals['recent'][:-RECENT_LIMIT]
+    if spec['overall']:
+        summary['total_activities'] += 1
+
+
+def activity_day(row):
+    if 'timestamp' not in row:
+        return None
+    return row['timestamp'].split('T')[0]
+
+
+def add_days(summary, days):
+    """Mark days active on the summary's calendar and refresh the day stats"""
+    calendar = ActivityCalendar.from_dict(summary['calendar'])
+    for day in days:
+        calendar.add(day)
+    set_calendar(summary, calendar)
+
+
+def set_calendar(summary, calendar):
+    last_day = calendar.last_day()
+    summary['calendar'] = calendar.to_dict()
+    summary['active_days'] = calendar.active_days()
+    summary['streak'] = calendar.streak()
+    summary['last_day'] = last_day.isoformat() if last_day else None
+
+
+def summary_from_rows(rows_by_dataset, origin=None):
+    """Build a summary from every row of a user, {dataset: iterable of rows}.
+
+    origin (e.g. the signup day) is where the activity calendar starts.
+    """
+    summary = empty_summary()
+    calendar = ActivityCalendar(origin)
+    for dataset, rows in rows_by_dataset.items():
+        for row in rows:
+            fold_row(summary, calendar, dataset, row)
+    set_calendar(summary, calendar)
+    return summary
+
+
+def fold_row(summary, calendar, dataset, row):
+    """Add one row to a summary being built, and its day to the calendar"""
+    add_row(summary, dataset, row)
+    if SUMMARY_DATASETS[dataset]['overall']:
+        day = activity_day(row)
+        if day is not None:
+            calendar.add(day)
+
+
+def summary_drift(stored, expected):
+    """List the fields where a stored summary differs from a fresh one"""
+    drift = []
+    for key in ('total_activities', 'active_days', 'streak', 'last_day'):
+        if stored.get(key) != expected[key]:
+            drift.append(key)
+    for dataset, totals in expected['datasets'].items():
+        stored_totals = stored.get('datasets', {}).get(dataset, {})
+        if stored_totals.get('count') != totals['count']:
+            drift.append(f'{dataset}.count')
+        for kind in ('sums', 'matches'):
+            for column, value in totals[kind].items():
+                stored_value = stored_totals.get(kind, {}).get(column)
+                # Float sums may differ in the last bits if workers interleaved
+                if stored_value is None or not math.isclose(stored_value, value, rel_tol=1e-9, abs_tol=1e-9):
+                    drift.append(f'{dataset}.{kind}.{column}')
+        if stored_totals.get('recent', []) != totals['recent']:
+            drift.append(f'{dataset}.recent')
+    if ActivityCalendar.from_dict(stored.get('calendar')) != ActivityCalendar.from_dict(expected['calendar']):
+        drift.append('calendar')
+    return drift
+
+
+class UserSummaryStore(UserRecordStore):
+    """Per-user running totals behind /dashboard/data.
+
+    Each progress write folds its row into the user's summary (counts, sums,
+    last few rows, active days and streak), so the dashboard reads one small
+    JSON file instead of the user's history. The summary's version doubles
+    as the user's data version for response caching.
+    """
+
+    kind = 'summary'
+    datasets = SUMMARY_DATASETS
+
+    def __init__(self, directory='data/summaries'):
+        super().__init__(directory)
+
+    def usable(self, summary):
+        return usable(summary)
+
+    def record(self, filepath, data, fieldnames):
+        """Fold a row just passed to append_csv(filepath, data, fieldnames) into its user's summary"""
+        found = self.row_user(filepath, data, fieldnames)
+        if found is None:
+            return
+        dataset, row, user_id = found
+
+        def fold(summary):
+            add_row(summary, dataset, row)
+            if SUMMARY_DATASETS[dataset]['overall']:
+                day = activity_day(row)
+                if day is not None:
+                    add_days(summary, [day])
+
+        self.update(user_id, fold)
+        progress_events.notify(user_id)
+
+    def compute(self, user_id):
+        """A fresh summary from the user's raw rows"""
+        user = file_manager.find_first('users', user_id=user_id)
+        signup = (user or {}).get('created_at') or ''
+        return summary_from_rows({
+            dataset: file_manager.iter_rows(dataset, user_id=user_id)
+            for dataset in SUMMARY_DATASETS
+        }, origin=signup[:10] or None)
+
+    def compute_many(self, user_ids):
+        """Fresh summaries for several users from one streaming pass over each dataset"""
+        wanted = set(user_ids)
+        signups = {
+            user['id']: (user['created_at'] or '')[:10] or None
+            for user in file_manager.iter_rows('users', columns=['id', 'created_at'],
+                                               predicate=lambda row: row.get('id') in wanted)
+        }
+        summaries = {user_id: empty_summary() for user_id in wanted}
+        calendars = {user_id: ActivityCalendar(signups.get(user_id)) for user_id in wanted}
+        for dataset in SUMMARY_DATASETS:
+            key = DATASETS[dataset]['key']
+            for row in file_manager.iter_rows(dataset, predicate=lambda row: row.get(key) in wanted):
+                fold_row(summaries[row[key]], calendars[row[key]], dataset, row)
+        for user_id, summary in summaries.items():
+            set_calendar(summary, calendars[user_id])
+        return summaries
+
+    def get_many(self, user_ids, executor=None):
+        """Return {user_id: summary}; the ones needing a rebuild share one pass over the data.
+
+        executor (a concurrent.futures pool) reads the stored summaries in parallel.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        read = executor.map if executor is not None else map
+        stored = dict(zip(user_ids, read(lambda user_id: file_manager.read_json(self.path(user_id)), user_ids)))
+        summaries = {user_id: summary for user_id, summary in stored.items()
+                     if usable(summary) and not self.abandoned(summary)}
+        missing = [user_id for user_id in user_ids if user_id not in summaries]
+        if len(missing) == 1:
+            summaries[missing[0]] = self.get(missing[0])
+        elif missing:
+            for user_id, summary in self.compute_many(missing).items():
+                self._save(user_id, stored[user_id], summary)
+                summaries[user_id] = summary
+        return {user_id: summaries[user_id] for user_id in user_ids}
+
+    def rebuild(self, user_id, attempts=3):
+        """Recompute a user's summary; returns the fields that had drifted"""
+        stored = file_manager.read_json(self.path(user_id))
+        for _ in range(attempts):
+            summary, saved = self._recompute(user_id, stored)
+            if saved:
+                break
+            stored = file_manager.read_json(self.path(user_id))
+        if not usable(stored):
+            return ['missing']
+        return summary_drift(stored, summary)
+
+    def calendar(self, user_id):
+        """The user's activity calendar"""
+        return ActivityCalendar.from_dict(self.get(user_id)['calendar'])
+
+    def user_ids(self):
+        """Every user with an account or any progress row"""
+        users = set(file_manager.count_by_user('users'))
+        for dataset in SUMMARY_DATASETS:
+            users.update(file_manager.count_by_user(dataset))
+        users.discard(None)
+        users.discard('')
+        return sorted(users)
+
+
+# Global instance
+user_summaries = UserSummaryStore()
@@ -0,0 +1,134 @@
+import atexit
+import os
+import threading
+import time
+
+DURABILITY_MODES = ('none', 'batch', 'row')
+
+
+class WriteBehindAppender:
+    """Buffers CSV appends per file and writes them in groups.
+
+    Request threads only enqueue already-encoded rows. A background thread
+    flushes a file's buffer once it holds max_rows rows or interval_ms has
+    passed, handing the whole group to write_rows(filepath, rows, durability)
+    in one call, then runs the group's on_written callbacks.
+    Readers call flush(filepath) first so a worker always sees its own writes.
+    """
+
+    def __init__(self, write_rows, max_rows=64, interval_ms=50, durability='batch'):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f'Unknown durability mode: {durability}')
+        self._write_rows = write_rows
+        self.max_rows = max(1, int(max_rows))
+        self.interval = max(1, int(interval_ms)) / 1000.0
+        self.durability = durability
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._callbacks = {}
+        self._worker = None
+        self._pid = None
+        self._closed = False
+        self._stats = {
+            'enqueued': 0,
+            'flushed_rows': 0,
+            'batches': 0,
+            'max_queue_depth': 0,
+            'errors': 0,
+            'last_flush_ms': 0
+        }
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        # Started lazily so a pre-forking server gets one flusher per worker
+        if self._worker is None or self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='csv-write-behind', daemon=True)
+            self._worker.start()
+
+    def append(self, filepath, row, on_written=None):
+        """Queue one row for filepath; on_written() runs once it is written"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Write-behind appender is closed')
+            self._ensure_worker()
+            rows = self._pending.setdefault(filepath, [])
+            rows.append(row)
+            if on_written is not None:
+                self._callbacks.setdefault(filepath, []).append(on_written)
+            self._stats['enqueued'] += 1
+            depth = self._queue_depth()
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+            if len(rows) >= self.max_rows:
+                self._cond.notify()
+
+    def has_pending(self, filepath):
+        with self._cond:
+            return bool(self._pending.get(filepath))
+
+    def flush(self, filepath=None):
+        """Write buffered rows for one file (or all files) now"""
+        with self._flush_lock:
+            with self._cond:
+                if filepath is None:
+                    batches, self._pending = self._pending, {}
+                    callbacks, self._callbacks = self._callbacks, {}
+                else:
+                    rows = self._pending.pop(filepath, None)
+                    batches = {filepath: rows} if rows else {}
+                    callbacks = {filepath: self._callbacks.pop(filepath, [])}
+
+            for path, rows in batches.items():
+                started = time.perf_counter()
+                try:
+                    self._write_rows(path, rows, self.durability)
+                except Exception as e:
+                    print(f"Error flushing {len(rows)} rows to {path}: {e}")
+                    with self._cond:
+                        self._stats['errors'] += 1
+                        # Put the rows back in front so nothing is lost or reordered
+                        self._pending[path] = rows + self._pending.get(path, [])
+                        self._callbacks[path] = callbacks.get(path, []) + self._callbacks.get(path, [])
+                    continue
+                with self._cond:
+                    self._stats['flushed_rows'] += len(rows)
+                    self._stats['batches'] += 1
+                    self._stats['last_flush_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                for on_written in callbacks.get(path, []):
+                    try:
+                        on_written()
+                    except Exception as e:
+                        print(f"Error after flushing {path}: {e}")
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    return
+                self._cond.wait_for(
+                    lambda: self._closed or any(len(rows) >= self.max_rows for rows in self._pending.values()),
+                    timeout=self.interval
+                )
+            self.flush()
+
+    def close(self):
+        """Flush everything and stop the background thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.flush()
+
+    def _queue_depth(self):
+        return sum(len(rows) for rows in self._pending.values())
+
+    def stats(self):
+        """Return queue depth and flush counters"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._queue_depth()
+            stats['queue_depth_by_file'] = {path: len(rows) for path, rows in self._pending.items() if rows}
+        stats['durability'] = self.durability
+        stats['max_rows'] = self.max_rows
+        stats['interval_ms'] = self.interval * 1000
+        return stats